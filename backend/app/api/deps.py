@@ -1,14 +1,46 @@
+import math
 from typing import Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
-from app.core import security
+from app.core import metrics, security
 from app.core.config import settings
+from app.core.rate_limit import RateLimiter
+from app.core.readiness import readiness, ComponentNotReady
 from app.models.user import User
 from app.schemas.token import TokenData
+from app.services.idempotency import idempotency_service
+from app.services.llm_queue import llm_queue, LLMOverloaded
 
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+optional_oauth2 = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+
+user_rate_limiter = RateLimiter(
+    settings.RATE_LIMIT_USER_PER_MINUTE, settings.RATE_LIMIT_USER_BURST
+)
+ip_rate_limiter = RateLimiter(
+    settings.RATE_LIMIT_IP_PER_MINUTE, settings.RATE_LIMIT_IP_BURST
+)
+# Batch grading spends one Gemini call per few items, so it has its own per-item budget
+batch_rate_limiter = RateLimiter(
+    settings.BATCH_GRADE_USER_ITEMS_PER_MINUTE, settings.BATCH_GRADE_USER_ITEMS_BURST
+)
+metrics.register("rate_limit_user", user_rate_limiter.stats)
+metrics.register("rate_limit_ip", ip_rate_limiter.stats)
+metrics.register("rate_limit_batch", batch_rate_limiter.stats)
+
+
+async def require_database() -> None:
+    """Hold a request until background MongoDB init finishes (503 on timeout)."""
+    try:
+        await readiness.wait("database", timeout=settings.DB_READY_TIMEOUT_SECONDS)
+    except ComponentNotReady as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"},
+        )
 
 
 async def get_current_user(token: str = Depends(reusable_oauth2)) -> User:
@@ -30,3 +62,92 @@ async def get_current_user(token: str = Depends(reusable_oauth2)) -> User:
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
+
+
+async def require_admin(user: User = Depends(get_current_user)) -> User:
+    """The current user, if their email is in ADMIN_EMAILS (403 otherwise)."""
+    admins = {email.strip().lower() for email in settings.ADMIN_EMAILS}
+    if user.email.lower() not in admins:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user
+
+
+async def get_current_user_optional(
+    token: Optional[str] = Depends(optional_oauth2),
+) -> Optional[User]:
+    """Like `get_current_user`, but anonymous requests get None instead of 401."""
+    if not token:
+        return None
+    return await get_current_user(token)
+
+
+def _token_subject(token: Optional[str]) -> Optional[str]:
+    """User id from a bearer token without a database lookup (None if invalid)."""
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def idempotency_scope(
+    request: Request, token: Optional[str] = Depends(optional_oauth2)
+) -> str:
+    """
+    Scope of a request's Idempotency-Key: its path and caller (user id, or
+    client IP when anonymous), so one caller's key never replays another's response.
+    """
+    user_id = _token_subject(token)
+    caller = f"user:{user_id}" if user_id else f"ip:{_client_ip(request)}"
+    return f"{request.url.path}:{caller}"
+
+
+def _too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def admit_llm_turn(
+    request: Request, token: Optional[str] = Depends(optional_oauth2)
+) -> None:
+    """
+    Admission control for endpoints that spend Gemini calls: per-user and
+    per-IP token buckets, then the global LLM queue's SLA check. Rejections
+    happen before any session state is touched, so clients can simply retry.
+    Retries whose Idempotency-Key already has a stored response are replayed
+    without spending LLM capacity, so they skip admission.
+    """
+    key = request.headers.get("idempotency-key")
+    if key and await idempotency_service.has_response(idempotency_scope(request, token), key):
+        return
+
+    user_id = _token_subject(token)
+    if user_id:
+        wait = user_rate_limiter.hit(user_id)
+        if wait:
+            raise _too_many_requests("Rate limit exceeded for this account.", wait)
+
+    wait = ip_rate_limiter.hit(_client_ip(request))
+    if wait:
+        raise _too_many_requests("Rate limit exceeded for this address.", wait)
+
+    try:
+        llm_queue.admit()
+    except LLMOverloaded as e:
+        raise _too_many_requests("Server is busy, please retry shortly.", e.retry_after)
+
+
+def charge_batch_items(user_id: str, items: int) -> None:
+    """Spend `items` tokens of the user's batch-grading budget (429 when it's exhausted)."""
+    wait = batch_rate_limiter.hit(user_id, cost=items)
+    if wait:
+        raise _too_many_requests("Batch grading limit exceeded for this account.", wait)
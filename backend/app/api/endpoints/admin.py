@@ -0,0 +1,80 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.core.profiling import ProfilerBusy, ProfilerError, profiler
+from app.schemas.admin import HookAttachRequest, HookToggleRequest, ProfilerStartRequest
+
+router = APIRouter()
+
+
+@router.get("/profiler")
+async def profiler_status():
+    """Sampling state, the hottest frames so far, and hook timings."""
+    return {**profiler.status(), "top": profiler.top(), "hooks": profiler.hook_stats()}
+
+
+@router.post("/profiler/start")
+async def start_profiler(request: ProfilerStartRequest):
+    try:
+        return profiler.start(
+            request.seconds, request.interval_ms, request.route, request.sample_rate
+        )
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ProfilerError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/profiler/stop")
+async def stop_profiler():
+    return profiler.stop()
+
+
+@router.delete("/profiler")
+async def reset_profiler():
+    """Stop sampling and drop the collected stacks."""
+    profiler.reset()
+    return profiler.status()
+
+
+@router.get("/profiler/flamegraph", response_class=PlainTextResponse)
+async def download_flamegraph():
+    """Collected stacks in folded format, for flamegraph.pl, speedscope or inferno."""
+    return PlainTextResponse(
+        profiler.folded(),
+        headers={"Content-Disposition": 'attachment; filename="profile.folded"'},
+    )
+
+
+@router.get("/profiler/hooks")
+async def hook_stats():
+    return profiler.hook_stats()
+
+
+@router.post("/profiler/hooks")
+async def toggle_hooks(request: HookToggleRequest):
+    try:
+        profiler.enable_hooks(request.enable)
+    except ProfilerError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    profiler.disable_hooks(request.disable)
+    return profiler.hook_stats()
+
+
+@router.post("/profiler/attach")
+async def attach_hook(request: HookAttachRequest):
+    """Time every call to a function or method in the app until it is detached."""
+    try:
+        profiler.attach(request.target)
+    except ProfilerError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profiler.hook_stats()
+
+
+@router.delete("/profiler/attach")
+async def detach_hook(target: str):
+    try:
+        profiler.detach(target)
+    except ProfilerError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return profiler.hook_stats()
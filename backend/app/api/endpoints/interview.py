@@ -1,18 +1,41 @@
+import asyncio
 import json
 import logging
 import os
-import shutil
-import traceback
 import uuid
-from typing import List, Dict, Any, Optional
+from datetime import datetime
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import (
+    APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query, Request,
+)
+from fastapi.responses import Response, StreamingResponse
+from app.api import deps
+from app.core.config import settings
+from app.models.interview import InterviewStatus
+from app.models.user import User
 from app.schemas.interview import (
     StartInterviewRequest, InterviewResponse,
-    AnswerRequest, FeedbackResponse, EndInterviewRequest,
+    AnswerRequest, FeedbackResponse, EndInterviewRequest, AnalyticsResponse, BatchGradeRequest,
+    InterviewHistoryItem, INTERVIEW_RESPONSE, FEEDBACK_RESPONSE, HISTORY_RESPONSE,
+    ANALYTICS_RESPONSE,
+)
+from app.services.audio_preprocess import AudioFormatError, is_uncompressed, trim_silence
+from app.services.conversation_memory import conversation_memory
+from app.services.export_service import (
+    export_service, InvalidCursorError, MAX_EXPORT_BATCH_SIZE,
+)
+from app.services.grading_service import grading_service
+from app.services.idempotency import (
+    IdempotencyInProgress, IdempotencyKeyReused, fingerprint, idempotency_service,
 )
 from app.services.llm_service import llm_service
+from app.services.non_verbal import (
+    NonVerbalFormatError, decode_frames, frame_from_metrics, non_verbal_service,
+)
+from app.services.question_index import question_index
 from app.services.session_service import session_service
+from app.services.speculation import speculation_engine
 from app.services.stt_service import stt_service
 
 logger = logging.getLogger(__name__)
@@ -20,53 +43,211 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-def aggregate_non_verbal_stats(interaction_log: list) -> Optional[dict]:
-    """Extract average non-verbal metrics from the interaction log."""
-    total_eye = 0
-    total_stability = 0
-    count = 0
-    for entry in interaction_log:
-        metrics = entry.get("metrics")
-        if metrics:
-            total_eye += metrics.get("eye_contact_score", 0)
-            total_stability += metrics.get("head_stability_score", 0)
-            count += 1
+@router.post(
+    "/start", response_model=InterviewResponse, dependencies=[Depends(deps.admit_llm_turn)]
+)
+async def start_interview(
+    request: StartInterviewRequest,
+    current_user: Optional[User] = Depends(deps.get_current_user_optional),
+):
+    session_id = str(uuid.uuid4())
+    user_id = str(current_user.id) if current_user else None
+    await session_service.create_session(
+        session_id, request.role, request.difficulty, user_id=user_id
+    )
 
-    if count == 0:
-        return None
+    question = await question_index.fresh_question(
+        user_id, session_id,
+        lambda rejected: llm_service.generate_question(
+            request.role, request.difficulty, "General", rejected
+        ),
+    )
+    await session_service.add_history(session_id, "ai", question)
+    # Matches the state /chat starts from on the first answer
+    speculation_engine.start(
+        session_id, 1, request.role, request.difficulty, "technical_deep_dive",
+        [], [], conversation_memory.context(None), question,
+    )
 
-    return {
-        "avg_eye_contact": round(total_eye / count, 1),
-        "avg_head_stability": round(total_stability / count, 1),
-        "details": f"Measured over {count} responses.",
-    }
+    return INTERVIEW_RESPONSE(InterviewResponse(session_id=session_id, message=question))
 
 
-@router.post("/start", response_model=InterviewResponse)
-async def start_interview(request: StartInterviewRequest):
-    session_id = str(uuid.uuid4())
-    await session_service.create_session(session_id, request.role, request.difficulty)
+@router.get("/history", response_model=List[InterviewHistoryItem])
+async def get_interview_history():
+    return HISTORY_RESPONSE(await session_service.get_all_sessions())
+
+
+@router.get("/analytics", response_model=AnalyticsResponse)
+async def get_interview_analytics(current_user: User = Depends(deps.get_current_user)):
+    """Progress across the current user's completed interviews, from rollups."""
+    analytics = await session_service.analytics.get_user_analytics(str(current_user.id))
+    return ANALYTICS_RESPONSE(AnalyticsResponse.model_validate(analytics))
+
+
+@router.get("/percentile")
+async def score_percentile(
+    session_id: Optional[str] = None,
+    role: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    score: Optional[float] = Query(None, ge=0, le=10),
+):
+    """
+    Where an overall score ranks among completed interviews for the same role
+    and difficulty. Pass a completed `session_id`, or `role`, `difficulty`
+    and `score`. `percentile` is null until enough interviews are recorded.
+    """
+    if session_id:
+        interview = await session_service.store.load(session_id)
+        if not interview:
+            raise HTTPException(status_code=404, detail="Session not found")
+        feedback = interview.overall_feedback
+        if feedback is None or feedback.overall_score is None:
+            raise HTTPException(status_code=409, detail="Interview has no overall score yet")
+        role, difficulty, score = interview.role, interview.difficulty, feedback.overall_score
+    elif not (role and difficulty and score is not None):
+        raise HTTPException(
+            status_code=400, detail="Pass session_id, or role, difficulty and score"
+        )
+    return await session_service.scores.percentile(role, difficulty, score)
+
+
+@router.get("/export")
+async def export_interviews(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    batch_size: int = Query(100, ge=1, le=MAX_EXPORT_BATCH_SIZE),
+    current_user: User = Depends(deps.get_current_user),
+):
+    """
+    Stream the current user's full interview transcripts as NDJSON, oldest
+    first. Each line has a `cursor`; after a dropped connection, call again
+    with the last cursor received to continue where the stream stopped.
+    """
+    try:
+        lines = export_service.stream_ndjson(
+            str(current_user.id), since=since, until=until,
+            cursor=cursor, batch_size=batch_size,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
-    question = await llm_service.generate_question(
-        request.role, request.difficulty, "General", []
+
+@router.post("/grade-batch", dependencies=[Depends(deps.admit_llm_turn)])
+async def grade_batch(
+    request: BatchGradeRequest,
+    current_user: User = Depends(deps.get_current_user),
+):
+    """
+    Grade standalone question/answer pairs outside any live session.
+    Results stream back as NDJSON in completion order; each line carries the
+    item's `index` (and `id`, if given) alongside the evaluation fields, or
+    `graded: false` and an `error` for an answer that couldn't be graded.
+    Each item is charged to the user's batch-grading budget.
+    """
+    if len(request.items) > settings.BATCH_GRADE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.BATCH_GRADE_MAX_ITEMS} items per batch",
+        )
+    deps.charge_batch_items(str(current_user.id), len(request.items))
+    lines = grading_service.stream_ndjson(
+        [item.model_dump() for item in request.items], pack_size=request.pack_size
     )
-    await session_service.add_history(session_id, "ai", question)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
-    return InterviewResponse(session_id=session_id, message=question)
 
+@router.post("/non-verbal")
+async def ingest_non_verbal(
+    request: Request,
+    session_id: str,
+    channels: Optional[str] = None,
+    question: Optional[int] = Query(None, ge=1),
+):
+    """
+    Push a batch of frame-level non-verbal samples for the answer in progress
+    (or for answer `question`). The body is either little-endian float32 rows
+    of the comma-separated `channels`, or JSON columns
+    (`{"eye_contact": [..], "head_stability": [..]}`); see
+    app.services.non_verbal for the channel names.
+    """
+    body = await request.body()
+    if len(body) > settings.NON_VERBAL_MAX_BATCH_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.NON_VERBAL_MAX_BATCH_BYTES} bytes per batch",
+        )
+    session = await session_service.get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session["end_time"]:
+        raise HTTPException(status_code=409, detail="Interview already completed")
 
-@router.get("/history", response_model=List[Dict[str, Any]])
-async def get_interview_history():
-    return await session_service.get_all_sessions()
+    asked = sum(1 for item in session["history"] if item["role"] == "ai")
+    question = question or asked
+    if question > asked:
+        raise HTTPException(status_code=400, detail=f"Only {asked} questions asked so far")
+    try:
+        frames = decode_frames(body, request.headers.get("content-type"), channels)
+    except NonVerbalFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    window = await non_verbal_service.ingest(session_id, question, frames)
+    return {"question": question, "frames": len(frames), "window_frames": window.frames}
 
 
-@router.post("/chat", response_model=FeedbackResponse)
-async def chat_interview(request: AnswerRequest):
+async def _idempotent(
+    scope: str, key: Optional[str], request_fingerprint: str, handler
+) -> Response:
+    """Run a turn handler under the request's Idempotency-Key (if any)."""
+    try:
+        return await idempotency_service.run(scope, key, request_fingerprint, handler)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "1"})
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post(
+    "/chat", response_model=FeedbackResponse, dependencies=[Depends(deps.admit_llm_turn)]
+)
+async def chat_interview(
+    request: AnswerRequest,
+    idempotency_key: Optional[str] = Header(None),
+    idempotency_scope: str = Depends(deps.idempotency_scope),
+):
+    """
+    Submit an answer and get the evaluation plus the next question. Send an
+    `Idempotency-Key` header to make retries safe: a repeat of a completed
+    request replays the original response.
+    """
+    return await _idempotent(
+        idempotency_scope, idempotency_key,
+        fingerprint(request.model_dump_json().encode()),
+        lambda: _chat_turn(request),
+    )
+
+
+def _already_completed() -> HTTPException:
+    return HTTPException(status_code=409, detail="Interview already completed")
+
+
+async def _chat_turn(
+    request: AnswerRequest, audio: Optional[Tuple[bytes, str]] = None
+) -> Response:
+    """
+    One interview turn. With `audio` (data, mime_type) the answer is spoken:
+    it is transcribed and evaluated in a single Gemini call, and
+    `request.answer` is ignored.
+    """
     session = await session_service.get_session(request.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-
-    await session_service.add_history(request.session_id, "user", request.answer)
+    if session["status"] == InterviewStatus.COMPLETED.value:
+        raise _already_completed()
 
     current_state = await session_service.get_state(request.session_id)
     if not current_state:
@@ -82,21 +263,16 @@ async def chat_interview(request: AnswerRequest):
             "interaction_log": [],
         }
 
-    current_state.setdefault("interaction_log", []).append({
-        "role": "user",
-        "content": request.answer,
-        "metrics": request.non_verbal_metrics,
-    })
-
     # Find last AI question
     last_question = "Question not found"
     for item in reversed(session["history"]):
         if item["role"] == "ai":
             last_question = item["content"]
             break
+    order = sum(1 for item in session["history"] if item["role"] == "ai")
 
-    # Evaluate answer
-    evaluation = await llm_service.evaluate_answer_v2(
+    # Evaluate answer (local heuristic fallback if Gemini misses the turn budget)
+    evaluation_input = dict(
         role=session["role"],
         difficulty=current_state.get("dynamic_difficulty", session["difficulty"]),
         stage=current_state.get("current_stage", "technical_deep_dive"),
@@ -104,14 +280,44 @@ async def chat_interview(request: AnswerRequest):
         weak_areas=current_state["performance_profile"]["weak_areas"],
         strong_areas=current_state["performance_profile"]["strong_areas"],
         question=last_question,
-        answer=request.answer,
+        conversation=conversation_memory.context(current_state),
     )
+    spoken = None
+    if audio is not None:
+        spoken = await llm_service.evaluate_spoken_answer_within_budget(
+            audio=audio[0], mime_type=audio[1], **evaluation_input
+        )
+    if spoken is not None:
+        answer, evaluation = spoken
+        if not answer:
+            raise HTTPException(
+                status_code=400, detail="Could not transcribe audio. Text is empty."
+            )
+    else:
+        answer = await _transcribe(*audio) if audio is not None else request.answer
+        evaluation = await llm_service.evaluate_answer_within_budget(
+            answer=answer, **evaluation_input
+        )
+
+    await session_service.add_history(request.session_id, "user", answer)
+    current_state.setdefault("interaction_log", []).append({
+        "role": "user",
+        "content": answer,
+    })
+
+    # A per-answer metrics snapshot counts as one frame of that answer's window
+    if request.non_verbal_metrics:
+        await non_verbal_service.ingest(
+            request.session_id, order, frame_from_metrics(request.non_verbal_metrics)
+        )
 
     current_state["question_count"] = current_state.get("question_count", 0) + 1
+    conversation_memory.record_turn(current_state, order, last_question, answer, evaluation)
 
     if evaluation.get("score"):
         await session_service.update_last_answer_score(
-            request.session_id, float(evaluation["score"])
+            request.session_id, float(evaluation["score"]),
+            needs_rescore=evaluation.get("needs_rescore", False),
         )
 
     if evaluation.get("critical_mistake"):
@@ -143,9 +349,7 @@ async def chat_interview(request: AnswerRequest):
     # Check for interview end
     if evaluation.get("end_interview") or current_state["question_count"] >= 10:
         avg_score = await session_service.get_average_score(request.session_id)
-        non_verbal_stats = aggregate_non_verbal_stats(
-            current_state.get("interaction_log", [])
-        )
+        non_verbal_stats = await non_verbal_service.describe(request.session_id)
 
         final_feedback = await llm_service.generate_final_feedback(
             role=session["role"],
@@ -156,75 +360,131 @@ async def chat_interview(request: AnswerRequest):
             recent_critical_mistakes=current_state["performance_profile"]["critical_mistakes"],
             average_score=avg_score,
             non_verbal_stats=non_verbal_stats,
+            conversation=conversation_memory.context(current_state),
         )
 
-        await session_service.complete_session(
-            request.session_id, json.dumps(final_feedback)
-        )
+        if not await session_service.complete_session(request.session_id, final_feedback):
+            raise _already_completed()
+        speculation_engine.discard(request.session_id)
 
-        return FeedbackResponse(
+        return FEEDBACK_RESPONSE(FeedbackResponse(
             feedback=f"Interview Completed. Final Verdict: {final_feedback.get('final_verdict')}",
             is_completed=True,
             final_feedback_data=final_feedback,
+        ))
+
+    # Generate next question from the budgeted conversation memory, steering
+    # clear of anything this user was asked before. The first attempt uses the
+    # candidate speculated during think time when it matches the directive.
+    conversation = conversation_memory.context(current_state)
+    difficulty = current_state.get("dynamic_difficulty", session["difficulty"])
+    stage = current_state.get("current_stage", "technical")
+    weak_areas = current_state["performance_profile"]["weak_areas"]
+    strong_areas = current_state["performance_profile"]["strong_areas"]
+
+    async def generate(rejected: List[str]) -> str:
+        if not rejected:
+            speculated = await speculation_engine.take(
+                request.session_id, order, current_state["next_focus"], difficulty, stage
+            )
+            if speculated:
+                return speculated
+        return await llm_service.generate_question_v2(
+            role=session["role"],
+            difficulty=difficulty,
+            stage=stage,
+            weak_areas=weak_areas,
+            strong_areas=strong_areas,
+            directive=current_state["next_focus"],
+            previous_questions=rejected,
+            conversation=conversation,
         )
 
-    # Generate next question
-    next_question = await llm_service.generate_question_v2(
-        role=session["role"],
-        difficulty=current_state.get("dynamic_difficulty", session["difficulty"]),
-        stage=current_state.get("current_stage", "technical"),
-        weak_areas=current_state["performance_profile"]["weak_areas"],
-        strong_areas=current_state["performance_profile"]["strong_areas"],
-        directive=current_state["next_focus"],
+    next_question = await question_index.fresh_question(
+        session.get("user_id"), request.session_id, generate
     )
 
     await session_service.add_history(request.session_id, "ai", next_question)
+    speculation_engine.start(
+        request.session_id, order + 1, session["role"], difficulty, stage,
+        weak_areas, strong_areas, conversation, next_question,
+    )
 
     feedback_text = f"Score: {evaluation.get('score')}/10. {evaluation.get('next_focus')}"
-    return FeedbackResponse(
+    return FEEDBACK_RESPONSE(FeedbackResponse(
         feedback=feedback_text, next_question=next_question, is_completed=False
-    )
+    ))
 
 
-@router.post("/audio-chat", response_model=FeedbackResponse)
+@router.post(
+    "/audio-chat", response_model=FeedbackResponse, dependencies=[Depends(deps.admit_llm_turn)]
+)
 async def audio_chat_interview(
     session_id: str = Form(...),
     audio_file: UploadFile = File(...),
     non_verbal_metrics: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Header(None),
+    idempotency_scope: str = Depends(deps.idempotency_scope),
 ):
-    temp_filename = f"temp_{uuid.uuid4()}.webm"
-    temp_path = os.path.join(os.getcwd(), temp_filename)
+    """Spoken answer: transcribed, then handled like /chat (Idempotency-Key included)."""
+    request_fingerprint = ""
+    if idempotency_key:
+        request_fingerprint = fingerprint(
+            session_id.encode(), (non_verbal_metrics or "").encode(), audio_file.file.read()
+        )
+        audio_file.file.seek(0)
+    return await _idempotent(
+        idempotency_scope, idempotency_key, request_fingerprint,
+        lambda: _audio_turn(session_id, audio_file, non_verbal_metrics),
+    )
 
-    with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(audio_file.file, buffer)
 
-    try:
+async def _audio_turn(
+    session_id: str, audio_file: UploadFile, non_verbal_metrics: Optional[str]
+) -> Response:
+    # WAV / raw PCM answers are VAD-trimmed first; compressed audio goes as-is
+    head = audio_file.file.read(12)
+    audio_file.file.seek(0)
+    trimmed = None
+    if is_uncompressed(head, audio_file.content_type):
         try:
-            transcribed_text = stt_service.transcribe(temp_path)
-        except Exception as e:
-            logger.error("Transcription failed", exc_info=True)
-            raise HTTPException(
-                status_code=500, detail=f"Transcription failed: {str(e)}"
+            trimmed = await asyncio.to_thread(
+                trim_silence, audio_file.file.read(), audio_file.content_type
             )
+        except AudioFormatError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not trimmed.has_speech:
+            raise HTTPException(status_code=400, detail="No speech detected in audio.")
+        logger.info(
+            "Audio trimmed %.1fs -> %.1fs, %d bytes saved (%.0f ms)",
+            trimmed.original_seconds, trimmed.output_seconds,
+            trimmed.bytes_saved, trimmed.processing_ms,
+        )
 
-        if not transcribed_text:
-            raise HTTPException(
-                status_code=400, detail="Could not transcribe audio. Text is empty."
-            )
+    if trimmed:
+        audio, mime_type = trimmed.wav, "audio/wav"
+    else:
+        audio, mime_type = audio_file.file.read(), "audio/webm"
 
-        metrics_dict = None
-        if non_verbal_metrics:
-            try:
-                metrics_dict = json.loads(non_verbal_metrics)
-            except Exception:
-                logger.warning("Failed to parse non_verbal_metrics")
-
-        request = AnswerRequest(
-            session_id=session_id,
-            answer=transcribed_text,
-            non_verbal_metrics=metrics_dict,
-        )
-        return await chat_interview(request)
+    metrics_dict = None
+    if non_verbal_metrics:
+        try:
+            metrics_dict = json.loads(non_verbal_metrics)
+        except Exception:
+            logger.warning("Failed to parse non_verbal_metrics")
+
+    try:
+        request = AnswerRequest(session_id=session_id, answer="", non_verbal_metrics=metrics_dict)
+        if settings.AUDIO_NATIVE_TURNS and len(audio) <= settings.AUDIO_INLINE_MAX_BYTES:
+            response = await _chat_turn(request, audio=(audio, mime_type))
+        else:
+            request.answer = await _transcribe(audio, mime_type)
+            response = await _chat_turn(request)
+        if trimmed:
+            response.headers["X-Audio-Bytes-Saved"] = str(trimmed.bytes_saved)
+            response.headers["X-Audio-Seconds-Saved"] = f"{trimmed.seconds_saved:.2f}"
+            response.headers["X-Audio-Trim-Ms"] = f"{trimmed.processing_ms:.1f}"
+        return response
 
     except HTTPException:
         raise
@@ -233,6 +493,19 @@ async def audio_chat_interview(
         raise HTTPException(
             status_code=500, detail=f"Internal Processing Error: {str(e)}"
         )
+
+
+async def _transcribe(audio: bytes, mime_type: str) -> str:
+    """Speech-to-text through an uploaded file (the two-call path)."""
+    extension = ".wav" if mime_type == "audio/wav" else ".webm"
+    temp_path = os.path.join(os.getcwd(), f"temp_{uuid.uuid4()}{extension}")
+    with open(temp_path, "wb") as buffer:
+        buffer.write(audio)
+    try:
+        transcribed_text = await stt_service.transcribe(temp_path, mime_type)
+    except Exception as e:
+        logger.error("Transcription failed", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
     finally:
         if os.path.exists(temp_path):
             try:
@@ -240,12 +513,20 @@ async def audio_chat_interview(
             except OSError:
                 pass
 
+    if not transcribed_text:
+        raise HTTPException(status_code=400, detail="Could not transcribe audio. Text is empty.")
+    return transcribed_text
+
 
-@router.post("/end", response_model=FeedbackResponse)
+@router.post(
+    "/end", response_model=FeedbackResponse, dependencies=[Depends(deps.admit_llm_turn)]
+)
 async def end_interview(request: EndInterviewRequest):
     session = await session_service.get_session(request.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
+    if session["status"] == InterviewStatus.COMPLETED.value:
+        raise _already_completed()
 
     current_state = await session_service.get_state(request.session_id)
     if not current_state:
@@ -262,9 +543,7 @@ async def end_interview(request: EndInterviewRequest):
         }
 
     avg_score = await session_service.get_average_score(request.session_id)
-    non_verbal_stats = aggregate_non_verbal_stats(
-        current_state.get("interaction_log", [])
-    )
+    non_verbal_stats = await non_verbal_service.describe(request.session_id)
 
     final_feedback = await llm_service.generate_final_feedback(
         role=session["role"],
@@ -275,14 +554,15 @@ async def end_interview(request: EndInterviewRequest):
         recent_critical_mistakes=current_state["performance_profile"]["critical_mistakes"],
         average_score=avg_score,
         non_verbal_stats=non_verbal_stats,
+        conversation=conversation_memory.context(current_state),
     )
 
-    await session_service.complete_session(
-        request.session_id, json.dumps(final_feedback)
-    )
+    if not await session_service.complete_session(request.session_id, final_feedback):
+        raise _already_completed()
+    speculation_engine.discard(request.session_id)
 
-    return FeedbackResponse(
+    return FEEDBACK_RESPONSE(FeedbackResponse(
         feedback=f"Interview Ended Manually. Final Verdict: {final_feedback.get('final_verdict')}",
         is_completed=True,
         final_feedback_data=final_feedback,
-    )
+    ))
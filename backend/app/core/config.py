@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -22,6 +22,8 @@ class Settings(BaseSettings):
     SECRET_KEY: str  # No default — must be set in .env
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    # Accounts allowed to use the admin API (/api/admin)
+    ADMIN_EMAILS: List[str] = []
 
     # Gemini
     GEMINI_API_KEY: str  # No default — must be set in .env
@@ -29,5 +31,147 @@ class Settings(BaseSettings):
     # MongoDB
     MONGO_URI: str = "mongodb://localhost:27017/saylo"
 
+    # Session storage backend: "mongo" (default) or "memory" (tests / demos)
+    SESSION_BACKEND: str = "mongo"
+
+    # Session lifecycle (app.services.session_lifecycle)
+    SESSION_IDLE_HOURS: float = 24.0                # IN_PROGRESS sessions idle longer are closed
+    SESSION_ARCHIVE_AFTER_DAYS: float = 30.0        # Completed sessions older move to the archive
+    SESSION_LIFECYCLE_BATCH_SIZE: int = 200
+    # In-process sweep period; 0 = run `python -m app.jobs.session_lifecycle` from cron instead
+    SESSION_LIFECYCLE_INTERVAL_SECONDS: float = 0
+
+    # Responses at least this many bytes are brotli/gzip compressed
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+
+    # How long a request waits for background MongoDB init before a 503
+    DB_READY_TIMEOUT_SECONDS: float = 10.0
+
+    # Shared Gemini HTTP connection pool
+    GEMINI_MAX_CONNECTIONS: int = 20
+    GEMINI_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    GEMINI_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    GEMINI_TIMEOUT_SECONDS: float = 60.0
+
+    # Model routing per task (app.services.model_router): the first model in
+    # each list is the primary, the rest are fallbacks in order. A model is
+    # skipped while its recent p95 latency or error rate for that task crosses
+    # the thresholds below (with at least MODEL_HEALTH_MIN_SAMPLES calls in the
+    # last MODEL_HEALTH_WINDOW_SECONDS)
+    MODEL_ROUTES: Dict[str, List[str]] = {
+        "question": ["gemini-2.0-flash-lite", "gemini-2.0-flash"],
+        "evaluation": ["gemini-2.0-flash", "gemini-2.0-flash-lite"],
+        "grading": ["gemini-2.0-flash", "gemini-2.0-flash-lite"],
+        "feedback": ["gemini-2.5-flash", "gemini-2.0-flash"],
+        "transcription": ["gemini-2.0-flash-lite", "gemini-2.0-flash"],
+    }
+    MODEL_FALLBACK_P95_SECONDS: Dict[str, float] = {
+        "question": 4.0, "evaluation": 6.0, "grading": 30.0, "feedback": 30.0,
+        "transcription": 8.0,
+    }
+    MODEL_FALLBACK_ERROR_RATE: float = 0.25
+    MODEL_HEALTH_WINDOW_SECONDS: float = 300.0
+    MODEL_HEALTH_MIN_SAMPLES: int = 10
+    # USD per million (input, output) tokens, for the cost figures in /metrics
+    MODEL_PRICES_PER_MTOK: Dict[str, List[float]] = {
+        "gemini-2.0-flash": [0.10, 0.40],
+        "gemini-2.0-flash-lite": [0.075, 0.30],
+        "gemini-2.5-flash": [0.30, 2.50],
+    }
+
+    # Load testing only: answer Gemini calls locally with canned text after
+    # this many milliseconds instead of calling the API (unset = real API)
+    GEMINI_FAKE_LATENCY_MS: Optional[float] = None
+
+    # Admission control for LLM-backed endpoints (per worker process)
+    RATE_LIMIT_USER_PER_MINUTE: float = 30
+    RATE_LIMIT_USER_BURST: int = 10
+    RATE_LIMIT_IP_PER_MINUTE: float = 60
+    RATE_LIMIT_IP_BURST: int = 20
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_QUEUE_SLA_SECONDS: float = 20.0
+
+    # Per-turn time allowed for Gemini's answer evaluation (queue wait included)
+    # before the answer is scored by the local heuristic evaluator instead
+    EVALUATION_BUDGET_SECONDS: float = 8.0
+
+    # Voice-activity trimming of WAV/PCM answers before transcription
+    AUDIO_MAX_SECONDS: float = 180.0          # Speech kept per answer
+    AUDIO_MAX_PAUSE_SECONDS: float = 0.6      # Longer pauses are shortened to this
+
+    # Audio-native turns: a spoken answer up to AUDIO_INLINE_MAX_BYTES is sent
+    # inline with the evaluation prompt, and one Gemini call returns both the
+    # transcript and the evaluation. Larger answers, or a native call that
+    # fails or misses its budget, go through transcription and then evaluation
+    AUDIO_NATIVE_TURNS: bool = True
+    AUDIO_INLINE_MAX_BYTES: int = 8_000_000   # Gemini caps inline requests at 20 MB (base64)
+    AUDIO_TURN_BUDGET_SECONDS: float = 15.0
+
+    # Rolling conversation memory in prompts (app.services.conversation_memory)
+    PROMPT_CONTEXT_TOKENS: int = 600     # Estimated tokens of history per prompt
+    CONVERSATION_RECENT_TURNS: int = 2   # Exchanges kept verbatim; older ones are summarised
+
+    # Speculative next-question generation while the candidate answers
+    # (app.services.speculation): how long a candidate stays usable, and how
+    # long a turn waits for a matching candidate that is still generating
+    SPECULATION_ENABLED: bool = True
+    SPECULATION_TTL_SECONDS: float = 900.0
+    SPECULATION_WAIT_SECONDS: float = 3.0
+    SPECULATION_MAX_SESSIONS: int = 1000
+
+    # Question repetition index: estimated Jaccard similarity at which a new
+    # question counts as a repeat, regenerations before using the fallback
+    # pool, and how long a worker trusts its cached copy of a user's index
+    QUESTION_DUPLICATE_THRESHOLD: float = 0.5
+    QUESTION_DEDUP_RETRIES: int = 1
+    QUESTION_INDEX_CACHE_SECONDS: float = 300.0
+
+    # Idempotency-Key support on /chat and /audio-chat: how long completed
+    # responses are replayed, and after how long an unfinished claim is abandoned
+    IDEMPOTENCY_TTL_SECONDS: int = 3600
+    IDEMPOTENCY_LOCK_SECONDS: int = 300
+
+    # Score percentiles per (role, difficulty) (app.services.score_index): how
+    # long a worker reuses a histogram, and the sample size below which no
+    # percentile is reported
+    SCORE_INDEX_CACHE_SECONDS: float = 60.0
+    SCORE_PERCENTILE_MIN_SAMPLES: int = 5
+
+    # Frame-level non-verbal signal ingestion (/api/interview/non-verbal)
+    NON_VERBAL_MAX_BATCH_BYTES: int = 1_000_000
+
+    # Offline batch grading (/api/interview/grade-batch)
+    BATCH_GRADE_MAX_ITEMS: int = 200
+    BATCH_GRADE_CONCURRENCY: int = 4    # LLM calls in flight per batch request
+    BATCH_GRADE_PACK_SIZE: int = 5      # Answers graded per prompt
+    # Per-user grading budget, charged one token per item (keep the burst at
+    # least BATCH_GRADE_MAX_ITEMS so a full batch can be admitted)
+    BATCH_GRADE_USER_ITEMS_PER_MINUTE: float = 20
+    BATCH_GRADE_USER_ITEMS_BURST: int = 200
+
+    # On-demand sampling profiler (app.core.profiling, /api/admin/profiler):
+    # sampling period, longest allowed session, and distinct stacks kept
+    # before further new stacks are lumped together
+    PROFILER_INTERVAL_MS: float = 5.0
+    PROFILER_MAX_SECONDS: float = 300.0
+    PROFILER_MAX_STACKS: int = 20_000
+
+    # Production server (python -m app.server); 0 workers = one per available CPU
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0
+    SERVER_BACKLOG: int = 2048
+    # Proxies (comma-separated IPs/CIDRs, or "*") whose X-Forwarded-For and
+    # X-Forwarded-Proto are trusted. Behind a load balancer, list it here so
+    # the client address (and the per-IP rate limit) is the real client's
+    FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+    # Longer than a typical load balancer's 60s idle timeout, so the proxy
+    # (not uvicorn) closes idle connections and never reuses a dead one
+    SERVER_KEEPALIVE_SECONDS: int = 75
+    # SIGTERM drain window for in-flight requests before workers are stopped
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS: int = 30
+    # Uvicorn's per-request access log; turn off when the proxy already logs requests
+    SERVER_ACCESS_LOG: bool = True
+
 
 settings = Settings()
@@ -0,0 +1,25 @@
+"""
+Process-local runtime statistics. Components register a zero-argument
+callable returning a JSON-ready dict; `GET /metrics` collects them all.
+"""
+import logging
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+_collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register(name: str, collector: Callable[[], Dict[str, Any]]) -> None:
+    _collectors[name] = collector
+
+
+def snapshot() -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    for name, collector in _collectors.items():
+        try:
+            result[name] = collector()
+        except Exception as e:  # A broken collector must not break /metrics
+            logger.error("Metrics collector %r failed: %s", name, e)
+            result[name] = {"error": str(e)}
+    return result
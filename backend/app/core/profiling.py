@@ -0,0 +1,423 @@
+"""
+On-demand profiling for a running worker (admin API: /api/admin/profiler).
+
+Two complementary tools, both off by default:
+
+- A sampling profiler. A daemon thread snapshots Python stacks every few
+  milliseconds with `sys._current_frames()` and counts each stack in folded
+  form ("module:function;module:function ..."), which flamegraph.pl,
+  speedscope and inferno read directly. It runs for a time window over
+  every thread, or only while sampled requests to one route are on the
+  event loop (`route` + `sample_rate`; see ProfilingMiddleware). Samples
+  where a thread is idle (event loop waiting in select, pool threads waiting
+  for work) are counted but not kept.
+- Hot-path hooks. The `hotpath(name)` decorator marks a function whose calls
+  are timed once its hook is enabled; while disabled it costs one flag
+  check. `attach("app.module:Class.method")` wraps any function in the app
+  at runtime, without a redeploy, and `detach` restores it. Attaching
+  rebinds the attribute, so `from module import function` copies taken
+  before that keep calling the original.
+
+Profiles are per worker process: with several workers, each start request
+profiles the worker that received it.
+"""
+import asyncio
+import functools
+import importlib
+import inspect
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames of a thread that is waiting rather than running
+_IDLE_LEAVES = (
+    "selectors:", "threading:Condition.wait", "threading:Event.wait",
+    "threading:Thread._wait_for_tstate_lock", "concurrent.futures.thread:_worker",
+    "queue:Queue.get",
+)
+_MAX_DEPTH = 128
+_TRUNCATED = "[other stacks]"
+
+
+class ProfilerError(ValueError):
+    """A profiling request that can't be carried out as asked."""
+
+
+class ProfilerBusy(ProfilerError):
+    """A sampling session is already running."""
+
+
+def _label(frame: Any) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+# ── Hot-path hooks ──────────────────────────────────────────────────────────
+
+class _HookStats:
+    __slots__ = ("calls", "errors", "seconds", "max_seconds", "cpu_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    def add(self, seconds: float, cpu: Optional[float], ok: bool) -> None:
+        self.calls += 1
+        self.errors += not ok
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        if cpu is not None:
+            self.cpu_seconds += cpu
+
+    def as_dict(self, is_async: bool) -> Dict[str, Any]:
+        calls = self.calls or 1
+        stats = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": round(self.seconds / calls * 1000, 3),
+            "max_ms": round(self.max_seconds * 1000, 3),
+            "total_seconds": round(self.seconds, 3),
+        }
+        if not is_async:  # Awaiting functions' wall time isn't CPU time
+            stats["cpu_seconds"] = round(self.cpu_seconds, 3)
+        return stats
+
+
+# ── Profiler ────────────────────────────────────────────────────────────────
+
+class Profiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.session: Optional[Dict[str, Any]] = None
+        # Route sampling: tasks of the requests chosen for profiling
+        self.route: Optional[str] = None
+        self.sample_rate = 0.0
+        self.requests_sampled = 0
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        # Hooks
+        self._hooks: Dict[str, _HookStats] = {}
+        self._hook_async: Dict[str, bool] = {}
+        self._enabled: Set[str] = set()
+        self._all_enabled = False
+        self._attached: Dict[str, Callable[[], None]] = {}
+
+    # Sampling ---------------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(
+        self, seconds: float, interval_ms: Optional[float] = None,
+        route: Optional[str] = None, sample_rate: float = 1.0,
+    ) -> Dict[str, Any]:
+        """
+        Sample stacks for `seconds`. With `route`, only requests to that path
+        (or below it) are profiled, a `sample_rate` fraction of them. Must be
+        called on the event loop. New samples add to any kept from earlier
+        sessions until `reset()`.
+        """
+        interval_ms = settings.PROFILER_INTERVAL_MS if interval_ms is None else interval_ms
+        if not 0 < seconds <= settings.PROFILER_MAX_SECONDS:
+            raise ProfilerError(f"seconds must be in (0, {settings.PROFILER_MAX_SECONDS:g}]")
+        if interval_ms < 1:
+            raise ProfilerError("interval_ms must be at least 1")
+        if not 0 < sample_rate <= 1:
+            raise ProfilerError("sample_rate must be in (0, 1]")
+        with self._lock:
+            if self.running:
+                raise ProfilerBusy("A profiling session is already running")
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread = threading.get_ident()
+            self.route = (route.rstrip("/") or "/") if route else None
+            self.sample_rate = sample_rate
+            self.requests_sampled = 0
+            self.session = {
+                "started_at": time.time(),
+                "seconds": seconds,
+                "interval_ms": interval_ms,
+                "route": self.route,
+                "sample_rate": sample_rate if route else None,
+            }
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(time.monotonic() + seconds, interval_ms / 1000),
+                name="profiler-sampler", daemon=True,
+            )
+            self._thread.start()
+        logger.info("Sampling profiler started: %s", self.session)
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        thread = self._thread
+        self._stop.set()
+        if thread is not None:
+            thread.join(timeout=1.0)
+        return self.status()
+
+    def reset(self) -> None:
+        """Drop collected samples (and stop sampling)."""
+        self.stop()
+        with self._lock:
+            self.stacks = Counter()
+            self.samples = 0
+            self.idle_samples = 0
+
+    def _run(self, deadline: float, interval: float) -> None:
+        own = threading.get_ident()
+        names: Dict[int, str] = {}
+        refreshed = 0.0
+        try:
+            while not self._stop.wait(interval):
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                if now - refreshed > 1.0:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                    refreshed = now
+                self.sample(own, names)
+        finally:
+            self.route = None
+            self._tasks.clear()
+            logger.info("Sampling profiler stopped after %d samples", self.samples)
+
+    def sample(self, skip_thread: Optional[int] = None, names: Optional[Dict[int, str]] = None) -> None:
+        """Take one snapshot of every thread's stack (or of the sampled requests)."""
+        frames = sys._current_frames()
+        if self.route is not None:
+            # Only the event loop, and only while a sampled request's task is on it
+            frame = frames.get(self._loop_thread)
+            if frame is None or not self._tasks:
+                return
+            try:
+                task = asyncio.current_task(self._loop)
+            except RuntimeError:
+                return
+            if task not in self._tasks:
+                return
+            frames = {self._loop_thread: frame}
+
+        for thread_id, frame in frames.items():
+            if thread_id == skip_thread:
+                continue
+            labels: List[str] = []
+            while frame is not None and len(labels) < _MAX_DEPTH:
+                labels.append(_label(frame))
+                frame = frame.f_back
+            if not labels:
+                continue
+            with self._lock:
+                if labels[0].startswith(_IDLE_LEAVES):
+                    self.idle_samples += 1
+                    continue
+                labels.append((names or {}).get(thread_id, f"thread-{thread_id}"))
+                stack = ";".join(reversed(labels))
+                if stack not in self.stacks and len(self.stacks) >= settings.PROFILER_MAX_STACKS:
+                    stack = f"{labels[-1]};{_TRUNCATED}"
+                self.stacks[stack] += 1
+                self.samples += 1
+
+    # Route sampling hooks, called by ProfilingMiddleware --------------------
+
+    def wants(self, path: str) -> bool:
+        route = self.route
+        if route is None or not (path == route or path.startswith(route.rstrip("/") + "/")):
+            return False
+        return random.random() < self.sample_rate
+
+    def track(self, task: asyncio.Task) -> None:
+        self._tasks.add(task)
+        self.requests_sampled += 1
+
+    def untrack(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+
+    # Output -----------------------------------------------------------------
+
+    def folded(self) -> str:
+        """Collected stacks in folded format ("frame;frame;frame count" per line)."""
+        with self._lock:
+            items = sorted(self.stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def top(self, n: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+        """Functions with the most samples on top of the stack (self) and anywhere in it."""
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        with self._lock:
+            items = list(self.stacks.items())
+        for stack, count in items:
+            frames = stack.split(";")[1:]  # Without the thread name
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        total = sum(count for _, count in items) or 1
+
+        def ranked(counter: Counter) -> List[Dict[str, Any]]:
+            return [
+                {"frame": frame, "samples": count, "percent": round(count / total * 100, 1)}
+                for frame, count in counter.most_common(n)
+            ]
+
+        return {"self": ranked(own), "inclusive": ranked(inclusive)}
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "session": self.session,
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "distinct_stacks": len(self.stacks),
+            "requests_sampled": self.requests_sampled,
+            "hooks_enabled": sorted(self._hooks) if self._all_enabled else sorted(self._enabled),
+            "attached": sorted(self._attached),
+        }
+
+    # Hooks ------------------------------------------------------------------
+
+    def _wrap(self, name: str, func: Callable, always: bool) -> Callable:
+        stats = self._hooks.setdefault(name, _HookStats())
+        is_async = inspect.iscoroutinefunction(func)
+        self._hook_async[name] = is_async
+
+        def active() -> bool:
+            return always or self._all_enabled or name in self._enabled
+
+        if is_async:
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not active():
+                    return await func(*args, **kwargs)
+                start, ok = time.perf_counter(), False
+                try:
+                    result = await func(*args, **kwargs)
+                    ok = True
+                    return result
+                finally:
+                    stats.add(time.perf_counter() - start, None, ok)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not active():
+                return func(*args, **kwargs)
+            start, cpu, ok = time.perf_counter(), time.thread_time(), False
+            try:
+                result = func(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                stats.add(time.perf_counter() - start, time.thread_time() - cpu, ok)
+        return wrapper
+
+    def hotpath(self, name: str) -> Callable[[Callable], Callable]:
+        """Decorator: time calls to the function while hook `name` is enabled."""
+        return lambda func: self._wrap(name, func, always=False)
+
+    def enable_hooks(self, names: Iterable[str]) -> None:
+        """Enable hooks by name; "*" enables every hook."""
+        for name in names:
+            if name == "*":
+                self._all_enabled = True
+            elif name in self._hooks:
+                self._enabled.add(name)
+            else:
+                raise ProfilerError(f"Unknown hook {name!r}")
+
+    def disable_hooks(self, names: Iterable[str]) -> None:
+        for name in names:
+            if name == "*":
+                self._all_enabled = False
+                self._enabled.clear()
+            else:
+                self._enabled.discard(name)
+
+    def attach(self, target: str) -> str:
+        """
+        Time every call to `target` ("app.package.module:function" or
+        "app.package.module:Class.method") until `detach(target)`.
+        """
+        module_name, _, path = target.partition(":")
+        if not module_name.startswith("app.") or not path:
+            raise ProfilerError("Target must look like 'app.module:function' or 'app.module:Class.method'")
+        if target in self._attached:
+            return target
+        try:
+            owner: Any = importlib.import_module(module_name)
+            *parents, attribute = path.split(".")
+            for part in parents:
+                owner = getattr(owner, part)
+            original = inspect.getattr_static(owner, attribute)
+        except (ImportError, AttributeError) as e:
+            raise ProfilerError(f"Cannot resolve {target!r}: {e}")
+
+        if isinstance(original, (staticmethod, classmethod)):
+            wrapped: Any = type(original)(self._wrap(target, original.__func__, always=True))
+        elif inspect.isfunction(original):
+            wrapped = self._wrap(target, original, always=True)
+        else:
+            raise ProfilerError(f"{target!r} is not a function or method")
+        setattr(owner, attribute, wrapped)
+        self._attached[target] = lambda: setattr(owner, attribute, original)
+        return target
+
+    def detach(self, target: str) -> None:
+        restore = self._attached.pop(target, None)
+        if restore is None:
+            raise ProfilerError(f"{target!r} is not attached")
+        restore()
+
+    def hook_stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "enabled": name in self._attached or self._all_enabled or name in self._enabled,
+                **stats.as_dict(self._hook_async.get(name, False)),
+            }
+            for name, stats in sorted(self._hooks.items())
+        }
+
+
+profiler = Profiler()
+hotpath = profiler.hotpath
+metrics.register("profiler", lambda: {
+    key: value for key, value in profiler.status().items() if key != "session"
+})
+
+
+class ProfilingMiddleware:
+    """Marks a `sample_rate` fraction of requests to the profiled route for sampling."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or profiler.route is None or not profiler.wants(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        profiler.track(task)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.untrack(task)
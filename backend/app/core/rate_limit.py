@@ -0,0 +1,62 @@
+"""
+In-process token-bucket rate limiting.
+
+Each key (user id, client IP, …) gets a bucket of `burst` tokens refilled at
+`rate_per_minute`. Buckets are kept in an LRU map capped at `max_keys`, so a
+flood of distinct IPs cannot grow memory without bound; an evicted bucket
+simply starts full again. Limits are per worker process.
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = 10_000):
+        self.rate = rate_per_minute / 60.0  # tokens per second
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+
+    def hit(self, key: str, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """
+        Take `cost` tokens for `key`. Returns 0.0 when allowed, otherwise the
+        number of seconds until enough tokens will have refilled.
+        """
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+
+        if bucket.tokens >= cost:
+            bucket.tokens -= cost
+            self.allowed += 1
+            return 0.0
+        self.rejected += 1
+        return (cost - bucket.tokens) / self.rate if self.rate else math.inf
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "rate_per_minute": self.rate * 60,
+            "burst": self.burst,
+        }
@@ -0,0 +1,75 @@
+"""
+Tracks slow startup work (MongoDB init, Gemini client warm-up) that runs in
+the background, so the process can answer liveness probes immediately and
+report readiness separately once every component is warm.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentNotReady(Exception):
+    """A startup component failed or did not finish within the wait timeout."""
+
+
+class Readiness:
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, name: str, work: Awaitable) -> asyncio.Task:
+        """Run `work` in the background under `name`. Idempotent per name."""
+        task = self._tasks.get(name)
+        if task is None:
+            task = self._tasks[name] = asyncio.ensure_future(work)
+            task.add_done_callback(lambda t: self._log_result(name, t))
+        return task
+
+    def reset(self) -> None:
+        """Cancel and forget all components (used on shutdown)."""
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+    def status(self) -> Dict[str, str]:
+        result = {}
+        for name, task in self._tasks.items():
+            if not task.done():
+                result[name] = "starting"
+            elif task.cancelled() or task.exception() is not None:
+                result[name] = "failed"
+            else:
+                result[name] = "ready"
+        return result
+
+    def is_ready(self) -> bool:
+        return all(state == "ready" for state in self.status().values())
+
+    async def wait(self, name: str, timeout: Optional[float] = None) -> None:
+        """
+        Wait for a component to finish. Returns at once if it was never
+        started (e.g. the app is running without its lifespan, as in tests).
+        """
+        task = self._tasks.get(name)
+        if task is None:
+            return
+        try:
+            # shield: a caller timing out must not cancel the shared startup task
+            await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            raise ComponentNotReady(f"{name} is still starting")
+        except Exception as e:
+            raise ComponentNotReady(f"{name} failed to start: {e}")
+
+    @staticmethod
+    def _log_result(name: str, task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error("Startup component %r failed: %s", name, task.exception())
+        else:
+            logger.info("Startup component %r ready", name)
+
+
+readiness = Readiness()
@@ -1,16 +1,26 @@
 from datetime import datetime, timedelta
 from typing import Optional, Any, Union
 from jose import jwt
-from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.profiling import hotpath
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_pwd_context = None
 
+def _get_pwd_context():
+    # passlib + bcrypt are only needed by register/login, so load them lazily
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+@hotpath("auth.verify_password")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _get_pwd_context().verify(plain_password, hashed_password)
 
+@hotpath("auth.hash_password")
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _get_pwd_context().hash(password)
 
 def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     if expires_delta:
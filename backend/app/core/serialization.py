@@ -0,0 +1,53 @@
+"""
+Fast JSON serialization for API responses.
+
+- `ORJSONResponse` is the app's default response class: plain dict responses
+  are rendered by orjson (falls back to the stdlib when orjson is missing).
+- `ResponseAdapter` wraps a Pydantic `TypeAdapter` that is built once at import
+  time. Endpoints return `ADAPTER(obj)` to serialize a response model straight
+  to JSON bytes in pydantic-core, skipping FastAPI's validate → jsonable_encoder
+  → json.dumps round-trip.
+"""
+from typing import Any, Generic, Mapping, Optional, Type, TypeVar
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+T = TypeVar("T")
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (handles datetime/UUID natively)."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ResponseAdapter(Generic[T]):
+    """Precompiled serializer for one response type."""
+
+    def __init__(self, tp: Type[T]):
+        self.adapter: TypeAdapter[T] = TypeAdapter(tp)
+
+    def dump_json(self, obj: T) -> bytes:
+        return self.adapter.dump_json(obj)
+
+    def __call__(
+        self,
+        obj: T,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> Response:
+        return Response(
+            content=self.dump_json(obj),
+            status_code=status_code,
+            headers=headers,
+            media_type="application/json",
+        )
@@ -1,11 +1,21 @@
+import asyncio
+import logging
+
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from app.core.config import settings
 
 # Import all models to register with Beanie
 from app.models.user import User
-from app.models.interview import Interview
+from app.models.interview import Interview, ArchivedInterview
 from app.models.resume import Resume
+from app.models.analytics import UserRoleRollup, ScoreDistribution
+from app.models.question_index import QuestionSignature
+from app.models.non_verbal import NonVerbalWindow
+from app.models.idempotency import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
 
 async def init_db():
     client = AsyncIOMotorClient(settings.MONGO_URI)
@@ -13,6 +23,25 @@ async def init_db():
     
     await init_beanie(
         database=database,
-        document_models=[User, Interview, Resume]
+        document_models=[
+            User, Interview, ArchivedInterview, Resume, UserRoleRollup, QuestionSignature,
+            NonVerbalWindow, IdempotencyRecord, ScoreDistribution,
+        ]
     )
     print("✅ MongoDB Connected Successfully!")
+
+
+async def init_db_with_retry(max_delay: float = 30.0) -> None:
+    """
+    Keep retrying `init_db` with exponential backoff. Runs in the background
+    at startup so a slow or briefly unavailable MongoDB never blocks boot.
+    """
+    delay = 1.0
+    while True:
+        try:
+            await init_db()
+            return
+        except Exception as e:
+            logger.warning("MongoDB init failed (%s); retrying in %.0fs", e, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
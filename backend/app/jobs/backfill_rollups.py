@@ -0,0 +1,167 @@
+"""
+Rebuild every (user, role) analytics rollup from existing interviews, live
+and archived.
+
+Grouping, score averaging and difficulty ranking run server-side in one
+aggregation pipeline per collection over the structured `overall_feedback`
+sub-document; Python merges the live and archived groups and normalises
+weak-area names. Legacy string feedback is migrated first. Safe to re-run:
+each rollup is overwritten, not incremented.
+
+The difficulty reached comes from the live state, or from `final_difficulty`
+on archived interviews. Interviews archived before that field existed fall
+back to the difficulty they started at.
+
+    python -m app.jobs.backfill_rollups
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+from app.models.analytics import UserRoleRollup, DIFFICULTY_RANK, RECENT_SCORES_LIMIT
+from app.models.interview import ArchivedInterview, Interview, InterviewStatus
+from app.jobs.migrate_feedback import migrate_feedback
+from app.services.analytics_service import normalize_area
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_PIPELINE = [
+    {"$match": {
+        "status": InterviewStatus.COMPLETED.value,
+        "user_id": {"$ne": None},
+    }},
+    {"$sort": {"end_time": 1}},
+    {"$project": {
+        "user_id": 1,
+        "role": 1,
+        "session_id": 1,
+        "end_time": 1,
+        "weaknesses": {"$ifNull": ["$overall_feedback.weaknesses", []]},
+        "difficulty": {"$ifNull": [
+            "$current_state.dynamic_difficulty", "$final_difficulty", "$difficulty",
+        ]},
+        "score": {"$convert": {
+            "input": "$overall_feedback.overall_score",
+            "to": "double", "onError": None, "onNull": None,
+        }},
+    }},
+    {"$group": {
+        "_id": {"user_id": "$user_id", "role": "$role"},
+        "interview_count": {"$sum": 1},
+        "score_sum": {"$sum": "$score"},
+        "score_count": {"$sum": {"$cond": [{"$ne": ["$score", None]}, 1, 0]}},
+        "points": {"$push": {"$cond": [
+            {"$ne": ["$score", None]},
+            {"session_id": "$session_id", "score": "$score", "completed_at": "$end_time"},
+            "$$REMOVE",
+        ]}},
+        "difficulties": {"$push": "$difficulty"},
+        "max_difficulty_rank": {"$max": {"$switch": {
+            "branches": [
+                {"case": {"$eq": ["$difficulty", name]}, "then": rank}
+                for name, rank in DIFFICULTY_RANK.items()
+            ],
+            "default": 0,
+        }}},
+        "last_difficulty": {"$last": "$difficulty"},
+        "last_completed_at": {"$last": "$end_time"},
+        "weaknesses": {"$push": "$weaknesses"},
+    }},
+    {"$project": {
+        "interview_count": 1,
+        "score_sum": 1,
+        "score_count": 1,
+        "max_difficulty_rank": 1,
+        "last_difficulty": 1,
+        "last_completed_at": 1,
+        "difficulties": 1,
+        "weaknesses": 1,
+        "recent_scores": {"$slice": ["$points", -RECENT_SCORES_LIMIT]},
+    }},
+]
+
+
+def _merge_groups(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine one (user, role) group from the live and one from the archived collection."""
+    later = max(a, b, key=lambda g: g.get("last_completed_at") or datetime.min)
+    points = sorted(
+        a["recent_scores"] + b["recent_scores"],
+        key=lambda p: p.get("completed_at") or datetime.min,
+    )
+    return {
+        "_id": a["_id"],
+        "interview_count": a["interview_count"] + b["interview_count"],
+        "score_sum": a["score_sum"] + b["score_sum"],
+        "score_count": a["score_count"] + b["score_count"],
+        "max_difficulty_rank": max(a["max_difficulty_rank"], b["max_difficulty_rank"]),
+        "last_difficulty": later.get("last_difficulty"),
+        "last_completed_at": later.get("last_completed_at"),
+        "difficulties": (a.get("difficulties") or []) + (b.get("difficulties") or []),
+        "weaknesses": (a.get("weaknesses") or []) + (b.get("weaknesses") or []),
+        "recent_scores": points[-RECENT_SCORES_LIMIT:],
+    }
+
+
+async def rollup_groups() -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Pipeline groups per (user_id, role), live and archived interviews merged."""
+    groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for model in (Interview, ArchivedInterview):
+        async for group in model.aggregate(ROLLUP_PIPELINE, allowDiskUse=True):
+            key = (group["_id"]["user_id"], group["_id"]["role"])
+            groups[key] = _merge_groups(groups[key], group) if key in groups else group
+    return groups
+
+
+def _fold_group(group: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn one pipeline group into the full rollup field set."""
+    weak_area_counts: Dict[str, int] = {}
+    # One list per interview; count each area at most once per interview
+    for weaknesses in group.get("weaknesses") or []:
+        for area in dict.fromkeys(normalize_area(a) for a in weaknesses or []):
+            if area:
+                weak_area_counts[area] = weak_area_counts.get(area, 0) + 1
+
+    difficulty_counts: Dict[str, int] = {}
+    for d in group.get("difficulties") or []:
+        if d in DIFFICULTY_RANK:
+            difficulty_counts[d] = difficulty_counts.get(d, 0) + 1
+
+    last = group.get("last_difficulty")
+    return {
+        "interview_count": group["interview_count"],
+        "score_sum": group["score_sum"],
+        "score_count": group["score_count"],
+        "recent_scores": group["recent_scores"],
+        "weak_area_counts": weak_area_counts,
+        "difficulty_counts": difficulty_counts,
+        "max_difficulty_rank": group["max_difficulty_rank"],
+        "last_difficulty": last if last in DIFFICULTY_RANK else None,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+async def backfill_rollups() -> int:
+    """Recompute all rollups from live and archived interviews. Returns rollups written."""
+    groups = await rollup_groups()
+    for (user_id, role), group in groups.items():
+        await UserRoleRollup.find_one(
+            UserRoleRollup.user_id == user_id,
+            UserRoleRollup.role == role,
+        ).update({"$set": _fold_group(group)}, upsert=True)
+    return len(groups)
+
+
+async def main() -> None:
+    from app.db.session import init_db
+
+    await init_db()
+    await migrate_feedback()
+    written = await backfill_rollups()
+    logger.info("Backfilled %d analytics rollups", written)
+    print(f"✅ Backfilled {written} analytics rollups")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
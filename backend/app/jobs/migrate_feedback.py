@@ -0,0 +1,41 @@
+"""
+Convert legacy string `overall_feedback` values into structured sub-documents.
+
+Old records are already migrated lazily (decoded on load, written back in the
+new shape on the next save). This job finishes the job eagerly so that
+server-side queries on `overall_feedback.overall_score` see every interview.
+
+    python -m app.jobs.migrate_feedback
+"""
+import asyncio
+import logging
+
+from app.models.interview import Interview
+
+logger = logging.getLogger(__name__)
+
+LEGACY_FEEDBACK_FILTER = {"overall_feedback": {"$type": "string"}}
+
+
+async def migrate_feedback(batch_size: int = 200) -> int:
+    """Rewrite every string feedback as a sub-document. Returns documents updated."""
+    migrated = 0
+    # Loading runs the model validator, which decodes the legacy string.
+    async for interview in Interview.find(LEGACY_FEEDBACK_FILTER, batch_size=batch_size):
+        await interview.set({"overall_feedback": interview.overall_feedback.model_dump()})
+        migrated += 1
+    return migrated
+
+
+async def main() -> None:
+    from app.db.session import init_db
+
+    await init_db()
+    migrated = await migrate_feedback()
+    logger.info("Migrated %d interview feedback records", migrated)
+    print(f"✅ Migrated {migrated} interview feedback records")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
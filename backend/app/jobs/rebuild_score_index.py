@@ -0,0 +1,90 @@
+"""
+Rebuild every (role, difficulty) score histogram from completed interviews,
+live and archived, in one aggregation pass per collection.
+
+Binning runs server-side: each collection is grouped by (role, difficulty,
+score bin). Python merges role spellings that normalise to the same key and
+overwrites the stored histograms. Histograms that no longer have any
+interviews are deleted. Completions that land while the job runs can be
+double counted or lost, so run it when traffic is quiet, as with
+`backfill_rollups`.
+
+    python -m app.jobs.rebuild_score_index
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Tuple
+
+from app.models.analytics import ScoreDistribution
+from app.models.interview import ArchivedInterview, Interview, InterviewStatus
+from app.services.score_index import (
+    BINS, RESOLUTION, SCORE_MAX, difficulty_key, role_key,
+)
+
+logger = logging.getLogger(__name__)
+
+SCORE_BIN_PIPELINE = [
+    {"$match": {
+        "status": InterviewStatus.COMPLETED.value,
+        "overall_feedback.auto_completed": {"$ne": True},
+    }},
+    {"$project": {
+        "role": 1,
+        "difficulty": 1,
+        "score": {"$convert": {
+            "input": "$overall_feedback.overall_score",
+            "to": "double", "onError": None, "onNull": None,
+        }},
+    }},
+    {"$match": {"score": {"$ne": None}}},
+    {"$group": {
+        "_id": {
+            "role": "$role",
+            "difficulty": "$difficulty",
+            "bin": {"$round": [
+                {"$multiply": [{"$min": [{"$max": ["$score", 0]}, SCORE_MAX]}, RESOLUTION]}, 0,
+            ]},
+        },
+        "count": {"$sum": 1},
+    }},
+]
+
+
+async def rebuild_score_index() -> int:
+    """Recompute all score histograms. Returns histograms written."""
+    histograms: Dict[Tuple[str, str], Dict[str, int]] = {}
+    for model in (Interview, ArchivedInterview):
+        async for group in model.aggregate(SCORE_BIN_PIPELINE, allowDiskUse=True):
+            key = group["_id"]
+            index = min(max(int(key["bin"]), 0), BINS - 1)
+            bins = histograms.setdefault(
+                (role_key(key["role"]), difficulty_key(key["difficulty"])), {}
+            )
+            bins[str(index)] = bins.get(str(index), 0) + group["count"]
+
+    now = datetime.utcnow()
+    for (role, difficulty), bins in histograms.items():
+        await ScoreDistribution.find_one(
+            ScoreDistribution.role == role, ScoreDistribution.difficulty == difficulty
+        ).update(
+            {"$set": {"bins": bins, "total": sum(bins.values()), "updated_at": now}},
+            upsert=True,
+        )
+    # Anything not rewritten above has no completed interviews left
+    await ScoreDistribution.find(ScoreDistribution.updated_at < now).delete()
+    return len(histograms)
+
+
+async def main() -> None:
+    from app.db.session import init_db
+
+    await init_db()
+    written = await rebuild_score_index()
+    logger.info("Rebuilt %d score histograms", written)
+    print(f"✅ Rebuilt {written} score histograms")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""
+Re-grade answers that were scored by the local heuristic evaluator.
+
+When Gemini misses the per-turn latency budget, `/chat` scores the answer
+locally and flags it `needs_rescore`. This job asks Gemini again, at
+background priority, and overwrites the provisional score. Answers Gemini
+still can't grade stay flagged for the next run. Adaptive difficulty for
+past turns is not replayed. Only completed interviews are re-graded: while
+one is in progress, each turn writes back the whole interview document and
+would undo the new score, so its answers wait for a run after it finishes.
+
+Where the overall score is the average of the answer scores (abandoned
+interviews, and final feedback Gemini could not write), it is recomputed
+too. If any overall score changed, the score percentile index and the
+analytics rollups are rebuilt afterwards (see `rebuild_score_index` and
+`backfill_rollups`), so run this when traffic is quiet as well. Overall
+scores Gemini wrote itself are a holistic judgement and are kept.
+
+    python -m app.jobs.rescore_answers
+"""
+import asyncio
+import logging
+from typing import Any, Optional
+
+from app.jobs.backfill_rollups import backfill_rollups
+from app.jobs.rebuild_score_index import rebuild_score_index
+from app.models.interview import Interview, InterviewStatus
+from app.services.llm_queue import Priority
+from app.services.llm_service import llm_service
+
+logger = logging.getLogger(__name__)
+
+RESCORE_FILTER = {
+    "status": InterviewStatus.COMPLETED.value,
+    "questions.answer.needs_rescore": True,
+}
+
+
+def rescored_overall(interview: Any) -> Optional[float]:
+    """
+    The new overall score of `interview` if it is the average of its answer
+    scores and that average has changed, else None.
+    """
+    feedback = interview.overall_feedback
+    if feedback is None or feedback.overall_score is None:
+        return None
+    extra = feedback.model_extra or {}
+    if not (extra.get("score_from_answers") or extra.get("auto_completed")):
+        return None
+    scores = [
+        q.answer.ai_score for q in interview.questions
+        if q.answer is not None and q.answer.ai_score is not None
+    ]
+    if not scores:
+        return None
+    average = round(sum(scores) / len(scores), 1)
+    return average if average != feedback.overall_score else None
+
+
+async def rescore_answers(batch_size: int = 50, concurrency: int = 4) -> int:
+    """Re-grade every flagged answer. Returns answers rescored."""
+    limit = asyncio.Semaphore(concurrency)
+    rescored = 0
+    overall_changed = 0
+
+    async def grade(interview: Interview, position: int) -> None:
+        nonlocal rescored
+        question = interview.questions[position]
+        async with limit:
+            evaluation = await llm_service.try_evaluate_answer(
+                interview.role, interview.difficulty, "technical_deep_dive",
+                question.order, [], [], question.content, question.answer.content,
+                Priority.BACKGROUND,
+            )
+        if evaluation is None:
+            return
+        # Targeted $set: the other writes to a completed interview (final state
+        # clear, completion itself) are targeted too, so neither undoes the other
+        await interview.set({
+            f"questions.{position}.answer.ai_score": float(evaluation["score"]),
+            f"questions.{position}.answer.needs_rescore": False,
+        })
+        question.answer.ai_score = float(evaluation["score"])
+        question.answer.needs_rescore = False
+        rescored += 1
+
+    async for interview in Interview.find(RESCORE_FILTER, batch_size=batch_size):
+        await asyncio.gather(*(
+            grade(interview, position)
+            for position, q in enumerate(interview.questions)
+            if q.answer is not None and q.answer.needs_rescore
+        ))
+        overall = rescored_overall(interview)
+        if overall is not None:
+            await interview.set({"overall_feedback.overall_score": overall})
+            overall_changed += 1
+
+    if overall_changed:
+        logger.info("%d overall scores changed; rebuilding score index and rollups", overall_changed)
+        await rebuild_score_index()
+        await backfill_rollups()
+    return rescored
+
+
+async def main() -> None:
+    from app.db.session import init_db
+
+    await init_db()
+    rescored = await rescore_answers()
+    logger.info("Rescored %d answers", rescored)
+    print(f"✅ Rescored {rescored} answers")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
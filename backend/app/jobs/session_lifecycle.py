@@ -0,0 +1,30 @@
+"""
+Close abandoned interviews and archive old completed ones
+(see app.services.session_lifecycle). Safe to run from cron as often as
+you like; each run only touches sessions past the configured ages.
+
+    python -m app.jobs.session_lifecycle
+"""
+import asyncio
+import logging
+
+from app.services.session_lifecycle import session_lifecycle
+
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    from app.db.session import init_db
+
+    await init_db()
+    counts = await session_lifecycle.sweep()
+    logger.info("Session lifecycle sweep: %s", counts)
+    print(
+        f"✅ Auto-completed {counts['auto_completed']}, expired {counts['expired']}, "
+        f"archived {counts['archived']} sessions"
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
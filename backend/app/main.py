@@ -1,18 +1,42 @@
+import asyncio
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.compression import CompressionMiddleware
+from app.core import metrics
+from app.core.profiling import ProfilingMiddleware
 from app.core.config import settings
-from app.db.session import init_db
-from app.api.endpoints import interview, auth, resume
+from app.core.readiness import readiness
+from app.core.serialization import ORJSONResponse
+from app.db.session import init_db_with_retry
+from app.api import deps
+from app.api.endpoints import interview, auth, resume, admin
+from app.services.gemini_client import gemini_clients
+from app.services.session_lifecycle import session_lifecycle
+from app.services.session_service import session_service
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Connect to MongoDB and initialise Beanie on startup."""
-    await init_db()
+    """
+    Start MongoDB init and Gemini warm-up in the background and begin serving
+    at once: /health answers immediately, /ready reports when both are warm,
+    and API requests wait for the database (see deps.require_database).
+    """
+    readiness.start("database", init_db_with_retry())
+    readiness.start("gemini", gemini_clients.warm_up())
+    sweeper = None
+    if settings.SESSION_LIFECYCLE_INTERVAL_SECONDS > 0:
+        sweeper = asyncio.create_task(
+            session_lifecycle.run_forever(settings.SESSION_LIFECYCLE_INTERVAL_SECONDS)
+        )
     yield
+    if sweeper:
+        sweeper.cancel()
+    readiness.reset()
+    await gemini_clients.aclose()
     # (Motor handles connection cleanup automatically on process exit)
 
 
@@ -23,8 +47,13 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+# Marks requests chosen for route-scoped profiling; a pass-through otherwise
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
 # CORS Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -34,9 +63,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(interview.router, prefix="/api/interview", tags=["interview"])
-app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
-app.include_router(resume.router, prefix="/api/resume", tags=["resume"])
+_db_ready = [Depends(deps.require_database)]
+# Interview turns on the in-memory store (tests, load benchmarks) don't touch MongoDB
+_interview_deps = _db_ready if session_service.store.requires_database else []
+app.include_router(interview.router, prefix="/api/interview", tags=["interview"], dependencies=_interview_deps)
+app.include_router(auth.router, prefix="/api/auth", tags=["auth"], dependencies=_db_ready)
+app.include_router(resume.router, prefix="/api/resume", tags=["resume"], dependencies=_db_ready)
+app.include_router(
+    admin.router, prefix="/api/admin", tags=["admin"],
+    dependencies=_db_ready + [Depends(deps.require_admin)],
+)
 
 
 @app.get("/health")
@@ -49,6 +85,22 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once MongoDB and Gemini are warm, 503 until then."""
+    ready = readiness.is_ready()
+    return ORJSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "components": readiness.status()},
+    )
+
+
+@app.get("/metrics", dependencies=[Depends(deps.require_admin)])
+async def runtime_metrics():
+    """Process-local runtime statistics (Gemini connection pool, …); admins only."""
+    return metrics.snapshot()
+
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to SayLO AI Backend"}
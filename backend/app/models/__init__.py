@@ -1,3 +1,10 @@
 from .user import User
-from .interview import Interview, Question, Answer, InterviewStatus
+from .interview import (
+    Interview, Question, Answer, InterviewStatus, FinalFeedback, InterviewSummary,
+    ArchivedInterview,
+)
 from .resume import Resume
+from .analytics import UserRoleRollup, ScorePoint
+from .question_index import QuestionSignature
+from .non_verbal import NonVerbalWindow
+from .idempotency import IdempotencyRecord
@@ -0,0 +1,70 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pymongo
+from beanie import Document
+from pydantic import BaseModel, Field
+
+# Ordinal rank of each difficulty level, used for "highest difficulty reached"
+DIFFICULTY_RANK = {"easy": 1, "medium": 2, "hard": 3}
+
+# How many per-interview scores each rollup keeps for the progress chart
+RECENT_SCORES_LIMIT = 50
+
+
+class ScorePoint(BaseModel):
+    """Overall score of one completed interview."""
+    session_id: str
+    score: float
+    completed_at: datetime
+
+
+class UserRoleRollup(Document):
+    """
+    Running performance totals for one (user, role) pair.
+    Updated incrementally when an interview completes, so analytics never
+    has to scan the `interviews` collection.
+    """
+    user_id: str
+    role: str
+    interview_count: int = 0
+    score_sum: float = 0.0
+    score_count: int = 0
+    recent_scores: List[ScorePoint] = []       # Capped, oldest first
+    weak_area_counts: Dict[str, int] = {}      # Normalised area → times flagged
+    difficulty_counts: Dict[str, int] = {}     # Final difficulty → interviews
+    max_difficulty_rank: int = 0               # 1=easy, 2=medium, 3=hard
+    last_difficulty: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "user_role_rollups"
+        indexes = [
+            pymongo.IndexModel(
+                [("user_id", pymongo.ASCENDING), ("role", pymongo.ASCENDING)],
+                unique=True,
+            ),
+        ]
+
+
+class ScoreDistribution(Document):
+    """
+    Overall-score histogram of every completed interview for one (role,
+    difficulty): bin i counts scores that round to i / 10. Bins are additive,
+    so completions on any worker fold in with an atomic `$inc`, and a rebuild
+    simply overwrites them (see app.services.score_index).
+    """
+    role: str                                  # Normalised role name
+    difficulty: str
+    bins: Dict[str, int] = {}                  # Bin index → interviews; empty bins omitted
+    total: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "score_distributions"
+        indexes = [
+            pymongo.IndexModel(
+                [("role", pymongo.ASCENDING), ("difficulty", pymongo.ASCENDING)],
+                unique=True,
+            ),
+        ]
@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+import pymongo
+from beanie import Document
+from pydantic import Field
+
+
+class IdempotencyRecord(Document):
+    """
+    Outcome of a turn request sent with an `Idempotency-Key`
+    (see app.services.idempotency). MongoDB's TTL monitor deletes records
+    once `expires_at` has passed.
+    """
+    key: str                                # "<path>:<Idempotency-Key>"
+    fingerprint: str                        # Hash of the request payload
+    state: str = "in_progress"              # "in_progress" | "done"
+    locked_until: datetime                  # An in-progress claim is abandoned after this
+    expires_at: datetime
+    status_code: Optional[int] = None
+    body: Optional[bytes] = None
+    headers: Dict[str, str] = {}
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "idempotency_keys"
+        indexes = [
+            pymongo.IndexModel([("key", pymongo.ASCENDING)], unique=True),
+            pymongo.IndexModel([("expires_at", pymongo.ASCENDING)], expireAfterSeconds=0),
+        ]
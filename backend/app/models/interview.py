@@ -1,9 +1,12 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Optional, List
 import enum
+import json
+import zlib
 
+import pymongo
 from beanie import Document
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator
 
 
 class InterviewStatus(str, enum.Enum):
@@ -19,6 +22,8 @@ class Answer(BaseModel):
     audio_url: Optional[str] = None
     ai_feedback: Optional[str] = None
     ai_score: Optional[float] = None
+    # Scored by the local heuristic fallback; re-grade with the LLM later
+    needs_rescore: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -30,6 +35,50 @@ class Question(BaseModel):
     answer: Optional[Answer] = None
 
 
+class FinalFeedback(BaseModel):
+    """End-of-interview feedback, stored as a queryable sub-document."""
+    model_config = ConfigDict(extra="allow")  # Keep any extra keys the model returns
+
+    overall_score: Optional[float] = None
+    strengths: List[str] = []
+    weaknesses: List[str] = []
+    difficulty_trend: Optional[str] = None
+    improvement_tips: List[str] = []
+    final_verdict: Optional[str] = None
+
+    @field_validator("overall_score", mode="before")
+    @classmethod
+    def _score_or_none(cls, v: Any) -> Any:
+        try:
+            return float(v) if v is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    @field_validator("strengths", "weaknesses", "improvement_tips", mode="before")
+    @classmethod
+    def _as_str_list(cls, v: Any) -> Any:
+        if v is None:
+            return []
+        if isinstance(v, (str, int, float)):
+            return [str(v)]
+        return [str(item) for item in v]
+
+    @classmethod
+    def from_legacy(cls, value: Any) -> Any:
+        """
+        Older interviews stored `json.dumps(feedback)` as a plain string.
+        Decode it so those records load as sub-documents; saving such a
+        record again writes the structured form (lazy migration).
+        """
+        if not isinstance(value, str):
+            return value
+        try:
+            decoded = json.loads(value)
+        except ValueError:
+            return {"final_verdict": value}
+        return decoded if isinstance(decoded, dict) else {"final_verdict": value}
+
+
 # ── Top-level MongoDB document ──────────────────────────────────────────────
 
 class Interview(Document):
@@ -46,8 +95,110 @@ class Interview(Document):
     current_state: Optional[dict] = None    # Dynamic interview state blob
     questions: List[Question] = []
     start_time: datetime = Field(default_factory=datetime.utcnow)
+    # Bumped on every turn; idle IN_PROGRESS sessions are closed by the
+    # lifecycle sweep (app.services.session_lifecycle)
+    last_activity_at: datetime = Field(default_factory=datetime.utcnow)
     end_time: Optional[datetime] = None
-    overall_feedback: Optional[str] = None
+    overall_feedback: Optional[FinalFeedback] = None
+
+    @field_validator("overall_feedback", mode="before")
+    @classmethod
+    def _migrate_string_feedback(cls, v: Any) -> Any:
+        return FinalFeedback.from_legacy(v)
 
     class Settings:
         name = "interviews"
+        indexes = [
+            "session_id",
+            # Lifecycle sweeps: idle IN_PROGRESS sessions, old COMPLETED ones
+            pymongo.IndexModel([("status", pymongo.ASCENDING), ("last_activity_at", pymongo.ASCENDING)]),
+            pymongo.IndexModel([("status", pymongo.ASCENDING), ("end_time", pymongo.ASCENDING)]),
+            # Per-user export / listing in (start_time, session_id) keyset order
+            pymongo.IndexModel([
+                ("user_id", pymongo.ASCENDING),
+                ("start_time", pymongo.ASCENDING),
+                ("session_id", pymongo.ASCENDING),
+            ]),
+        ]
+
+
+_QUESTIONS = TypeAdapter(List[Question])
+
+
+class ArchivedInterview(Document):
+    """
+    A completed interview moved out of the hot `interviews` collection.
+    The state blob is dropped (only the difficulty reached is kept, for
+    analytics backfills) and questions/answers are stored as one
+    zlib-compressed JSON blob; `questions` decodes it on access, so archived
+    records can be read anywhere an `Interview` is expected.
+    """
+    session_id: str
+    user_id: Optional[str] = None
+    role: str
+    difficulty: str
+    topic: Optional[str] = "General"
+    status: InterviewStatus = InterviewStatus.COMPLETED
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    overall_feedback: Optional[FinalFeedback] = None
+    final_difficulty: Optional[str] = None  # current_state.dynamic_difficulty at archive time
+    transcript: bytes = b""
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
+
+    @classmethod
+    def from_interview(cls, interview: Any) -> "ArchivedInterview":
+        return cls(
+            session_id=interview.session_id,
+            user_id=interview.user_id,
+            role=interview.role,
+            difficulty=interview.difficulty,
+            topic=interview.topic,
+            status=interview.status,
+            start_time=interview.start_time,
+            end_time=interview.end_time,
+            overall_feedback=interview.overall_feedback,
+            final_difficulty=(interview.current_state or {}).get("dynamic_difficulty"),
+            transcript=zlib.compress(_QUESTIONS.dump_json(interview.questions), 6),
+        )
+
+    @property
+    def questions(self) -> List[Question]:
+        return _QUESTIONS.validate_json(zlib.decompress(self.transcript)) if self.transcript else []
+
+    @property
+    def current_state(self) -> None:
+        return None
+
+    class Settings:
+        name = "interviews_archive"
+        indexes = [
+            pymongo.IndexModel([("session_id", pymongo.ASCENDING)], unique=True),
+            pymongo.IndexModel([
+                ("user_id", pymongo.ASCENDING),
+                ("start_time", pymongo.ASCENDING),
+                ("session_id", pymongo.ASCENDING),
+            ]),
+        ]
+
+
+class InterviewSummary(BaseModel):
+    """Projection used by history listings — never loads questions or state."""
+    session_id: str
+    role: str
+    difficulty: str
+    status: InterviewStatus = InterviewStatus.IN_PROGRESS
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    overall_score: Optional[float] = None
+
+    class Settings:
+        projection = {
+            "session_id": 1,
+            "role": 1,
+            "difficulty": 1,
+            "status": 1,
+            "start_time": 1,
+            "end_time": 1,
+            "overall_score": "$overall_feedback.overall_score",
+        }
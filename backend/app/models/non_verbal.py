@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+import pymongo
+from beanie import Document
+from pydantic import Field
+
+
+class NonVerbalWindow(Document):
+    """
+    Aggregated frame-level non-verbal signals for one answer of a session.
+    Raw frames are never stored. `moments` (channel -> count, missing, sum,
+    sumsq, min, max) and `histogram` (channel -> bin -> frames) are updated in
+    place with $inc/$min/$max (see app.services.non_verbal.WindowStats);
+    `stats` holds the packed moments and histograms of windows written before
+    that, and is folded in on read.
+    """
+    session_id: str
+    question: int  # Order of the question being answered (1-based)
+    moments: Dict[str, Dict[str, float]] = Field(default_factory=dict)
+    histogram: Dict[str, Dict[str, int]] = Field(default_factory=dict)
+    stats: Optional[bytes] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "non_verbal_windows"
+        indexes = [
+            pymongo.IndexModel(
+                [("session_id", pymongo.ASCENDING), ("question", pymongo.ASCENDING)],
+                unique=True,
+            ),
+        ]
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+import pymongo
+from beanie import Document
+from pydantic import BaseModel, Field
+
+
+class QuestionSignature(Document):
+    """
+    MinHash signature of one question asked to a user, used to avoid asking
+    near-identical questions again in later sessions
+    (see app.services.question_index).
+    """
+    user_id: str
+    signature: bytes  # NUM_PERM little-endian uint32 values
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "question_signatures"
+        indexes = [
+            pymongo.IndexModel([("user_id", pymongo.ASCENDING), ("created_at", pymongo.ASCENDING)]),
+        ]
+
+
+class SignatureView(BaseModel):
+    """Projection that loads only the signature bytes."""
+    signature: bytes
@@ -0,0 +1,19 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+class ProfilerStartRequest(BaseModel):
+    seconds: float = Field(30.0, gt=0)
+    interval_ms: Optional[float] = Field(None, ge=1)
+    # Profile only requests to this path (and below it), a sample_rate share of them
+    route: Optional[str] = None
+    sample_rate: float = Field(1.0, gt=0, le=1)
+
+
+class HookToggleRequest(BaseModel):
+    enable: List[str] = []
+    disable: List[str] = []
+
+
+class HookAttachRequest(BaseModel):
+    target: str  # "app.module:function" or "app.module:Class.method"
@@ -1,5 +1,8 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
+
+from app.core.serialization import ResponseAdapter
 
 
 class StartInterviewRequest(BaseModel):
@@ -28,3 +31,64 @@ class FeedbackResponse(BaseModel):
     next_question: Optional[str] = None
     is_completed: bool = False
     final_feedback_data: Optional[Dict[str, Any]] = None  # Full Gemini feedback JSON on completion
+
+
+class InterviewHistoryItem(BaseModel):
+    id: str
+    role: str
+    difficulty: str
+    status: str
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    overall_score: Optional[float] = None
+
+
+class ScorePointResponse(BaseModel):
+    session_id: str
+    score: float
+    completed_at: datetime
+
+
+class WeakAreaCount(BaseModel):
+    area: str
+    count: int
+
+
+class RoleAnalytics(BaseModel):
+    role: str
+    interview_count: int
+    average_score: Optional[float] = None
+    score_trend: List[ScorePointResponse] = []   # Oldest first
+    top_weak_areas: List[WeakAreaCount] = []
+    max_difficulty: Optional[str] = None
+    last_difficulty: Optional[str] = None
+    difficulty_counts: Dict[str, int] = {}
+
+
+class AnalyticsResponse(BaseModel):
+    user_id: str
+    total_interviews: int
+    average_score: Optional[float] = None
+    top_weak_areas: List[WeakAreaCount] = []
+    roles: List[RoleAnalytics] = []
+
+
+class GradeItem(BaseModel):
+    role: str
+    difficulty: str
+    question: str
+    answer: str
+    id: Optional[str] = None  # Caller's reference, echoed back in the result
+
+
+class BatchGradeRequest(BaseModel):
+    items: List[GradeItem] = Field(..., min_length=1)
+    pack_size: Optional[int] = Field(None, ge=1, le=10)  # Answers per prompt
+
+
+# ── Precompiled serializers (see app.core.serialization) ───────────────────
+
+INTERVIEW_RESPONSE = ResponseAdapter(InterviewResponse)
+FEEDBACK_RESPONSE = ResponseAdapter(FeedbackResponse)
+HISTORY_RESPONSE = ResponseAdapter(List[InterviewHistoryItem])
+ANALYTICS_RESPONSE = ResponseAdapter(AnalyticsResponse)
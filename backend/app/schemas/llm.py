@@ -0,0 +1,39 @@
+"""
+Structured outputs requested from Gemini. Each model is sent as the call's
+`response_schema` and the reply is validated straight into it
+(see LLMService._generate_structured).
+"""
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class AnswerEvaluation(BaseModel):
+    score: float = Field(..., ge=1, le=10)
+    classification: Literal["strong", "weak"]
+    critical_mistake: Optional[str] = None
+    difficulty_trend: Literal["upgrade", "downgrade", "stable"] = "stable"
+    next_focus: str
+    stage_change: Optional[Literal["technical_deep_dive", "soft_skills", "closing"]] = None
+    end_interview: bool = False
+
+
+class SpokenAnswerEvaluation(AnswerEvaluation):
+    transcript: str  # What the candidate said, transcribed from the attached audio
+
+
+class PackedEvaluation(AnswerEvaluation):
+    item: int = Field(..., ge=1)  # 1-based position in the packed prompt
+
+
+class PackedEvaluations(BaseModel):
+    results: List[PackedEvaluation]
+
+
+class FinalFeedbackReport(BaseModel):
+    overall_score: float = Field(..., ge=1, le=10)
+    strengths: List[str]
+    weaknesses: List[str]
+    difficulty_trend: Literal["improved", "stable", "declined"]
+    improvement_tips: List[str]
+    final_verdict: str
@@ -0,0 +1,177 @@
+"""
+Production entry point: one uvicorn worker process per available CPU.
+
+    cd backend && python -m app.server [--workers N] [--port 8000] [--check]
+
+Uses uvloop and httptools when they are installed. Keep-alive and the
+listen backlog are tuned for running behind a load balancer. On SIGTERM each
+worker stops accepting connections and gives in-flight interview turns up to
+SERVER_GRACEFUL_SHUTDOWN_SECONDS to finish. The configuration is checked
+before any worker starts: errors abort startup unless `--force` is given,
+and `--check` prints the report without starting.
+(`run_server.bat` remains the single-process `--reload` launcher for local
+development.)
+"""
+import argparse
+import importlib.util
+import logging
+import math
+import os
+import sys
+from typing import Any, Dict, List, Tuple
+
+from app.core.config import settings
+from app.services.model_router import TASKS
+
+logger = logging.getLogger(__name__)
+
+APP = "app.main:app"
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: affinity mask, capped by a cgroup v2 quota."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:  # Windows / macOS
+        count = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            count = min(count, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def build_config(host: str, port: int, workers: int = 0) -> Dict[str, Any]:
+    """Keyword arguments for `uvicorn.run`; `workers=0` sizes to the CPUs."""
+    return {
+        "host": host,
+        "port": port,
+        # Async workers: the event loop overlaps LLM waits, so one per core
+        "workers": workers or available_cpus(),
+        "loop": "uvloop" if _installed("uvloop") else "asyncio",
+        "http": "httptools" if _installed("httptools") else "h11",
+        "backlog": settings.SERVER_BACKLOG,
+        "timeout_keep_alive": settings.SERVER_KEEPALIVE_SECONDS,
+        "timeout_graceful_shutdown": settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        # Client addresses (and so per-IP rate limits) from the trusted proxy's headers
+        "proxy_headers": True,
+        "forwarded_allow_ips": settings.FORWARDED_ALLOW_IPS,
+        "access_log": settings.SERVER_ACCESS_LOG,
+    }
+
+
+def _somaxconn() -> int:
+    try:
+        with open("/proc/sys/net/core/somaxconn") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return 0
+
+
+def self_check(config: Dict[str, Any]) -> List[Tuple[int, str]]:
+    """Return (logging level, message) findings about a server configuration."""
+    findings: List[Tuple[int, str]] = []
+    workers = config["workers"]
+    cpus = available_cpus()
+
+    if workers > 1 and settings.SESSION_BACKEND == "memory":
+        findings.append((logging.ERROR,
+            f"SESSION_BACKEND=memory with {workers} workers: each worker keeps its own "
+            "sessions, so turns routed to another worker will 404. Use mongo or 1 worker."))
+    if workers > cpus:
+        findings.append((logging.WARNING,
+            f"{workers} workers on {cpus} available CPUs; extra workers only add "
+            "context switching and memory."))
+    if config["loop"] != "uvloop":
+        findings.append((logging.WARNING, "uvloop not installed; using the asyncio event loop."))
+    if config["http"] != "httptools":
+        findings.append((logging.WARNING, "httptools not installed; using the h11 HTTP parser."))
+
+    somaxconn = _somaxconn()
+    if somaxconn and config["backlog"] > somaxconn:
+        findings.append((logging.WARNING,
+            f"SERVER_BACKLOG={config['backlog']} exceeds net.core.somaxconn={somaxconn}; "
+            "the kernel silently caps it."))
+    if config["timeout_graceful_shutdown"] < settings.LLM_QUEUE_SLA_SECONDS:
+        findings.append((logging.WARNING,
+            f"SERVER_GRACEFUL_SHUTDOWN_SECONDS={config['timeout_graceful_shutdown']} is "
+            f"shorter than LLM_QUEUE_SLA_SECONDS={settings.LLM_QUEUE_SLA_SECONDS:g}; "
+            "admitted turns may be cut off on shutdown."))
+    if settings.GEMINI_MAX_CONNECTIONS < settings.LLM_MAX_CONCURRENCY:
+        findings.append((logging.WARNING,
+            f"GEMINI_MAX_CONNECTIONS={settings.GEMINI_MAX_CONNECTIONS} < "
+            f"LLM_MAX_CONCURRENCY={settings.LLM_MAX_CONCURRENCY}; admitted calls will "
+            "queue again on the connection pool."))
+    if workers > 1:
+        findings.append((logging.WARNING,
+            f"Rate-limit buckets are per worker: with {workers} workers a user or IP gets up "
+            f"to {workers}× RATE_LIMIT_USER_PER_MINUTE={settings.RATE_LIMIT_USER_PER_MINUTE:g} "
+            f"and RATE_LIMIT_IP_PER_MINUTE={settings.RATE_LIMIT_IP_PER_MINUTE:g}. Divide "
+            "the limits by the worker count to keep the intended totals."))
+    if workers > 1 and settings.SESSION_LIFECYCLE_INTERVAL_SECONDS > 0:
+        findings.append((logging.WARNING,
+            f"SESSION_LIFECYCLE_INTERVAL_SECONDS is set with {workers} workers: every worker "
+            "sweeps, and an idle session can be auto-completed twice. Run "
+            "`python -m app.jobs.session_lifecycle` from cron instead."))
+    unrouted = [task for task in TASKS if not settings.MODEL_ROUTES.get(task)]
+    if unrouted:
+        findings.append((logging.ERROR,
+            f"MODEL_ROUTES has no models for {', '.join(unrouted)}; those Gemini calls "
+            "will fail."))
+    if settings.GEMINI_FAKE_LATENCY_MS is not None:
+        findings.append((logging.WARNING,
+            "GEMINI_FAKE_LATENCY_MS is set: Gemini calls are answered by the load-test stand-in."))
+
+    # LLM slots and rate-limit buckets live in each worker process
+    findings.append((logging.INFO,
+        f"{workers} worker(s) × LLM_MAX_CONCURRENCY={settings.LLM_MAX_CONCURRENCY} "
+        f"= up to {workers * settings.LLM_MAX_CONCURRENCY} concurrent Gemini calls; "
+        "per-user/IP rate limits apply per worker."))
+    return findings
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the SayLO API in production mode.")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    # Hosting platforms (Render, Heroku, …) assign the port through $PORT
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", settings.SERVER_PORT)))
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS,
+                        help="worker processes (0 = one per available CPU)")
+    parser.add_argument("--check", action="store_true", help="print the self-check and exit")
+    parser.add_argument("--force", action="store_true", help="start even if the self-check fails")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    logger.setLevel(logging.INFO)
+    config = build_config(args.host, args.port, args.workers)
+    findings = self_check(config)
+
+    logger.info(
+        "Server config: %s",
+        ", ".join(f"{k}={v}" for k, v in config.items() if k not in ("host", "port")),
+    )
+    for level, message in findings:
+        logger.log(level, message)
+    failed = any(level >= logging.ERROR for level, _ in findings)
+
+    if args.check:
+        return 1 if failed else 0
+    if failed and not args.force:
+        logger.error("Self-check failed; not starting (use --force to override).")
+        return 1
+
+    import uvicorn
+
+    uvicorn.run(APP, **config)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.models.analytics import ScorePoint, DIFFICULTY_RANK
+from app.services.session_store import SessionStore
+
+_RANK_TO_DIFFICULTY = {rank: name for name, rank in DIFFICULTY_RANK.items()}
+_AREA_UNSAFE = re.compile(r"[.$]")
+_WHITESPACE = re.compile(r"\s+")
+_MAX_AREA_LEN = 80
+
+
+def normalize_area(area: str) -> str:
+    """
+    Canonical key for a weak/strong area so "Caching " and "caching" count
+    together. Dots and '$' are stripped because the key becomes a MongoDB
+    field name inside `weak_area_counts`.
+    """
+    area = _AREA_UNSAFE.sub("", str(area))
+    return _WHITESPACE.sub(" ", area).strip().lower()[:_MAX_AREA_LEN]
+
+
+class AnalyticsService:
+    """
+    Per-user progress analytics served from (user, role) rollups.
+    Rollups are folded in by `record_completion` when an interview ends,
+    so reads never touch the interviews themselves.
+    """
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+
+    async def record_completion(
+        self,
+        user_id: str,
+        role: str,
+        session_id: str,
+        final_feedback: Dict[str, Any],
+        state: Optional[Dict[str, Any]],
+        completed_at: Optional[datetime] = None,
+    ) -> None:
+        """Fold one completed interview into the user's rollup for its role."""
+        state = state or {}
+        point = None
+        score = _as_float(final_feedback.get("overall_score"))
+        if score is not None:
+            point = ScorePoint(
+                session_id=session_id,
+                score=score,
+                completed_at=completed_at or datetime.utcnow(),
+            )
+
+        raw_areas = final_feedback.get("weaknesses") or (
+            state.get("performance_profile", {}).get("weak_areas") or []
+        )
+        # Count each area at most once per interview
+        weak_areas = list(dict.fromkeys(
+            key for key in (normalize_area(a) for a in raw_areas) if key
+        ))
+
+        difficulty = state.get("dynamic_difficulty")
+        if difficulty not in DIFFICULTY_RANK:
+            difficulty = None
+
+        await self.store.apply_rollup(user_id, role, point, weak_areas, difficulty)
+
+    async def get_user_analytics(self, user_id: str, top_n: int = 5) -> Dict[str, Any]:
+        """Build the analytics payload for a user from their rollups."""
+        rollups = sorted(await self.store.load_rollups(user_id), key=lambda r: r.role)
+
+        roles = []
+        overall_weak: Dict[str, int] = {}
+        total_interviews = 0
+        total_score = 0.0
+        total_scored = 0
+        for r in rollups:
+            total_interviews += r.interview_count
+            total_score += r.score_sum
+            total_scored += r.score_count
+            for area, count in r.weak_area_counts.items():
+                overall_weak[area] = overall_weak.get(area, 0) + count
+
+            roles.append({
+                "role": r.role,
+                "interview_count": r.interview_count,
+                "average_score": _avg(r.score_sum, r.score_count),
+                "score_trend": [p.model_dump() for p in r.recent_scores],
+                "top_weak_areas": _top(r.weak_area_counts.items(), top_n),
+                "max_difficulty": _RANK_TO_DIFFICULTY.get(r.max_difficulty_rank),
+                "last_difficulty": r.last_difficulty,
+                "difficulty_counts": dict(r.difficulty_counts),
+            })
+
+        return {
+            "user_id": user_id,
+            "total_interviews": total_interviews,
+            "average_score": _avg(total_score, total_scored),
+            "top_weak_areas": _top(overall_weak.items(), top_n),
+            "roles": roles,
+        }
+
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _avg(total: float, count: int) -> Optional[float]:
+    return round(total / count, 1) if count else None
+
+
+def _top(counts: Iterable[tuple], n: int) -> List[Dict[str, Any]]:
+    ranked = sorted(counts, key=lambda kv: (-kv[1], kv[0]))[:n]
+    return [{"area": area, "count": count} for area, count in ranked]
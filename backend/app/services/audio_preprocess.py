@@ -0,0 +1,217 @@
+"""
+Energy-based voice-activity trimming for uncompressed (WAV / raw PCM) answers.
+
+Before a recording is sent for transcription it is decoded with NumPy,
+downmixed to mono, and split into short frames. Frames louder than an
+adaptive threshold (noise floor + margin) count as speech. Each speech frame
+keeps half of `max_pause` of context on either side. So leading/trailing
+silence shrinks to that padding and long pauses shrink to about `max_pause`.
+The result is capped at `max_seconds` and re-encoded as 16-bit mono WAV.
+Compressed uploads (webm/opus, …) are passed through untouched.
+"""
+import io
+import re
+import struct
+import time
+import wave
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core import metrics
+from app.core.config import settings
+
+FRAME_SECONDS = 0.03
+# Speech must be this much louder than the noise floor, and never quieter than
+# the absolute floor (so a silent recording isn't "all speech"). The threshold
+# is also kept within PEAK_RANGE_DB of the loudest frame, so a recording with
+# almost no silence (floor estimate = speech level) isn't trimmed away.
+MARGIN_DB = 12.0
+ABSOLUTE_FLOOR_DBFS = -50.0
+PEAK_RANGE_DB = 25.0
+
+_PCM_TYPE = re.compile(r"^audio/(l16|pcm|x-pcm|raw)\b", re.I)
+_PARAM = re.compile(r"(rate|channels)\s*=\s*(\d+)", re.I)
+
+
+class AudioFormatError(ValueError):
+    """The upload claims to be WAV/PCM but can't be decoded."""
+
+
+class TrimmedAudio:
+    __slots__ = (
+        "wav", "sample_rate", "original_bytes", "original_seconds",
+        "output_seconds", "processing_ms",
+    )
+
+    def __init__(
+        self, wav: bytes, sample_rate: int, original_bytes: int,
+        original_seconds: float, output_seconds: float, processing_ms: float,
+    ):
+        self.wav = wav
+        self.sample_rate = sample_rate
+        self.original_bytes = original_bytes
+        self.original_seconds = original_seconds
+        self.output_seconds = output_seconds
+        self.processing_ms = processing_ms
+
+    @property
+    def has_speech(self) -> bool:
+        return self.output_seconds > 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return max(0, self.original_bytes - len(self.wav))
+
+    @property
+    def seconds_saved(self) -> float:
+        return max(0.0, self.original_seconds - self.output_seconds)
+
+
+def is_uncompressed(data: bytes, content_type: Optional[str]) -> bool:
+    """True for a RIFF/WAVE file or an upload typed as raw PCM (audio/L16, …)."""
+    return (data[:4] == b"RIFF" and data[8:12] == b"WAVE") or bool(
+        content_type and _PCM_TYPE.match(content_type)
+    )
+
+
+def decode(data: bytes, content_type: Optional[str] = None) -> Tuple[np.ndarray, int]:
+    """Decode WAV or raw PCM to (float32 samples in [-1, 1], shape (n, channels), rate)."""
+    if data[:4] == b"RIFF":
+        return _decode_wav(data)
+    # Raw PCM: 16-bit little-endian, rate/channels from the content type
+    params = {k.lower(): int(v) for k, v in _PARAM.findall(content_type or "")}
+    channels = params.get("channels", 1)
+    rate = params.get("rate", 16000)
+    if channels < 1 or rate < 1:
+        raise AudioFormatError("Invalid PCM rate/channels")
+    usable = len(data) - len(data) % (2 * channels)
+    samples = np.frombuffer(data[:usable], dtype="<i2").reshape(-1, channels)
+    return samples.astype(np.float32) / 32768.0, rate
+
+
+def _decode_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    fmt = None
+    body = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, pos)
+        if chunk_id == b"fmt ":
+            fmt_pos = pos + 8
+            fmt_size = min(size, len(data) - fmt_pos)  # Bytes actually present
+            if fmt_size < 16:
+                raise AudioFormatError("WAV fmt chunk is truncated")
+            fmt = struct.unpack_from("<HHIIHH", data, fmt_pos)
+        elif chunk_id == b"data":
+            body = data[pos + 8:pos + 8 + size]
+            break
+        pos += 8 + size + (size & 1)  # Chunks are word-aligned
+    if fmt is None or body is None:
+        raise AudioFormatError("WAV file has no fmt/data chunk")
+
+    tag, channels, rate, _, _, bits = fmt
+    if tag == 0xFFFE:  # WAVE_FORMAT_EXTENSIBLE: sub-format tag opens the GUID
+        if fmt_size < 26:
+            raise AudioFormatError("WAV fmt chunk is truncated")
+        tag = struct.unpack_from("<H", data, fmt_pos + 24)[0]
+    width = bits // 8
+    if channels < 1 or width < 1 or rate < 1:
+        raise AudioFormatError("Invalid WAV header")
+    body = body[:len(body) - len(body) % (width * channels)]
+
+    if tag == 3 and bits in (32, 64):
+        samples = np.frombuffer(body, dtype=f"<f{width}").astype(np.float32)
+    elif tag == 1 and bits == 8:
+        samples = (np.frombuffer(body, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif tag == 1 and bits in (16, 32):
+        samples = np.frombuffer(body, dtype=f"<i{width}").astype(np.float32) / 2 ** (bits - 1)
+    elif tag == 1 and bits == 24:
+        # Widen 3-byte samples to int32 by left-aligning them (sign is preserved)
+        raw = np.frombuffer(body, dtype=np.uint8).reshape(-1, 3)
+        padded = np.zeros((len(raw), 4), dtype=np.uint8)
+        padded[:, 1:] = raw
+        samples = padded.view("<i4").ravel().astype(np.float32) / 2 ** 31
+    else:
+        raise AudioFormatError(f"Unsupported WAV encoding (format {tag}, {bits}-bit)")
+    return samples.reshape(-1, channels), rate
+
+
+def speech_mask(mono: np.ndarray, sample_rate: int, max_pause: float) -> np.ndarray:
+    """Per-sample boolean mask of the audio to keep."""
+    frame = max(1, int(sample_rate * FRAME_SECONDS))
+    n_frames = len(mono) // frame
+    if n_frames == 0:
+        return np.zeros(len(mono), dtype=bool)
+
+    frames = mono[:n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    db = 20 * np.log10(np.maximum(rms, 1e-10))
+    threshold = max(
+        min(np.percentile(db, 10) + MARGIN_DB, db.max() - PEAK_RANGE_DB),
+        ABSOLUTE_FLOOR_DBFS,
+    )
+    speech = db > threshold
+
+    # Dilate: keep `max_pause / 2` of context around every speech frame
+    pad = int(round(max_pause / 2 / FRAME_SECONDS))
+    if pad:
+        speech = np.convolve(speech, np.ones(2 * pad + 1), mode="same") > 0
+
+    mask = np.repeat(speech, frame)
+    return np.concatenate([mask, np.zeros(len(mono) - len(mask), dtype=bool)])
+
+
+def encode_wav(mono: np.ndarray, sample_rate: int) -> bytes:
+    pcm = (np.clip(mono, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def trim_silence(
+    data: bytes,
+    content_type: Optional[str] = None,
+    max_seconds: Optional[float] = None,
+    max_pause: Optional[float] = None,
+) -> TrimmedAudio:
+    """Decode, downmix, VAD-trim and cap an uncompressed recording."""
+    start = time.perf_counter()
+    max_seconds = settings.AUDIO_MAX_SECONDS if max_seconds is None else max_seconds
+    max_pause = settings.AUDIO_MAX_PAUSE_SECONDS if max_pause is None else max_pause
+
+    samples, rate = decode(data, content_type)
+    mono = samples.mean(axis=1)
+    kept = mono[speech_mask(mono, rate, max_pause)][:int(max_seconds * rate)]
+
+    result = TrimmedAudio(
+        wav=encode_wav(kept, rate),
+        sample_rate=rate,
+        original_bytes=len(data),
+        original_seconds=len(mono) / rate,
+        output_seconds=len(kept) / rate,
+        processing_ms=(time.perf_counter() - start) * 1000,
+    )
+    _record(result)
+    return result
+
+
+_totals: Dict[str, float] = {
+    "requests": 0, "bytes_in": 0, "bytes_saved": 0, "seconds_in": 0.0,
+    "seconds_saved": 0.0, "processing_ms": 0.0,
+}
+
+
+def _record(result: TrimmedAudio) -> None:
+    _totals["requests"] += 1
+    _totals["bytes_in"] += result.original_bytes
+    _totals["bytes_saved"] += result.bytes_saved
+    _totals["seconds_in"] += result.original_seconds
+    _totals["seconds_saved"] += result.seconds_saved
+    _totals["processing_ms"] += result.processing_ms
+
+
+metrics.register("audio_vad", lambda: {k: round(v, 2) for k, v in _totals.items()})
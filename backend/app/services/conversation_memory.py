@@ -0,0 +1,194 @@
+"""
+Rolling per-session conversation memory for LLM prompts.
+
+The memory lives in the session state (`current_state["memory"]`):
+
+- `recent`: the last `CONVERSATION_RECENT_TURNS` exchanges, verbatim;
+- `digest`: one compact line per older exchange (topic, score, mistake and
+  the gist of the answer), folded in when an exchange leaves `recent`;
+- `earlier`: a count and score total for exchanges squeezed out of the digest.
+
+Folding is done locally, so updating the memory never costs an extra model
+call. `context()` renders the memory, newest first, into at most
+`PROMPT_CONTEXT_TOKENS` estimated tokens. Prompt size therefore stops
+growing with interview length.
+"""
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.question_index import content_words
+
+# Per-item caps inside the context section
+QUESTION_TOKENS = 60
+ANSWER_TOKENS = 160
+GIST_TOKENS = 30
+TOPIC_WORDS = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+_EARLIER_HEADER = "Earlier (summary):\n"
+_RECENT_HEADER = "Most recent:\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate for English prose and code: about 4 characters or
+    0.75 words per token, whichever is larger. Close enough to budget with,
+    and orders of magnitude faster than running a tokenizer.
+    """
+    if not text:
+        return 0
+    return math.ceil(max(len(text) / 4, len(text.split()) * 4 / 3))
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut `text` at a word boundary so it fits in about `tokens` tokens."""
+    text = " ".join(text.split())
+    if estimate_tokens(text) <= tokens:
+        return text
+    words = text.split()
+    # Word count bounds the estimate too, so both limits must hold
+    cut = " ".join(words[:int(tokens * 3 / 4)])[:tokens * 4]
+    return cut.rsplit(" ", 1)[0] + " …" if " " in cut else cut + "…"
+
+
+class ConversationMemory:
+    def __init__(self):
+        self.contexts = 0
+        self.context_tokens = 0
+        self.max_context_tokens = 0
+
+    @staticmethod
+    def _memory(state: Dict[str, Any]) -> Dict[str, Any]:
+        return state.setdefault("memory", {
+            "recent": [], "digest": [], "earlier": {"count": 0, "score_sum": 0.0, "scored": 0},
+        })
+
+    def record_turn(
+        self, state: Dict[str, Any], order: int, question: str, answer: str,
+        evaluation: Dict[str, Any],
+    ) -> None:
+        """Add an answered exchange to the session memory (mutates `state`)."""
+        memory = self._memory(state)
+        score = evaluation.get("score")
+        try:
+            score = round(float(score), 1)
+        except (TypeError, ValueError):
+            score = None
+        memory["recent"].append({
+            "order": order,
+            "question": question,
+            "answer": answer,
+            "score": score,
+            "mistake": evaluation.get("critical_mistake"),
+        })
+        while len(memory["recent"]) > settings.CONVERSATION_RECENT_TURNS:
+            memory["digest"].append(self._fold(memory["recent"].pop(0)))
+        self._compact(memory)
+
+    @staticmethod
+    def _fold(turn: Dict[str, Any]) -> Dict[str, Any]:
+        first_sentence = _SENTENCE_END.split(turn["answer"].strip(), 1)[0]
+        return {
+            "order": turn["order"],
+            "topic": " ".join(content_words(turn["question"])[:TOPIC_WORDS]),
+            "score": turn["score"],
+            "mistake": truncate_to_tokens(turn["mistake"], GIST_TOKENS) if turn["mistake"] else None,
+            "gist": truncate_to_tokens(first_sentence, GIST_TOKENS),
+        }
+
+    def _compact(self, memory: Dict[str, Any]) -> None:
+        """Keep the stored digest within the context budget: oldest lines go first."""
+        budget = settings.PROMPT_CONTEXT_TOKENS
+        digest = memory["digest"]
+        while digest and sum(estimate_tokens(self._digest_line(d)) for d in digest) > budget:
+            dropped = digest.pop(0)
+            earlier = memory["earlier"]
+            earlier["count"] += 1
+            if dropped["score"] is not None:
+                earlier["score_sum"] += dropped["score"]
+                earlier["scored"] += 1
+
+    @staticmethod
+    def _digest_line(d: Dict[str, Any]) -> str:
+        score = f", scored {d['score']:g}" if d["score"] is not None else ""
+        mistake = f"; mistake: {d['mistake']}" if d["mistake"] else ""
+        return f"- Q{d['order']} ({d['topic'] or 'general'}{score}): {d['gist']}{mistake}"
+
+    @staticmethod
+    def _earlier_line(earlier: Dict[str, Any]) -> Optional[str]:
+        if not earlier["count"]:
+            return None
+        average = (
+            f", average score {earlier['score_sum'] / earlier['scored']:.1f}"
+            if earlier["scored"] else ""
+        )
+        return f"- {earlier['count']} earlier question(s){average}"
+
+    def context(self, state: Optional[Dict[str, Any]], budget: Optional[int] = None) -> str:
+        """
+        The conversation so far, within `budget` estimated tokens (default
+        PROMPT_CONTEXT_TOKENS). Recent exchanges are kept in full where
+        possible; older ones are summarised; whatever doesn't fit is dropped,
+        oldest first.
+        """
+        budget = settings.PROMPT_CONTEXT_TOKENS if budget is None else budget
+        memory = (state or {}).get("memory")
+        if not memory:
+            return "None yet."
+
+        # Newest first, so truncation always drops the oldest material
+        blocks: List[str] = []
+        for turn in reversed(memory["recent"]):
+            score = f" (scored {turn['score']:g})" if turn["score"] is not None else ""
+            blocks.append(
+                f"Q{turn['order']}: {truncate_to_tokens(turn['question'], QUESTION_TOKENS)}\n"
+                f"A{turn['order']}{score}: {truncate_to_tokens(turn['answer'], ANSWER_TOKENS)}"
+            )
+        lines = [self._digest_line(d) for d in reversed(memory["digest"])]
+        earlier = self._earlier_line(memory["earlier"])
+        if earlier:
+            lines.append(earlier)
+
+        # Estimates are subadditive, so per-piece costs plus the headers bound the total
+        used = estimate_tokens(_EARLIER_HEADER) + estimate_tokens(_RECENT_HEADER)
+        kept_blocks: List[str] = []
+        for block in blocks:
+            cost = estimate_tokens(block)
+            if used + cost > budget:
+                break
+            kept_blocks.append(block)
+            used += cost
+        kept_lines: List[str] = []
+        for line in lines:
+            cost = estimate_tokens(line)
+            if used + cost > budget:
+                break
+            kept_lines.append(line)
+            used += cost
+
+        parts = []
+        if kept_lines:
+            parts.append(_EARLIER_HEADER + "\n".join(reversed(kept_lines)))
+        if kept_blocks:
+            parts.append(_RECENT_HEADER + "\n".join(reversed(kept_blocks)))
+        text = "\n".join(parts) or "None yet."
+
+        self.contexts += 1
+        self.context_tokens += used
+        self.max_context_tokens = max(self.max_context_tokens, used)
+        return text
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "contexts": self.contexts,
+            "avg_tokens": round(self.context_tokens / self.contexts, 1) if self.contexts else None,
+            "max_tokens": self.max_context_tokens,
+            "budget": settings.PROMPT_CONTEXT_TOKENS,
+        }
+
+
+conversation_memory = ConversationMemory()
+metrics.register("conversation_memory", conversation_memory.stats)
@@ -0,0 +1,110 @@
+import base64
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from app.services.session_service import session_service
+from app.services.session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+MAX_EXPORT_BATCH_SIZE = 500
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a resume cursor token cannot be decoded."""
+
+
+def encode_cursor(start_time: datetime, session_id: str) -> str:
+    """Opaque resume token for the (start_time, session_id) keyset position."""
+    raw = json.dumps([start_time.isoformat(), session_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, str]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        start_time, session_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(start_time), str(session_id)
+    except Exception:
+        raise InvalidCursorError("Invalid export cursor")
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Stored timestamps are naive UTC (datetime.utcnow); align query bounds.
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class ExportService:
+    """Streams a user's interview transcripts as NDJSON, one interview per line."""
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+
+    def serialize(self, interview: Any) -> Dict[str, Any]:
+        """Full transcript of one interview as a JSON-ready dict."""
+        questions = []
+        for q in sorted(interview.questions, key=lambda x: x.order):
+            answer = q.answer
+            questions.append({
+                "order": q.order,
+                "question": q.content,
+                "asked_at": _iso(q.created_at),
+                "answer": answer.content if answer else None,
+                "answered_at": _iso(answer.created_at) if answer else None,
+                "score": answer.ai_score if answer else None,
+                "score_provisional": answer.needs_rescore if answer else False,
+                "ai_feedback": answer.ai_feedback if answer else None,
+            })
+        return {
+            "session_id": interview.session_id,
+            "role": interview.role,
+            "difficulty": interview.difficulty,
+            "status": getattr(interview.status, "value", interview.status),
+            "start_time": _iso(interview.start_time),
+            "end_time": _iso(interview.end_time),
+            "questions": questions,
+            "feedback": (
+                interview.overall_feedback.model_dump() if interview.overall_feedback else None
+            ),
+        }
+
+    def stream_ndjson(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        batch_size: int = 100,
+    ) -> AsyncIterator[bytes]:
+        """
+        Return an iterator of NDJSON lines, one per interview, oldest first.
+        Every line carries a `cursor` token; pass the last one received to
+        resume after it. The cursor is decoded here, before streaming starts,
+        so a bad token raises `InvalidCursorError` while a 400 is still possible.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        records = self.store.iter_sessions(
+            user_id,
+            since=_naive_utc(since),
+            until=_naive_utc(until),
+            after=after,
+            batch_size=max(1, min(batch_size, MAX_EXPORT_BATCH_SIZE)),
+        )
+        return self._lines(records)
+
+    async def _lines(self, records: AsyncIterator[Any]) -> AsyncIterator[bytes]:
+        async for interview in records:
+            row = self.serialize(interview)
+            row["cursor"] = encode_cursor(interview.start_time, interview.session_id)
+            yield (json.dumps(row, ensure_ascii=False) + "\n").encode()
+
+
+export_service = ExportService(session_service.store)
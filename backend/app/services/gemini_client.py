@@ -0,0 +1,235 @@
+"""
+One Gemini client shared by every service.
+
+The manager owns the async httpx client underneath `genai.Client`, so the
+connection pool (size, keep-alive) is configured in one place, TLS handshakes
+are paid once during startup warm-up instead of by the first user, and request
+/ pool statistics can be read at any time via `stats()`.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/"
+
+
+class _TransportStats:
+    __slots__ = ("requests", "errors", "in_flight", "peak_in_flight", "total_latency")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_latency = 0.0
+
+
+class _InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """AsyncHTTPTransport that counts requests and time-to-headers latency."""
+
+    def __init__(self, stats: _TransportStats, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self.stats
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        start = time.perf_counter()
+        try:
+            return await self._send(request)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+            stats.total_latency += time.perf_counter() - start
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        return await super().handle_async_request(request)
+
+
+# Canned replies for the fake transport; the JSON one satisfies the answer
+# evaluation (spoken or written) and the final feedback parsers
+_FAKE_QUESTION = "Can you walk me through how you would design a rate limiter?"
+_FAKE_JSON = json.dumps({
+    "transcript": "I would use a token bucket per client, kept in Redis.",
+    "score": 7,
+    "classification": "strong",
+    "critical_mistake": None,
+    "difficulty_trend": "stable",
+    "next_focus": "Drill down on trade-offs",
+    "stage_change": None,
+    "end_interview": False,
+    "overall_score": 7,
+    "strengths": ["System design"],
+    "weaknesses": ["Edge cases"],
+    "improvement_tips": ["Discuss failure modes", "Quantify limits", "Mention monitoring"],
+    "final_verdict": "Solid candidate with room to deepen edge-case handling.",
+})
+
+
+class _FakeGeminiTransport(_InstrumentedTransport):
+    """
+    Stand-in for the Gemini API used for load testing (`GEMINI_FAKE_LATENCY_MS`):
+    every call is answered locally with canned text after a fixed delay, so
+    server throughput can be measured without network access or API quota.
+    """
+
+    def __init__(self, stats: _TransportStats, latency: float, **kwargs: Any):
+        super().__init__(stats, **kwargs)
+        self.latency = latency
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.latency)
+        if request.method != "POST":
+            return httpx.Response(200, request=request)  # warm-up HEAD
+        prompt = await request.aread()
+        packed = prompt.count(b"ITEM #")  # batch grading prompt (see evaluate_answers_packed)
+        if packed:
+            text = json.dumps({"results": [
+                {"item": i, **json.loads(_FAKE_JSON)} for i in range(1, packed + 1)
+            ]})
+        else:
+            text = _FAKE_JSON if b"JSON" in prompt else _FAKE_QUESTION
+        body = {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}],
+            # Rough counts so per-model cost accounting has something to add up
+            "usageMetadata": {
+                "promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4,
+            },
+        }
+        return httpx.Response(200, json=body, request=request)
+
+
+class GeminiClientManager:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.api_key = api_key
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.GEMINI_MAX_CONNECTIONS,
+            max_keepalive_connections=(
+                max_keepalive_connections or settings.GEMINI_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            keepalive_expiry=keepalive_expiry or settings.GEMINI_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        self.timeout = timeout or settings.GEMINI_TIMEOUT_SECONDS
+        self._stats = _TransportStats()
+        self._transport: Optional[_InstrumentedTransport] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._client = None
+        self._lock = threading.Lock()
+        self.warmed_at: Optional[float] = None
+
+    def get(self):
+        """Return the shared `genai.Client`, building it on first use."""
+        if self._client is None:
+            with self._lock:  # warm-up builds it from a worker thread
+                if self._client is None:
+                    self._client = self._build()
+        return self._client
+
+    def _build(self):
+        # Imported on first use: google.genai is the heaviest import in the app
+        from google import genai
+        from google.genai import types
+
+        fake_latency_ms = settings.GEMINI_FAKE_LATENCY_MS
+        if fake_latency_ms is not None:
+            logger.warning("Using the fake Gemini transport (%.0f ms per call)", fake_latency_ms)
+            self._transport = _FakeGeminiTransport(
+                self._stats, fake_latency_ms / 1000, limits=self.limits
+            )
+        else:
+            self._transport = _InstrumentedTransport(self._stats, limits=self.limits)
+        self._http = httpx.AsyncClient(transport=self._transport, timeout=self.timeout)
+        return genai.Client(
+            api_key=self.api_key if self.api_key is not None else settings.GEMINI_API_KEY,
+            http_options=types.HttpOptions(
+                timeout=int(self.timeout * 1000),  # milliseconds
+                httpx_async_client=self._http,
+                client_args={"limits": self.limits},
+            ),
+        )
+
+    async def warm_up(self, attempts: int = 4, delay: float = 1.0) -> None:
+        """
+        Build the client off the event loop, then open a pooled keep-alive
+        connection to the Gemini endpoint so the first real call skips
+        DNS + TCP + TLS setup. Failed connections are retried with backoff;
+        if every attempt fails the first real call connects instead, so
+        warm-up never holds readiness back (`warmed` stays false in /metrics).
+        """
+        await asyncio.to_thread(self.get)
+        for attempt in range(1, attempts + 1):
+            try:
+                await self._http.head(GEMINI_BASE_URL)
+            except httpx.HTTPError as e:
+                if attempt == attempts:
+                    logger.warning("Gemini connection warm-up failed, skipping it: %s", e)
+                    return
+                logger.warning("Gemini connection warm-up failed (%s); retrying in %.0fs", e, delay)
+                await asyncio.sleep(delay)
+                delay *= 2
+            else:
+                self.warmed_at = time.time()
+                return
+
+    async def aclose(self) -> None:
+        """Close pooled connections (called from the FastAPI lifespan on shutdown)."""
+        if self._http is not None:
+            await self._http.aclose()
+        self._http = None
+        self._transport = None
+        self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        s = self._stats
+        pool = self._pool_stats()
+        return {
+            "initialized": self._client is not None,
+            "warmed": self.warmed_at is not None,
+            "requests": s.requests,
+            "errors": s.errors,
+            "in_flight": s.in_flight,
+            "peak_in_flight": s.peak_in_flight,
+            "avg_latency_ms": round(s.total_latency / s.requests * 1000, 1) if s.requests else None,
+            "pool_limits": {
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry,
+            },
+            **pool,
+        }
+
+    def _pool_stats(self) -> Dict[str, Any]:
+        # httpx keeps the httpcore pool private; read it defensively
+        pool = getattr(self._transport, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {"connections_open": None, "connections_idle": None}
+        return {
+            "connections_open": len(connections),
+            "connections_idle": sum(1 for c in connections if c.is_idle()),
+        }
+
+
+gemini_clients = GeminiClientManager()
+metrics.register("gemini_client", gemini_clients.stats)
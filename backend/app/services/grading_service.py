@@ -0,0 +1,114 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.llm_queue import Priority
+from app.services.llm_service import LLMService, llm_service
+
+logger = logging.getLogger(__name__)
+
+# Keep packed prompts well inside the model's comfortable context size
+MAX_PACK_CHARS = 12_000
+
+
+class GradingService:
+    """
+    Offline grading of standalone question/answer pairs.
+
+    Items are packed several to a prompt (`LLMService.evaluate_answers_packed`),
+    packs run concurrently up to a per-request limit at background priority so
+    live interview turns keep precedence, and results are yielded as each pack
+    finishes. Items a packed reply skipped are re-graded one at a time through
+    `try_evaluate_answer`; an item that still has no evaluation is reported
+    with `graded: false` and an `error`, never a placeholder score.
+    """
+
+    def __init__(self, llm: Optional[LLMService] = None):
+        self.llm = llm or llm_service
+
+    def pack(self, items: List[Dict[str, Any]], pack_size: int) -> List[List[int]]:
+        """Split item indices into consecutive packs by count and prompt size."""
+        packs: List[List[int]] = []
+        current: List[int] = []
+        chars = 0
+        for i, item in enumerate(items):
+            size = len(item["question"]) + len(item["answer"])
+            if current and (len(current) >= pack_size or chars + size > MAX_PACK_CHARS):
+                packs.append(current)
+                current, chars = [], 0
+            current.append(i)
+            chars += size
+        if current:
+            packs.append(current)
+        return packs
+
+    async def grade(
+        self,
+        items: List[Dict[str, Any]],
+        pack_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield `{"index", "id", "packed", "graded", **evaluation}` per item, in
+        completion order. Ungraded items carry an `error` instead of evaluation fields.
+        """
+        packs = self.pack(items, max(1, pack_size or settings.BATCH_GRADE_PACK_SIZE))
+        limit = asyncio.Semaphore(max(1, concurrency or settings.BATCH_GRADE_CONCURRENCY))
+
+        async def run(indices: List[int]) -> List[Tuple[int, bool, Optional[dict]]]:
+            async with limit:
+                return await self._grade_pack(items, indices)
+
+        tasks = [asyncio.create_task(run(indices)) for indices in packs]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                for index, packed, evaluation in await finished:
+                    row = {"index": index, "id": items[index].get("id"), "packed": packed}
+                    if evaluation is None:
+                        yield {**row, "graded": False, "error": "Could not grade this answer"}
+                    else:
+                        yield {**row, "graded": True, **evaluation}
+        finally:
+            # Client went away (or an error): stop grading what nobody will read
+            for task in tasks:
+                task.cancel()
+
+    async def _grade_pack(
+        self, items: List[Dict[str, Any]], indices: List[int]
+    ) -> List[Tuple[int, bool, Optional[dict]]]:
+        evaluations: List[Optional[dict]] = [None] * len(indices)
+        if len(indices) > 1:
+            evaluations = await self.llm.evaluate_answers_packed(
+                [items[i] for i in indices], priority=Priority.BACKGROUND
+            )
+
+        missing = [pos for pos, e in enumerate(evaluations) if e is None]
+        if missing and len(indices) > 1:
+            logger.warning("Packed grading skipped %d of %d items", len(missing), len(indices))
+        singles = await asyncio.gather(*(self._grade_one(items[indices[pos]]) for pos in missing))
+        for pos, evaluation in zip(missing, singles):
+            evaluations[pos] = evaluation
+
+        return [
+            (index, pos not in missing, evaluations[pos])
+            for pos, index in enumerate(indices)
+        ]
+
+    async def _grade_one(self, item: Dict[str, Any]) -> Optional[dict]:
+        return await self.llm.try_evaluate_answer(
+            item["role"], item["difficulty"], "technical_deep_dive", 1, [], [],
+            item["question"], item["answer"], priority=Priority.BACKGROUND,
+        )
+
+    def stream_ndjson(self, items: List[Dict[str, Any]], **kwargs: Any) -> AsyncIterator[bytes]:
+        """`grade` encoded as NDJSON lines for a StreamingResponse."""
+        return self._lines(self.grade(items, **kwargs))
+
+    async def _lines(self, rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+        async for row in rows:
+            yield (json.dumps(row, ensure_ascii=False) + "\n").encode()
+
+
+grading_service = GradingService()
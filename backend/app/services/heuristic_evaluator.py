@@ -0,0 +1,101 @@
+"""
+CPU-only answer scoring used when Gemini misses the per-turn latency budget
+or fails outright.
+
+Scores come from a fixed linear model over a few features: coverage of the
+question's key terms, new technical concepts, length against a per-difficulty
+target, reasoning / example markers and structure. Features for a whole batch
+are computed as one NumPy matrix. The result has the same keys as
+`LLMService.evaluate_answer_v2`, but never moves difficulty, stage or ends the
+interview, and is flagged `needs_rescore` so the LLM can grade it later
+(`python -m app.jobs.rescore_answers`).
+"""
+import re
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.question_index import content_words
+
+# Words an answer of each difficulty is expected to reach for full marks
+LENGTH_TARGETS = {"easy": 40, "medium": 80, "hard": 120}
+
+FEATURES = (
+    "coverage", "concepts", "length", "reasoning", "examples", "structure", "diversity",
+)
+WEIGHTS = np.array([0.30, 0.15, 0.20, 0.12, 0.08, 0.08, 0.07], dtype=np.float32)
+
+_REASONING = re.compile(
+    r"\b(because|therefore|since|so that|which means|trade-?offs?|however|whereas|"
+    r"instead|otherwise|depends on|in order to)\b", re.I,
+)
+_EXAMPLES = re.compile(r"\b(for example|for instance|e\.g\.|such as|imagine|in my last)\b", re.I)
+_STEPS = re.compile(r"(^|\n)\s*(\d+[.)]|[-*•])\s|\b(first|second|then|next|finally)\b", re.I)
+_SENTENCE = re.compile(r"[.!?]+(\s|$)")
+_TECHNICAL = re.compile(r"[a-z]+[A-Z_]\w*|\w+\(\)|\bO\([^)]*\)|\d")
+_NO_ANSWER = re.compile(r"\b(i don'?t know|no idea|not sure|i'?m not sure|skip|pass)\b", re.I)
+
+
+class HeuristicEvaluator:
+    def features(self, items: Sequence[Tuple[str, str, str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        For (question, answer, difficulty) items, return an (n, len(FEATURES))
+        matrix scaled to [0, 1] and the answers' content-word counts.
+        """
+        raw = np.zeros((len(items), 8), dtype=np.float32)
+        for i, (question, answer, difficulty) in enumerate(items):
+            q_terms = set(content_words(question))
+            a_words = content_words(answer)
+            a_terms = set(a_words)
+            raw[i] = (
+                len(q_terms & a_terms) / len(q_terms) if q_terms else 0.0,
+                sum(1 for t in a_terms - q_terms if len(t) >= 6)
+                + len(_TECHNICAL.findall(answer)),
+                len(answer.split()) / LENGTH_TARGETS.get(difficulty, LENGTH_TARGETS["medium"]),
+                len(_REASONING.findall(answer)),
+                len(_EXAMPLES.findall(answer)),
+                len(_SENTENCE.findall(answer)) + 2 * len(_STEPS.findall(answer)),
+                len(a_terms) / len(a_words) if len(a_words) >= 10 else 0.0,
+                len(a_words),
+            )
+        # Saturating scales: a few concepts/markers earn full credit
+        scale = np.array([1, 8, 1, 2, 1, 5, 1], dtype=np.float32)
+        return np.clip(raw[:, :7] / scale, 0.0, 1.0), raw[:, 7]
+
+    def evaluate_many(self, items: Sequence[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+        if not items:
+            return []
+        matrix, word_counts = self.features(items)
+        scores = 1.0 + 9.0 * (matrix @ WEIGHTS)
+        # Non-answers can't be rescued by length or vocabulary
+        no_answer = np.array([bool(_NO_ANSWER.search(a)) for _, a, _ in items])
+        scores = np.where(no_answer | (word_counts < 5), np.minimum(scores, 2.0), scores)
+        return [
+            self._result(round(float(score), 1), row) for score, row in zip(scores, matrix)
+        ]
+
+    def evaluate(self, question: str, answer: str, difficulty: str = "medium") -> Dict[str, Any]:
+        return self.evaluate_many([(question, answer, difficulty)])[0]
+
+    def _result(self, score: float, row: np.ndarray) -> Dict[str, Any]:
+        coverage = float(row[0])
+        next_focus = (
+            "Drill down: revisit the core of the previous question" if coverage < 0.3
+            else "Drill down: continue with the current topic"
+        )
+        return {
+            "score": score,
+            "classification": "strong" if score >= 6 else "weak",
+            "critical_mistake": None,
+            # Adaptive state only moves on LLM judgements
+            "difficulty_trend": "stable",
+            "next_focus": next_focus,
+            "stage_change": None,
+            "end_interview": False,
+            "source": "heuristic",
+            "needs_rescore": True,
+            "features": {name: round(float(v), 2) for name, v in zip(FEATURES, row)},
+        }
+
+
+heuristic_evaluator = HeuristicEvaluator()
@@ -0,0 +1,122 @@
+"""
+Idempotency keys for interview turns.
+
+A client that retries `/chat` or `/audio-chat` sends the same
+`Idempotency-Key` header each time. The first request claims the key with an
+in-progress marker and runs. Its response is stored for
+`IDEMPOTENCY_TTL_SECONDS`, and retries replay it byte-for-byte without
+transcribing, calling Gemini or touching the session again. A retry that
+arrives while the first request is still running gets `IdempotencyInProgress`.
+If the key is reused with a different payload, that raises
+`IdempotencyKeyReused`.
+
+Records live in the session store, so a retry routed to another worker still
+finds them. They are keyed by scope (endpoint and caller, see
+`deps.idempotency_scope`) plus the key, so callers never share responses. A request that fails releases its key, so it can be retried for real.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from fastapi import Response
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.session_service import session_service
+from app.services.session_store import SessionStore
+
+MAX_KEY_LENGTH = 255
+# Response headers never replayed (recomputed for the replayed body)
+_SKIP_HEADERS = frozenset({"content-length", "content-encoding", "vary"})
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+class IdempotencyError(Exception):
+    pass
+
+
+class IdempotencyInProgress(IdempotencyError):
+    """The original request with this key has not finished yet."""
+
+
+class IdempotencyKeyReused(IdempotencyError):
+    """The key was already used for a request with a different payload."""
+
+
+def fingerprint(*parts: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class IdempotencyService:
+    def __init__(self, store: SessionStore):
+        self.store = store
+        self.counts = {"executed": 0, "replayed": 0, "in_progress": 0, "reused": 0}
+
+    async def has_response(self, scope: str, key: str) -> bool:
+        """Whether a retry of (scope, key) would be answered from the store."""
+        record = await self.store.load_idempotency_record(f"{scope}:{key}")
+        return record is not None and record.state == "done"
+
+    async def run(
+        self,
+        scope: str,
+        key: Optional[str],
+        request_fingerprint: str,
+        handler: Callable[[], Awaitable[Response]],
+    ) -> Response:
+        """Run `handler` once per (scope, key); replay its response to retries."""
+        if not key:
+            return await handler()
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValueError(f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+        store_key = f"{scope}:{key}"
+        now = datetime.utcnow()
+        existing = await self.store.claim_idempotency_key(
+            store_key, request_fingerprint,
+            locked_until=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+        )
+        if existing is not None:
+            if existing.fingerprint != request_fingerprint:
+                self.counts["reused"] += 1
+                raise IdempotencyKeyReused(
+                    "Idempotency-Key was already used with a different request"
+                )
+            if existing.state != "done":
+                self.counts["in_progress"] += 1
+                raise IdempotencyInProgress(
+                    "A request with this Idempotency-Key is still being processed"
+                )
+            self.counts["replayed"] += 1
+            return Response(
+                content=existing.body,
+                status_code=existing.status_code,
+                headers={**existing.headers, REPLAY_HEADER: "true"},
+            )
+
+        try:
+            response = await handler()
+        except BaseException:
+            await self.store.release_idempotency_key(store_key)
+            raise
+        headers: Dict[str, str] = {
+            name: value for name, value in response.headers.items()
+            if name not in _SKIP_HEADERS
+        }
+        await self.store.complete_idempotency_key(
+            store_key, response.status_code, bytes(response.body), headers
+        )
+        self.counts["executed"] += 1
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counts)
+
+
+idempotency_service = IdempotencyService(session_service.store)
+metrics.register("idempotency", idempotency_service.stats)
@@ -0,0 +1,116 @@
+"""
+Global priority queue in front of every Gemini call.
+
+At most `max_concurrency` calls run at once; the rest wait in a heap ordered
+by priority (interactive turns before background work such as final feedback)
+and then arrival. New turns are admitted only while the estimated queue wait
+stays within the SLA — otherwise `admit()` raises `LLMOverloaded`, which the
+API turns into a 429 with `Retry-After`. Calls that were already admitted are
+never shed, so a turn is never rejected halfway through.
+"""
+import asyncio
+import enum
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+
+class Priority(enum.IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class LLMOverloaded(Exception):
+    """The LLM queue's wait estimate exceeds the SLA."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM queue is saturated; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class LLMWorkQueue:
+    # Smoothing factor for the moving average of call duration
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, max_concurrency: int, sla_seconds: float, initial_call_seconds: float = 2.0):
+        self.max_concurrency = max_concurrency
+        self.sla_seconds = sla_seconds
+        self.avg_call_seconds = initial_call_seconds
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.completed = 0
+        self.rejected = 0
+
+    def estimated_wait(self, priority: Priority = Priority.INTERACTIVE) -> float:
+        """Seconds a new call at `priority` would wait before starting."""
+        ahead = sum(1 for p, _, fut in self._waiters if p <= priority and not fut.done())
+        free = self.max_concurrency - self._active
+        if free > ahead:
+            return 0.0
+        # Calls that must start before ours, spread across all slots
+        return (ahead - free + 1) / self.max_concurrency * self.avg_call_seconds
+
+    def admit(self, priority: Priority = Priority.INTERACTIVE) -> None:
+        """Raise `LLMOverloaded` if a new turn would wait longer than the SLA."""
+        wait = self.estimated_wait(priority)
+        if wait > self.sla_seconds:
+            self.rejected += 1
+            raise LLMOverloaded(retry_after=max(1, math.ceil(wait)))
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[None]:
+        """Hold one concurrency slot for the duration of an LLM call."""
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (int(priority), next(self._seq), fut))
+            try:
+                await fut  # _release() hands its slot straight to us
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self._release()  # Slot was handed over just as we were cancelled
+                raise
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.avg_call_seconds += self.EWMA_ALPHA * (elapsed - self.avg_call_seconds)
+            self.completed += 1
+            self._release()
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():  # Skip waiters that were cancelled
+                fut.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "waiting": sum(1 for _, _, fut in self._waiters if not fut.done()),
+            "max_concurrency": self.max_concurrency,
+            "avg_call_seconds": round(self.avg_call_seconds, 3),
+            "estimated_wait_seconds": round(self.estimated_wait(), 3),
+            "sla_seconds": self.sla_seconds,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+llm_queue = LLMWorkQueue(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    sla_seconds=settings.LLM_QUEUE_SLA_SECONDS,
+)
+metrics.register("llm_queue", llm_queue.stats)
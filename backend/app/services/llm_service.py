@@ -1,63 +1,160 @@
-import json
+import asyncio
 import logging
-from google import genai
-from google.genai import types
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from app.core import metrics
 from app.core.config import settings
+from app.core.profiling import hotpath
+from app.services.gemini_client import gemini_clients
+from app.services.heuristic_evaluator import heuristic_evaluator
+from app.schemas.llm import (
+    AnswerEvaluation, FinalFeedbackReport, PackedEvaluations, SpokenAnswerEvaluation,
+)
+from app.services.llm_queue import llm_queue, Priority
+from app.services.model_router import model_router
 
 logger = logging.getLogger(__name__)
 
-_client = None
+GENERATION_FAILED = "Model generation failed. Please check server logs."
 
-def _get_client():
-    global _client
-    if _client is None:
-        _client = genai.Client(api_key=settings.GEMINI_API_KEY)
-    return _client
+M = TypeVar("M", bound=BaseModel)
 
-MODEL = "gemini-2.0-flash"
+# Per-answer evaluation fields, shared by single and packed grading prompts
+_EVALUATION_JSON = """{
+  "score": <number 1-10>,
+  "classification": "<strong|weak>",
+  "critical_mistake": "<string or null>",
+  "difficulty_trend": "<upgrade|downgrade|stable>",
+  "next_focus": "<'Drill down: <what to probe>' or 'Move on: <next topic>'>",
+  "stage_change": "<technical_deep_dive|soft_skills|closing|null>",
+  "end_interview": <true|false>
+}"""
+
+# Audio-native turns: the same fields plus the transcript, written first
+_SPOKEN_EVALUATION_JSON = (
+    '{\n  "transcript": "<the answer exactly as spoken>",' + _EVALUATION_JSON[1:]
+)
+
+# Model route (see app.services.model_router) of each structured output
+_SCHEMA_TASKS = {
+    AnswerEvaluation: "evaluation",
+    SpokenAnswerEvaluation: "evaluation",
+    PackedEvaluations: "grading",
+    FinalFeedbackReport: "feedback",
+}
+
+_EVALUATION_FALLBACK = {
+    "score": 5, "classification": "weak",
+    "next_focus": "Move on: new topic",
+    "feedback": "Could not parse AI evaluation.",
+}
 
 
 class LLMService:
 
-    def generate_response(self, prompt: str) -> str:
+    def __init__(self):
+        # How each answer evaluation was produced (see evaluate_answer_within_budget)
+        self.evaluation_counts = {"llm": 0, "heuristic_timeout": 0, "heuristic_error": 0}
+        # Structured-output outcomes per response schema (see _generate_structured)
+        self.structured_counts: Dict[str, Dict[str, int]] = {}
+        # Audio-native turns, and why some went back to transcribe-then-evaluate
+        self.spoken_counts = {"native": 0, "fallback_timeout": 0, "fallback_error": 0}
+
+    async def generate_response(
+        self, prompt: str, priority: Priority = Priority.INTERACTIVE, task: str = "question"
+    ) -> str:
         try:
-            client = _get_client()
-            response = client.models.generate_content(
-                model=MODEL,
-                contents=prompt,
-                config=types.GenerateContentConfig(temperature=0.7),
-            )
+            from google.genai import types
+            client = gemini_clients.get()
+            async with llm_queue.slot(priority):
+                response = await model_router.run(
+                    task,
+                    lambda model: client.aio.models.generate_content(
+                        model=model,
+                        contents=prompt,
+                        config=types.GenerateContentConfig(temperature=0.7),
+                    ),
+                )
             return response.text
         except Exception as e:
             logger.error("Failed to generate response: %s", e)
-            return "Model generation failed. Please check server logs."
+            return GENERATION_FAILED
 
-    def _generate_json(self, prompt: str) -> str:
+    @hotpath("llm.structured_output")
+    async def _generate_structured(
+        self, prompt: str, schema: Type[M], priority: Priority = Priority.INTERACTIVE,
+        media: Optional[Tuple[bytes, str]] = None,
+    ) -> Optional[M]:
+        """
+        Call Gemini with `schema` as the response schema and validate the
+        reply into it. `media` is an optional (data, mime_type) part sent
+        inline after the prompt. A reply that still fails validation gets one
+        repair call that quotes the validation errors. Returns None if the
+        call fails or the output is still malformed.
+        """
+        counts = self.structured_counts.setdefault(
+            schema.__name__, {"ok": 0, "repaired": 0, "malformed": 0, "errors": 0}
+        )
+        text = await self._call_structured(prompt, schema, priority, media)
+        if text is None:
+            counts["errors"] += 1
+            return None
         try:
-            client = _get_client()
-            response = client.models.generate_content(
-                model=MODEL,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.5,
-                    response_mime_type="application/json",
-                ),
+            result = schema.model_validate_json(text)
+            counts["ok"] += 1
+            return result
+        except ValidationError as e:
+            errors = "; ".join(
+                f"{'.'.join(map(str, err['loc'])) or 'reply'}: {err['msg']}"
+                for err in e.errors()[:10]
             )
-            return response.text
-        except Exception as e:
-            logger.error("Failed to generate JSON response: %s", e)
-            return "{}"
+            logger.warning("Malformed %s output (%s); asking for a repair", schema.__name__, errors)
+
+        repair = f"""{prompt}
+
+Your previous reply did not match the required JSON schema.
+Errors: {errors}
+Previous reply: {text[:2000]}
+Return the corrected JSON only."""
+        text = await self._call_structured(repair, schema, priority, media)
+        try:
+            result = schema.model_validate_json(text or "")
+            counts["repaired"] += 1
+            return result
+        except ValidationError:
+            counts["malformed"] += 1
+            return None
 
-    def _extract_json(self, response_text: str, fallback: dict) -> dict:
+    async def _call_structured(
+        self, prompt: str, schema: Type[BaseModel], priority: Priority,
+        media: Optional[Tuple[bytes, str]] = None,
+    ) -> Optional[str]:
         try:
-            start = response_text.find("{")
-            end = response_text.rfind("}")
-            if start != -1 and end != -1:
-                return json.loads(response_text[start:end + 1])
-            return fallback
+            from google.genai import types
+            client = gemini_clients.get()
+            contents: Any = prompt
+            if media is not None:
+                data, mime_type = media
+                contents = [prompt, types.Part.from_bytes(data=data, mime_type=mime_type)]
+            async with llm_queue.slot(priority):
+                response = await model_router.run(
+                    _SCHEMA_TASKS[schema],
+                    lambda model: client.aio.models.generate_content(
+                        model=model,
+                        contents=contents,
+                        config=types.GenerateContentConfig(
+                            temperature=0.5,
+                            response_mime_type="application/json",
+                            response_schema=schema,
+                        ),
+                    ),
+                )
+            return response.text
         except Exception as e:
-            logger.error("JSON Parsing Error: %s", e)
-            return fallback
+            logger.error("Failed to generate %s: %s", schema.__name__, e)
+            return None
 
     async def generate_question(
         self, role: str, difficulty: str, topic: str, previous_questions: list
@@ -68,12 +165,117 @@ Rules:
 1. Ask ONLY the question. No greetings or preamble.
 2. Keep it concise and clear.
 3. Do not repeat: {previous_questions}"""
-        return self.generate_response(prompt)
+        return await self.generate_response(prompt)
 
     async def evaluate_answer_v2(
-        self, role, difficulty, stage, q_count, weak_areas, strong_areas, question, answer
+        self, role, difficulty, stage, q_count, weak_areas, strong_areas, question, answer,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> dict:
+        evaluation = await self.try_evaluate_answer(
+            role, difficulty, stage, q_count, weak_areas, strong_areas, question, answer,
+            priority,
+        )
+        return evaluation if evaluation is not None else dict(_EVALUATION_FALLBACK)
+
+    async def evaluate_answer_within_budget(
+        self, role, difficulty, stage, q_count, weak_areas, strong_areas, question, answer,
+        budget: Optional[float] = None, conversation: Optional[str] = None,
     ) -> dict:
-        prompt = f"""You are evaluating a user's interview answer.
+        """
+        Like `evaluate_answer_v2`, but if Gemini hasn't produced a usable
+        evaluation within `budget` seconds (default EVALUATION_BUDGET_SECONDS,
+        queue wait included) the call is cancelled and the answer is scored
+        locally by the heuristic evaluator instead, flagged `needs_rescore`.
+        """
+        budget = settings.EVALUATION_BUDGET_SECONDS if budget is None else budget
+        try:
+            evaluation = await asyncio.wait_for(
+                self.try_evaluate_answer(
+                    role, difficulty, stage, q_count, weak_areas, strong_areas,
+                    question, answer, Priority.INTERACTIVE, conversation,
+                ),
+                timeout=budget,
+            )
+            reason = "error"
+        except asyncio.TimeoutError:
+            evaluation, reason = None, "timeout"
+
+        if evaluation is not None:
+            self.evaluation_counts["llm"] += 1
+            return evaluation
+        logger.warning("Answer evaluation fell back to heuristics (%s)", reason)
+        self.evaluation_counts[f"heuristic_{reason}"] += 1
+        evaluation = heuristic_evaluator.evaluate(question, answer, difficulty)
+        evaluation["fallback_reason"] = reason
+        return evaluation
+
+    async def try_evaluate_answer(
+        self, role, difficulty, stage, q_count, weak_areas, strong_areas, question, answer,
+        priority: Priority, conversation: Optional[str] = None,
+    ) -> Optional[dict]:
+        """
+        Gemini's evaluation, or None if the call failed or returned no usable
+        score. `conversation` is the session's budgeted context
+        (see app.services.conversation_memory).
+        """
+        prompt = self._evaluation_prompt(
+            role, difficulty, stage, q_count, weak_areas, strong_areas, question,
+            answer, conversation,
+            task="Evaluate the answer and return JSON only.", output=_EVALUATION_JSON,
+        )
+        evaluation = await self._generate_structured(prompt, AnswerEvaluation, priority)
+        return evaluation.model_dump() if evaluation else None
+
+    async def evaluate_spoken_answer_within_budget(
+        self, role, difficulty, stage, q_count, weak_areas, strong_areas, question,
+        audio: bytes, mime_type: str, budget: Optional[float] = None,
+        conversation: Optional[str] = None,
+    ) -> Optional[Tuple[str, dict]]:
+        """
+        Transcribe and evaluate a spoken answer in one Gemini call: the audio
+        goes inline with the evaluation prompt and the reply carries both the
+        transcript and the evaluation fields. Returns (transcript, evaluation),
+        or None if the call failed or missed `budget` seconds (default
+        AUDIO_TURN_BUDGET_SECONDS), in which case the caller transcribes and
+        evaluates separately.
+        """
+        budget = settings.AUDIO_TURN_BUDGET_SECONDS if budget is None else budget
+        prompt = self._evaluation_prompt(
+            role, difficulty, stage, q_count, weak_areas, strong_areas, question,
+            "(the attached audio recording)", conversation,
+            task=(
+                "Transcribe the candidate's spoken answer exactly as spoken into "
+                '"transcript" (empty if there is no speech), then evaluate what they '
+                "said and return JSON only."
+            ),
+            output=_SPOKEN_EVALUATION_JSON,
+        )
+        try:
+            result = await asyncio.wait_for(
+                self._generate_structured(
+                    prompt, SpokenAnswerEvaluation, Priority.INTERACTIVE, (audio, mime_type)
+                ),
+                timeout=budget,
+            )
+            reason = "error"
+        except asyncio.TimeoutError:
+            result, reason = None, "timeout"
+
+        if result is None:
+            logger.warning("Audio-native evaluation failed (%s); transcribing separately", reason)
+            self.spoken_counts[f"fallback_{reason}"] += 1
+            return None
+        self.spoken_counts["native"] += 1
+        self.evaluation_counts["llm"] += 1
+        evaluation = result.model_dump(exclude={"transcript"})
+        return result.transcript.strip(), evaluation
+
+    @staticmethod
+    def _evaluation_prompt(
+        role, difficulty, stage, q_count, weak_areas, strong_areas, question, answer,
+        conversation: Optional[str], task: str, output: str,
+    ) -> str:
+        return f"""You are evaluating a user's interview answer.
 
 INPUT:
 - Role: {role}
@@ -82,32 +284,65 @@ INPUT:
 - Question Count: {q_count}
 - Weak Areas: {weak_areas}
 - Strong Areas: {strong_areas}
+- Earlier In This Interview:
+{conversation or 'Not available.'}
 - Question: {question}
 - User Answer: {answer}
 
-TASK: Evaluate the answer and return JSON only.
+TASK: {task}
 
 OUTPUT JSON:
-{{
-  "score": <number 1-10>,
-  "classification": "<strong|weak>",
-  "critical_mistake": "<string or null>",
-  "difficulty_trend": "<upgrade|downgrade|stable>",
-  "next_focus": "<string>",
-  "stage_change": "<technical_deep_dive|soft_skills|closing|null>",
-  "end_interview": <true|false>
-}}"""
-        text = self._generate_json(prompt)
-        return self._extract_json(text, {
-            "score": 5, "classification": "weak",
-            "next_focus": "Move to new topic",
-            "feedback": "Could not parse AI evaluation.",
-        })
+{output}"""
+
+    async def evaluate_answers_packed(
+        self, items: List[Dict[str, Any]], priority: Priority = Priority.BACKGROUND
+    ) -> List[Optional[dict]]:
+        """
+        Grade several standalone question/answer pairs in one JSON prompt.
+        Each item needs role, difficulty, question and answer. Returns one
+        evaluation per item, in order; an item the model skipped or garbled
+        is None so the caller can grade it on its own.
+        """
+        blocks = "\n\n".join(
+            f"ITEM #{i}\n- Role: {item['role']}\n- Difficulty: {item['difficulty']}\n"
+            f"- Question: {item['question']}\n- User Answer: {item['answer']}"
+            for i, item in enumerate(items, start=1)
+        )
+        prompt = f"""You are grading {len(items)} independent interview answers.
+Grade each item on its own; never let one answer influence another.
+
+{blocks}
+
+TASK: Evaluate every item and return JSON only.
+
+OUTPUT JSON:
+{{"results": [{{"item": <item number>, ...evaluation}}, ...]}}
+where each evaluation has these fields:
+{_EVALUATION_JSON}"""
+        packed = await self._generate_structured(prompt, PackedEvaluations, priority)
+
+        evaluations: List[Optional[dict]] = [None] * len(items)
+        for entry in packed.results if packed else []:
+            if entry.item <= len(items):
+                evaluations[entry.item - 1] = entry.model_dump(exclude={"item"})
+        return evaluations
 
     async def generate_question_v2(
-        self, role, difficulty, stage, weak_areas, strong_areas, directive
+        self, role, difficulty, stage, weak_areas, strong_areas, directive,
+        previous_questions=None, conversation=None, priority: Priority = Priority.INTERACTIVE,
+    ) -> str:
+        prompt = self.question_prompt_v2(
+            role, difficulty, stage, weak_areas, strong_areas, directive,
+            previous_questions, conversation,
+        )
+        return (await self.generate_response(prompt, priority)).strip()
+
+    @staticmethod
+    def question_prompt_v2(
+        role, difficulty, stage, weak_areas, strong_areas, directive,
+        previous_questions=None, conversation=None,
     ) -> str:
-        prompt = f"""You are a human-like technical interviewer.
+        return f"""You are a human-like technical interviewer.
 
 INPUT:
 - Role: {role}
@@ -116,19 +351,22 @@ INPUT:
 - Weak Areas: {weak_areas}
 - Strong Areas: {strong_areas}
 - Directive: {directive}
+- Conversation So Far:
+{conversation or 'None yet.'}
+- Also Already Asked: {previous_questions or 'None'}
 
 RULES:
 - Ask ONE question only. No preamble.
-- If directive says "Drill down", ask a follow-up on the same topic.
+- If directive says "Drill down", ask a follow-up on the latest answer.
 - If "Move on", ask a fresh topic question.
 - Match depth to difficulty and stage.
+- Never repeat or rephrase an already-asked question.
 
 OUTPUT: Next interview question as plain text only."""
-        return self.generate_response(prompt).strip()
 
     async def generate_final_feedback(
         self, role, difficulty_history, question_count, strong_areas, weak_areas,
-        recent_critical_mistakes, average_score, non_verbal_stats=None,
+        recent_critical_mistakes, average_score, non_verbal_stats=None, conversation=None,
     ) -> dict:
         prompt = f"""You are a senior technical interviewer giving final candidate feedback.
 
@@ -141,6 +379,8 @@ INPUT DATA:
 - Critical Mistakes: {recent_critical_mistakes}
 - Average Score: {average_score}
 - Non-Verbal Behavior: {non_verbal_stats or 'No data available.'}
+- Interview Summary:
+{conversation or 'Not available.'}
 
 TASK: Generate final interview feedback as JSON only.
 
@@ -153,13 +393,24 @@ OUTPUT JSON:
   "improvement_tips": ["<tip 1>", "<tip 2>", "<tip 3>"],
   "final_verdict": "<one paragraph summary of candidate readiness>"
 }}"""
-        text = self._generate_json(prompt)
-        return self._extract_json(text, {
+        # Final feedback is not on the candidate's turn-by-turn critical path
+        report = await self._generate_structured(
+            prompt, FinalFeedbackReport, priority=Priority.BACKGROUND
+        )
+        if report:
+            return report.model_dump()
+        return {
             "overall_score": average_score,
             "strengths": strong_areas,
             "weaknesses": weak_areas,
             "final_verdict": "Could not generate detailed feedback.",
-        })
+            "score_from_answers": True,  # Kept in step by the rescore job
+        }
 
 
 llm_service = LLMService()
+metrics.register("answer_evaluation", lambda: dict(llm_service.evaluation_counts))
+metrics.register("spoken_answers", lambda: dict(llm_service.spoken_counts))
+metrics.register("structured_output", lambda: {
+    name: dict(counts) for name, counts in llm_service.structured_counts.items()
+})
@@ -0,0 +1,186 @@
+"""
+Per-task Gemini model routing.
+
+Each task type (question, evaluation, grading, feedback, transcription) has
+an ordered list of models in `MODEL_ROUTES`. Every call goes to the first
+model that is healthy for that task. A model is unhealthy while, over the
+last `MODEL_HEALTH_WINDOW_SECONDS`, its p95 latency for the task exceeds the
+task's `MODEL_FALLBACK_P95_SECONDS` or its error rate exceeds
+`MODEL_FALLBACK_ERROR_RATE`. Old samples age out, so a degraded primary is
+only bypassed for one window and is then tried again.
+
+Latency, errors, token usage and estimated cost are tracked per model and
+reported under `model_router` in `/metrics`. Calls cancelled by a caller's
+budget still count as latency samples, because those are the slow calls
+the p95 has to see.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+TASKS = ("question", "evaluation", "grading", "feedback", "transcription")
+
+# Samples kept per (task, model) for health and per model for reporting
+_HEALTH_SAMPLES = 512
+_REPORT_SAMPLES = 1024
+
+
+def _p95(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[max(math.ceil(0.95 * len(ordered)) - 1, 0)]
+
+
+class _ModelTotals:
+    __slots__ = ("calls", "errors", "cancelled", "seconds", "latencies",
+                 "input_tokens", "output_tokens")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.seconds = 0.0
+        self.latencies: Deque[float] = deque(maxlen=_REPORT_SAMPLES)
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+
+class ModelRouter:
+    def __init__(self):
+        # (task, model) -> deque of (monotonic time, seconds, ok)
+        self._health: Dict[Tuple[str, str], Deque[Tuple[float, float, bool]]] = {}
+        self._totals: Dict[str, _ModelTotals] = {}
+        self.fallbacks: Dict[str, int] = {}
+
+    def route(self, task: str) -> List[str]:
+        models = settings.MODEL_ROUTES.get(task)
+        if not models:
+            raise KeyError(f"No model route configured for task {task!r}")
+        return models
+
+    def health(self, task: str, model: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """Recent sample count, p95 latency and error rate of `model` on `task`."""
+        samples = self._health.get((task, model))
+        now = time.monotonic() if now is None else now
+        cutoff = now - settings.MODEL_HEALTH_WINDOW_SECONDS
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        if not samples:
+            return {"samples": 0, "p95_seconds": None, "error_rate": None}
+        return {
+            "samples": len(samples),
+            "p95_seconds": round(_p95([s for _, s, _ in samples]), 3),
+            "error_rate": round(sum(1 for *_, ok in samples if not ok) / len(samples), 3),
+        }
+
+    def _healthy(self, task: str, health: Dict[str, Any]) -> bool:
+        if health["samples"] < settings.MODEL_HEALTH_MIN_SAMPLES:
+            return True  # Not enough evidence against it
+        p95_limit = settings.MODEL_FALLBACK_P95_SECONDS.get(task, math.inf)
+        return (
+            health["p95_seconds"] <= p95_limit
+            and health["error_rate"] <= settings.MODEL_FALLBACK_ERROR_RATE
+        )
+
+    def choose(self, task: str) -> str:
+        """The first healthy model on the task's route (or the least bad one)."""
+        models = self.route(task)
+        now = time.monotonic()
+        healths = [self.health(task, model, now) for model in models]
+        for i, (model, health) in enumerate(zip(models, healths)):
+            if self._healthy(task, health):
+                if i:
+                    self.fallbacks[task] = self.fallbacks.get(task, 0) + 1
+                return model
+        # Everything is degraded: the model failing least, then the fastest
+        best = min(
+            range(len(models)),
+            key=lambda i: (healths[i]["error_rate"], healths[i]["p95_seconds"], i),
+        )
+        if best:
+            self.fallbacks[task] = self.fallbacks.get(task, 0) + 1
+        return models[best]
+
+    def record(
+        self, task: str, model: str, seconds: float, ok: bool = True,
+        usage: Any = None, cancelled: bool = False,
+    ) -> None:
+        """Book one call. `usage` is the response's `usage_metadata`, if any."""
+        self._health.setdefault(
+            (task, model), deque(maxlen=_HEALTH_SAMPLES)
+        ).append((time.monotonic(), seconds, ok))
+        totals = self._totals.setdefault(model, _ModelTotals())
+        totals.calls += 1
+        totals.seconds += seconds
+        totals.latencies.append(seconds)
+        if cancelled:
+            totals.cancelled += 1
+        elif not ok:
+            totals.errors += 1
+        if usage is not None:
+            totals.input_tokens += getattr(usage, "prompt_token_count", None) or 0
+            # Thinking tokens are billed as output
+            totals.output_tokens += (
+                (getattr(usage, "candidates_token_count", None) or 0)
+                + (getattr(usage, "thoughts_token_count", None) or 0)
+            )
+
+    async def run(self, task: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+        """Await `call(model)` on the chosen model for `task`, timing it."""
+        model = self.choose(task)
+        start = time.perf_counter()
+        try:
+            response = await call(model)
+        except asyncio.CancelledError:
+            self.record(task, model, time.perf_counter() - start, cancelled=True)
+            raise
+        except Exception:
+            self.record(task, model, time.perf_counter() - start, ok=False)
+            raise
+        self.record(
+            task, model, time.perf_counter() - start,
+            usage=getattr(response, "usage_metadata", None),
+        )
+        return response
+
+    def _cost(self, model: str, totals: _ModelTotals) -> Optional[float]:
+        prices = settings.MODEL_PRICES_PER_MTOK.get(model)
+        if not prices:
+            return None
+        return round(
+            (totals.input_tokens * prices[0] + totals.output_tokens * prices[1]) / 1e6, 6
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        models = {}
+        for model, totals in self._totals.items():
+            latencies = sorted(totals.latencies)
+            models[model] = {
+                "calls": totals.calls,
+                "errors": totals.errors,
+                "cancelled": totals.cancelled,
+                "avg_seconds": round(totals.seconds / totals.calls, 3),
+                "p50_seconds": round(latencies[len(latencies) // 2], 3),
+                "p95_seconds": round(_p95(latencies), 3),
+                "input_tokens": totals.input_tokens,
+                "output_tokens": totals.output_tokens,
+                "cost_usd": self._cost(model, totals),
+            }
+        now = time.monotonic()
+        tasks = {
+            task: {
+                "route": list(route),
+                "fallbacks": self.fallbacks.get(task, 0),
+                "health": {model: self.health(task, model, now) for model in route},
+            }
+            for task, route in settings.MODEL_ROUTES.items()
+        }
+        return {"models": models, "tasks": tasks}
+
+
+model_router = ModelRouter()
+metrics.register("model_router", model_router.stats)
@@ -0,0 +1,308 @@
+"""
+Frame-level non-verbal signals (eye contact, head stability, …) aggregated
+into one compact window per answer.
+
+Clients push frames at 5–10 Hz to `/api/interview/non-verbal`, either as
+little-endian float32 rows or as JSON columns. Each channel is a 0–100 score,
+and NaN / null means "not measured in this frame". A batch is reduced with
+NumPy to per-channel moments (count, missing, sum, sum of squares, min, max)
+plus a fixed-width histogram. Both are additive, so batches merge exactly and
+percentiles can be read from the histogram to within one bin. A window is a
+small document of per-channel counters, however long the answer was, and
+lives outside the `Interview` document. Batches are folded in with an atomic
+`$inc` / `$min` / `$max` upsert, so concurrent batches for one answer can
+land on different workers without losing frames.
+"""
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core import metrics
+from app.services.session_service import session_service
+from app.services.session_store import SessionStore
+
+CHANNELS = ("eye_contact", "head_stability", "posture", "expressiveness")
+SCORE_RANGE = 100.0
+BINS = 25  # 4-point buckets
+PERCENTILES = (10, 50, 90)
+
+# Columns of the moments matrix, and their field names in a stored window
+_COUNT, _MISSING, _SUM, _SUMSQ, _MIN, _MAX = range(6)
+_FIELDS = ("count", "missing", "sum", "sumsq", "min", "max")
+
+
+class NonVerbalFormatError(ValueError):
+    """A batch of frames can't be decoded."""
+
+
+class WindowStats:
+    """Mergeable per-channel moments and histograms for one answer."""
+
+    __slots__ = ("moments", "histogram")
+
+    def __init__(self, moments: Optional[np.ndarray] = None, histogram: Optional[np.ndarray] = None):
+        if moments is None:
+            moments = np.zeros((len(CHANNELS), 6), dtype=np.float64)
+            moments[:, _MIN] = np.inf
+            moments[:, _MAX] = -np.inf
+        self.moments = moments
+        self.histogram = (
+            histogram if histogram is not None
+            else np.zeros((len(CHANNELS), BINS), dtype=np.uint32)
+        )
+
+    @classmethod
+    def from_frames(cls, frames: np.ndarray) -> "WindowStats":
+        """Reduce an (n, len(CHANNELS)) float array (NaN = missing)."""
+        values = np.clip(frames.astype(np.float64), 0.0, SCORE_RANGE)
+        valid = ~np.isnan(values)
+        zeroed = np.where(valid, values, 0.0)
+
+        moments = np.empty((len(CHANNELS), 6), dtype=np.float64)
+        moments[:, _COUNT] = valid.sum(axis=0)
+        moments[:, _MISSING] = len(values) - moments[:, _COUNT]
+        moments[:, _SUM] = zeroed.sum(axis=0)
+        moments[:, _SUMSQ] = (zeroed ** 2).sum(axis=0)
+        moments[:, _MIN] = np.where(valid, values, np.inf).min(axis=0, initial=np.inf)
+        moments[:, _MAX] = np.where(valid, values, -np.inf).max(axis=0, initial=-np.inf)
+
+        # One bincount for every channel: offset each channel's bins by channel * BINS
+        bins = np.minimum((zeroed * (BINS / SCORE_RANGE)).astype(np.intp), BINS - 1)
+        bins += np.arange(len(CHANNELS)) * BINS
+        histogram = np.bincount(bins[valid], minlength=len(CHANNELS) * BINS)
+        return cls(moments, histogram.reshape(len(CHANNELS), BINS).astype(np.uint32))
+
+    def merge(self, other: "WindowStats") -> "WindowStats":
+        moments = self.moments + other.moments
+        moments[:, _MIN] = np.minimum(self.moments[:, _MIN], other.moments[:, _MIN])
+        moments[:, _MAX] = np.maximum(self.moments[:, _MAX], other.moments[:, _MAX])
+        return WindowStats(moments, self.histogram + other.histogram)
+
+    @property
+    def frames(self) -> int:
+        """Frames received (measured or not); the same for every channel."""
+        return int(self.moments[0, _COUNT] + self.moments[0, _MISSING])
+
+    def update_fields(self) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, float]]:
+        """
+        This batch as dotted-path (increments, minimums, maximums) for an
+        atomic merge into a stored window (see `SessionStore.merge_non_verbal_window`).
+        """
+        inc: Dict[str, float] = {}
+        low: Dict[str, float] = {}
+        high: Dict[str, float] = {}
+        for c, name in enumerate(CHANNELS):
+            for col in (_COUNT, _MISSING, _SUM, _SUMSQ):
+                if self.moments[c, col]:
+                    inc[f"moments.{name}.{_FIELDS[col]}"] = float(self.moments[c, col])
+            if self.moments[c, _COUNT]:
+                low[f"moments.{name}.min"] = float(self.moments[c, _MIN])
+                high[f"moments.{name}.max"] = float(self.moments[c, _MAX])
+            for b in np.flatnonzero(self.histogram[c]):
+                inc[f"histogram.{name}.{b}"] = int(self.histogram[c, b])
+        return inc, low, high
+
+    @classmethod
+    def from_document(cls, fields: Dict[str, Any]) -> "WindowStats":
+        """A stored window: counters by channel, plus any legacy packed `stats`."""
+        window = cls.unpack(fields["stats"]) if fields.get("stats") else cls()
+        moments = fields.get("moments") or {}
+        histograms = fields.get("histogram") or {}
+        for c, name in enumerate(CHANNELS):
+            m = moments.get(name) or {}
+            for col in (_COUNT, _MISSING, _SUM, _SUMSQ):
+                window.moments[c, col] += m.get(_FIELDS[col], 0.0)
+            if "min" in m:
+                window.moments[c, _MIN] = min(window.moments[c, _MIN], m["min"])
+                window.moments[c, _MAX] = max(window.moments[c, _MAX], m["max"])
+            for b, count in (histograms.get(name) or {}).items():
+                window.histogram[c, int(b)] += count
+        return window
+
+    def pack(self) -> bytes:
+        return self.moments.astype("<f8").tobytes() + self.histogram.astype("<u4").tobytes()
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "WindowStats":
+        split = len(CHANNELS) * 6 * 8
+        if len(data) != split + len(CHANNELS) * BINS * 4:
+            raise ValueError("Packed window does not match the channel layout")
+        moments = np.frombuffer(data[:split], dtype="<f8").reshape(len(CHANNELS), 6).copy()
+        histogram = np.frombuffer(data[split:], dtype="<u4").reshape(len(CHANNELS), BINS).copy()
+        return cls(moments, histogram)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Mean, std, percentiles, range and coverage of every measured channel."""
+        count = self.moments[:, _COUNT]
+        measured = count > 0
+        safe = np.where(measured, count, 1)
+        mean = self.moments[:, _SUM] / safe
+        std = np.sqrt(np.maximum(self.moments[:, _SUMSQ] / safe - mean ** 2, 0.0))
+        coverage = count / np.maximum(count + self.moments[:, _MISSING], 1)
+        quantiles = self._percentiles(np.array(PERCENTILES) / 100)
+
+        return {
+            name: {
+                "mean": round(float(mean[c]), 1),
+                "std": round(float(std[c]), 1),
+                **{f"p{p}": round(float(quantiles[c, i]), 1) for i, p in enumerate(PERCENTILES)},
+                "min": round(float(self.moments[c, _MIN]), 1),
+                "max": round(float(self.moments[c, _MAX]), 1),
+                "coverage": round(float(coverage[c]), 2),
+            }
+            for c, name in enumerate(CHANNELS)
+            if measured[c]
+        }
+
+    def _percentiles(self, qs: np.ndarray) -> np.ndarray:
+        """(channels, len(qs)) percentiles, interpolated linearly inside histogram bins."""
+        width = SCORE_RANGE / BINS
+        cumulative = np.cumsum(self.histogram, axis=1, dtype=np.float64)
+        out = np.zeros((len(CHANNELS), len(qs)))
+        for c in range(len(CHANNELS)):
+            total = cumulative[c, -1]
+            if not total:
+                continue
+            targets = qs * total
+            bins = np.searchsorted(cumulative[c], targets, side="left")
+            below = np.where(bins > 0, cumulative[c, bins - 1], 0.0)
+            inside = self.histogram[c, bins]
+            fraction = np.where(inside > 0, (targets - below) / np.maximum(inside, 1), 0.0)
+            out[c] = np.clip(
+                (bins + fraction) * width, self.moments[c, _MIN], self.moments[c, _MAX]
+            )
+        return out
+
+
+# ── Decoding ────────────────────────────────────────────────────────────────
+
+def _channel_indexes(names: Sequence[str]) -> List[int]:
+    unknown = [n for n in names if n not in CHANNELS]
+    if unknown:
+        raise NonVerbalFormatError(
+            f"Unknown channel(s) {', '.join(unknown)}; expected any of {', '.join(CHANNELS)}"
+        )
+    if len(set(names)) != len(names):
+        raise NonVerbalFormatError("Duplicate channel names")
+    return [CHANNELS.index(n) for n in names]
+
+
+def decode_frames(body: bytes, content_type: Optional[str], channels: Optional[str] = None) -> np.ndarray:
+    """
+    Decode a batch into an (n, len(CHANNELS)) float32 array, NaN where a
+    channel wasn't sent or measured.
+
+    - `application/json`: columns, e.g. `{"eye_contact": [81, 79, null], …}`.
+    - anything else: little-endian float32 rows holding the comma-separated
+      `channels` (default: all of `CHANNELS`, in order).
+    """
+    if content_type and content_type.split(";")[0].strip().lower() == "application/json":
+        try:
+            columns = json.loads(body)
+        except ValueError:
+            raise NonVerbalFormatError("Body is not valid JSON")
+        if not isinstance(columns, dict) or not columns:
+            raise NonVerbalFormatError("Expected an object of channel name -> list of values")
+        indexes = _channel_indexes(list(columns))
+        lengths = {len(v) if isinstance(v, list) else -1 for v in columns.values()}
+        if len(lengths) != 1 or -1 in lengths:
+            raise NonVerbalFormatError("Channels must be lists of equal length")
+        try:
+            data = np.array(
+                [[np.nan if x is None else x for x in v] for v in columns.values()],
+                dtype=np.float32,
+            ).T.reshape(lengths.pop(), len(indexes))
+        except (TypeError, ValueError):
+            raise NonVerbalFormatError("Channel values must be numbers or null")
+    else:
+        names = [n.strip() for n in channels.split(",")] if channels else list(CHANNELS)
+        indexes = _channel_indexes(names)
+        row_bytes = 4 * len(indexes)
+        if len(body) % row_bytes:
+            raise NonVerbalFormatError(
+                f"Body length {len(body)} is not a multiple of {row_bytes} "
+                f"({len(indexes)} float32 channels per frame)"
+            )
+        data = np.frombuffer(body, dtype="<f4").reshape(-1, len(indexes))
+
+    frames = np.full((len(data), len(CHANNELS)), np.nan, dtype=np.float32)
+    frames[:, indexes] = data
+    frames[~np.isfinite(frames)] = np.nan
+    return frames
+
+
+def frame_from_metrics(values: Dict[str, Any]) -> np.ndarray:
+    """
+    One frame from the per-answer `non_verbal_metrics` dict sent with /chat
+    (keys may carry a `_score` suffix, e.g. `eye_contact_score`).
+    """
+    frame = np.full((1, len(CHANNELS)), np.nan, dtype=np.float32)
+    for c, name in enumerate(CHANNELS):
+        value = values.get(name, values.get(f"{name}_score"))
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            frame[0, c] = value
+    return frame
+
+
+# ── Service ─────────────────────────────────────────────────────────────────
+
+class NonVerbalService:
+    def __init__(self, store: SessionStore):
+        self.store = store
+        self.batches = 0
+        self.frames = 0
+
+    async def ingest(self, session_id: str, question: int, frames: np.ndarray) -> WindowStats:
+        """Fold a batch of frames into the window of answer `question`; returns the merged window."""
+        inc, low, high = WindowStats.from_frames(frames).update_fields()
+        window = WindowStats.from_document(
+            await self.store.merge_non_verbal_window(session_id, question, inc, low, high)
+        )
+        self.batches += 1
+        self.frames += len(frames)
+        return window
+
+    async def summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Whole-interview channel stats plus each answer's channel means."""
+        windows = [
+            (order, WindowStats.from_document(fields))
+            for order, fields in await self.store.load_non_verbal_windows(session_id)
+        ]
+        if not windows:
+            return None
+        total = WindowStats()
+        for _, window in windows:
+            total = total.merge(window)
+        channels = total.summary()
+        per_answer = {order: window.summary() for order, window in windows}
+        for name, stats in channels.items():
+            stats["per_answer_mean"] = {
+                order: s[name]["mean"] for order, s in per_answer.items() if name in s
+            }
+        return {"frames": total.frames, "answers": len(windows), "channels": channels}
+
+    async def describe(self, session_id: str) -> Optional[str]:
+        """`summary()` rendered as compact lines for the final feedback prompt."""
+        summary = await self.summary(session_id)
+        if not summary or not summary["channels"]:
+            return None
+        lines = [
+            f"Measured over {summary['frames']} frames across {summary['answers']} answers "
+            "(scores 0-100):"
+        ]
+        for name, s in summary["channels"].items():
+            trend = ", ".join(f"Q{q} {m:g}" for q, m in s["per_answer_mean"].items())
+            lines.append(
+                f"  {name}: mean {s['mean']:g} (sd {s['std']:g}), p10 {s['p10']:g}, "
+                f"median {s['p50']:g}, p90 {s['p90']:g}, measured in "
+                f"{s['coverage']:.0%} of frames; per answer: {trend}"
+            )
+        return "\n".join(lines)
+
+    def stats(self) -> Dict[str, int]:
+        return {"batches": self.batches, "frames": self.frames}
+
+
+non_verbal_service = NonVerbalService(session_service.store)
+metrics.register("non_verbal", non_verbal_service.stats)
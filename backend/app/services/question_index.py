@@ -0,0 +1,252 @@
+"""
+Per-user index of questions already asked, so later sessions don't repeat them.
+
+Every question is reduced to a MinHash signature over its content-word shingles;
+two signatures agree in a position with probability equal to the Jaccard
+similarity of the questions' shingle sets. Signatures are split into LSH bands,
+so a lookup only probes `BANDS` hash buckets and compares the handful of
+candidates that share a band, independent of how many questions the user has
+been asked. Signatures are persisted through the session store and cached per
+worker.
+"""
+import asyncio
+import random
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.session_service import session_service
+from app.services.session_store import SessionStore
+
+# 32 bands of 2 rows: pairs at the default 0.5 threshold share a band with
+# probability 1 - (1 - 0.5**2)**32 ≈ 0.9999
+NUM_PERM = 64
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+
+# Fixed seed: signatures are persisted, so every process must hash identically
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, _PRIME, size=(NUM_PERM, 1), dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=(NUM_PERM, 1), dtype=np.uint64)
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an the and or but if then of to in on at for with by from as into about like such
+is are was were be been being do does did have has had can could would should will
+shall may might must you your yours we our i me my it its this that these those
+what which who whom how why when where there here than so very just also not no
+tell walk describe explain give example through please briefly difference between
+""".split())
+
+# Served when the model keeps producing near-duplicates
+ALTERNATE_QUESTIONS = (
+    "Tell me about a technical decision you made that you later had to reverse. What did you learn?",
+    "Walk me through how you would debug a production issue you cannot reproduce locally.",
+    "Describe a project where requirements changed late. How did you adapt the design?",
+    "How do you decide when code is good enough to ship versus when it needs more work?",
+    "Explain a complex system you have worked on to someone outside engineering.",
+    "What is the most useful piece of feedback you received in a code review, and why?",
+    "How would you approach taking over a large codebase with no documentation?",
+    "Tell me about a time you disagreed with a teammate on a technical approach.",
+    "Which metrics would you watch first after deploying a risky change, and why?",
+    "Describe how you would break down a vague feature request into deliverable pieces.",
+)
+
+
+def content_words(text: str) -> List[str]:
+    """
+    Lower-cased words of `text` without stopwords and interviewer filler
+    ("can you walk me through…"), with a trailing plural "s" stripped.
+    """
+    return [
+        w[:-1] if len(w) > 3 and w.endswith("s") else w
+        for w in _NON_WORD.sub(" ", text.lower()).split()
+        if len(w) > 1 and w not in _STOPWORDS  # len > 1 also drops contraction tails
+    ]
+
+
+def shingles(text: str) -> List[str]:
+    """Content words plus adjacent word pairs, so similarity tracks the topic."""
+    words = content_words(text)
+    if not words:
+        return [text.lower().strip()]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values) of a question."""
+    grams = set(shingles(text))
+    hashes = np.fromiter(
+        (zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams)
+    ) % _PRIME
+    # One universal hash per permutation, all shingles at once: (NUM_PERM, n)
+    return ((_A * hashes + _B) % _PRIME).min(axis=1).astype("<u4")
+
+
+class _UserIndex:
+    """LSH buckets over one user's signatures (rows of a growable matrix)."""
+
+    __slots__ = ("matrix", "size", "buckets", "loaded_at")
+
+    def __init__(self):
+        self.matrix = np.empty((16, NUM_PERM), dtype="<u4")
+        self.size = 0
+        self.buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(BANDS)]
+        self.loaded_at = time.monotonic()
+
+    def add(self, sig: np.ndarray) -> None:
+        if self.size == len(self.matrix):
+            self.matrix = np.concatenate([self.matrix, np.empty_like(self.matrix)])
+        row = self.size
+        self.matrix[row] = sig
+        self.size += 1
+        for band, key in enumerate(_band_keys(sig)):
+            self.buckets[band].setdefault(key, []).append(row)
+
+    def best_match(self, sig: np.ndarray) -> float:
+        """Highest estimated Jaccard similarity among LSH candidates (0 if none)."""
+        candidates = set()
+        for band, key in enumerate(_band_keys(sig)):
+            candidates.update(self.buckets[band].get(key, ()))
+        if not candidates:
+            return 0.0
+        rows = self.matrix[np.fromiter(candidates, dtype=np.intp, count=len(candidates))]
+        return float((rows == sig).sum(axis=1).max()) / NUM_PERM
+
+
+def _band_keys(sig: np.ndarray) -> List[bytes]:
+    raw = sig.tobytes()
+    width = ROWS * 4
+    return [raw[i:i + width] for i in range(0, len(raw), width)]
+
+
+class QuestionIndexService:
+    def __init__(
+        self,
+        store: SessionStore,
+        threshold: Optional[float] = None,
+        max_cached_users: int = 1000,
+    ):
+        self.store = store
+        self.threshold = threshold if threshold is not None else settings.QUESTION_DUPLICATE_THRESHOLD
+        self.max_cached_users = max_cached_users
+        self._indexes: "OrderedDict[str, _UserIndex]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+        self.duplicates = 0
+        self.failed = 0
+        self.regenerated = 0
+        self.served_from_pool = 0
+
+    async def _index(self, user_id: Optional[str], session_id: str) -> _UserIndex:
+        # Anonymous sessions are only deduplicated within themselves, in memory
+        key = user_id or f"session:{session_id}"
+        index = self._indexes.get(key)
+        if not self._is_fresh(index, user_id):
+            async with self._locks.setdefault(key, asyncio.Lock()):
+                index = self._indexes.get(key)
+                if not self._is_fresh(index, user_id):
+                    index = await self._load(user_id)
+                    self._indexes[key] = index
+        self._indexes.move_to_end(key)
+        while len(self._indexes) > self.max_cached_users:
+            evicted, _ = self._indexes.popitem(last=False)
+            self._locks.pop(evicted, None)
+        return index
+
+    @staticmethod
+    def _is_fresh(index: Optional[_UserIndex], user_id: Optional[str]) -> bool:
+        if index is None:
+            return False
+        # Reload users now and then: other workers add signatures too
+        return not user_id or (
+            time.monotonic() - index.loaded_at < settings.QUESTION_INDEX_CACHE_SECONDS
+        )
+
+    async def _load(self, user_id: Optional[str]) -> _UserIndex:
+        index = _UserIndex()
+        if user_id:
+            for raw in await self.store.load_question_signatures(user_id):
+                index.add(np.frombuffer(raw, dtype="<u4"))
+        return index
+
+    async def similarity(self, user_id: Optional[str], session_id: str, question: str) -> float:
+        """Estimated Jaccard similarity to the closest question already asked."""
+        index = await self._index(user_id, session_id)
+        start = time.perf_counter()
+        best = index.best_match(signature(question))
+        self.lookups += 1
+        self.lookup_seconds += time.perf_counter() - start
+        return best
+
+    async def record(self, user_id: Optional[str], session_id: str, question: str) -> None:
+        """Add a question that is being asked to the user's index."""
+        sig = signature(question)
+        (await self._index(user_id, session_id)).add(sig)
+        if user_id:
+            await self.store.add_question_signature(user_id, sig.tobytes())
+
+    async def fresh_question(
+        self,
+        user_id: Optional[str],
+        session_id: str,
+        generate: Callable[[List[str]], Awaitable[str]],
+        retries: Optional[int] = None,
+    ) -> str:
+        """
+        Call `generate(rejected)` until it produces a question that is not a
+        near-duplicate of one already asked, passing the rejected attempts so
+        the prompt can steer away from them. After `retries` regenerations an
+        unused question from `ALTERNATE_QUESTIONS` is served instead. A failed
+        generation uses up an attempt and is never recorded or served.
+        """
+        # Imported here: llm_service's heuristic evaluator imports this module
+        from app.services.llm_service import GENERATION_FAILED
+
+        retries = settings.QUESTION_DEDUP_RETRIES if retries is None else retries
+        rejected: List[str] = []
+        for attempt in range(retries + 1):
+            question = await generate(rejected)
+            if not question or question.strip() in ("", GENERATION_FAILED):
+                self.failed += 1
+                continue
+            if await self.similarity(user_id, session_id, question) < self.threshold:
+                if attempt:
+                    self.regenerated += 1
+                await self.record(user_id, session_id, question)
+                return question
+            self.duplicates += 1
+            rejected.append(question)
+
+        for alternate in random.sample(ALTERNATE_QUESTIONS, len(ALTERNATE_QUESTIONS)):
+            if await self.similarity(user_id, session_id, alternate) < self.threshold:
+                self.served_from_pool += 1
+                await self.record(user_id, session_id, alternate)
+                return alternate
+        # Everything has been asked before: repeat the latest attempt
+        return rejected[-1] if rejected else random.choice(ALTERNATE_QUESTIONS)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "cached_users": len(self._indexes),
+            "lookups": self.lookups,
+            "avg_lookup_us": (
+                round(self.lookup_seconds / self.lookups * 1e6, 1) if self.lookups else None
+            ),
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "regenerated": self.regenerated,
+            "served_from_pool": self.served_from_pool,
+        }
+
+
+question_index = QuestionIndexService(session_service.store)
+metrics.register("question_index", question_index.stats)
@@ -3,7 +3,6 @@ import os
 import shutil
 import uuid
 
-from pypdf import PdfReader
 from fastapi import UploadFile
 
 from app.models.resume import Resume
@@ -13,11 +12,14 @@ logger = logging.getLogger(__name__)
 
 class ResumeService:
     def __init__(self):
+        # Created on first upload rather than at import time
         self.upload_dir = "uploads/resumes"
-        os.makedirs(self.upload_dir, exist_ok=True)
 
     async def process_resume(self, session_id: str, file: UploadFile) -> str:
         """Save the uploaded PDF, extract its text, and persist to MongoDB."""
+        from pypdf import PdfReader  # Deferred: only needed for uploads
+
+        os.makedirs(self.upload_dir, exist_ok=True)
         file_extension = file.filename.split(".")[-1]
         unique_filename = f"{session_id}_{uuid.uuid4()}.{file_extension}"
         file_path = os.path.join(self.upload_dir, unique_filename)
@@ -0,0 +1,148 @@
+"""
+"How did I do compared to others?": where an overall score ranks among every
+completed interview for the same role and difficulty.
+
+Overall scores are bounded (0–10) and reported to one decimal place, so the
+sketch is a fixed 101-bin histogram at 0.1-point resolution. That is exact
+for such scores, unlike t-digest or KLL. It merges by addition, which lets
+every worker fold completions in with an atomic `$inc`, and it answers
+percentile and quantile queries in constant time and memory. Each worker
+caches sketches for `SCORE_INDEX_CACHE_SECONDS`. Auto-completed (abandoned)
+interviews are left out. `python -m app.jobs.rebuild_score_index` rebuilds
+every sketch from history in one aggregation pass.
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.analytics_service import normalize_area
+from app.services.session_store import SessionStore
+
+SCORE_MAX = 10.0
+RESOLUTION = 10                       # Bins per score point
+BINS = int(SCORE_MAX * RESOLUTION) + 1
+QUARTILES = (0.25, 0.5, 0.75)
+_CACHE_SIZE = 1024
+
+
+def role_key(role: str) -> str:
+    """Canonical role name, so "Backend Engineer " and "backend engineer" share a sketch."""
+    return normalize_area(role)
+
+
+def difficulty_key(difficulty: str) -> str:
+    return str(difficulty).strip().lower()
+
+
+def score_bin(score: float) -> int:
+    return int(min(max(round(float(score) * RESOLUTION), 0), BINS - 1))
+
+
+class ScoreSketch:
+    """Mergeable histogram of overall scores at 1 / RESOLUTION point."""
+
+    __slots__ = ("counts",)
+
+    def __init__(self, counts: Optional[np.ndarray] = None):
+        self.counts = counts if counts is not None else np.zeros(BINS, dtype=np.int64)
+
+    @classmethod
+    def from_bins(cls, bins: Dict[int, int]) -> "ScoreSketch":
+        counts = np.zeros(BINS, dtype=np.int64)
+        for index, count in bins.items():
+            if 0 <= index < BINS:
+                counts[index] += count
+        return cls(counts)
+
+    def add(self, score: float) -> None:
+        self.counts[score_bin(score)] += 1
+
+    def merge(self, other: "ScoreSketch") -> "ScoreSketch":
+        return ScoreSketch(self.counts + other.counts)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def percentile_rank(self, score: float) -> Optional[float]:
+        """Percent of scores below `score`, counting ties as half (mid-rank)."""
+        total = self.total
+        if not total:
+            return None
+        index = score_bin(score)
+        below = int(self.counts[:index].sum())
+        return round((below + int(self.counts[index]) / 2) / total * 100, 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The nearest-rank `q` quantile (0 < q <= 1) of the scores."""
+        total = self.total
+        if not total:
+            return None
+        rank = max(math.ceil(q * total), 1)
+        index = int(np.searchsorted(np.cumsum(self.counts), rank, side="left"))
+        return index / RESOLUTION
+
+
+class ScoreIndexService:
+    def __init__(self, store: SessionStore):
+        self.store = store
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, ScoreSketch]]" = OrderedDict()
+        self.recorded = 0
+        self.queries = 0
+        self.cache_hits = 0
+
+    async def record(self, role: str, difficulty: str, feedback: Dict[str, Any]) -> None:
+        """Fold a completed interview's overall score into its sketch."""
+        score = feedback.get("overall_score")
+        if score is None or feedback.get("auto_completed"):
+            return
+        key = (role_key(role), difficulty_key(difficulty))
+        await self.store.add_score_sample(*key, score_bin(score))
+        cached = self._cache.get(key)
+        if cached is not None:
+            cached[1].add(score)  # This worker sees its own completions at once
+        self.recorded += 1
+
+    async def sketch(self, role: str, difficulty: str) -> ScoreSketch:
+        key = (role_key(role), difficulty_key(difficulty))
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > now:
+            self.cache_hits += 1
+            self._cache.move_to_end(key)
+            return cached[1]
+        sketch = ScoreSketch.from_bins(await self.store.load_score_bins(*key))
+        self._cache[key] = (now + settings.SCORE_INDEX_CACHE_SECONDS, sketch)
+        self._cache.move_to_end(key)
+        while len(self._cache) > _CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return sketch
+
+    async def percentile(self, role: str, difficulty: str, score: float) -> Dict[str, Any]:
+        """Where `score` ranks for (role, difficulty), plus the distribution's quartiles."""
+        self.queries += 1
+        sketch = await self.sketch(role, difficulty)
+        total = sketch.total
+        enough = total >= settings.SCORE_PERCENTILE_MIN_SAMPLES
+        return {
+            "role": role_key(role),
+            "difficulty": difficulty_key(difficulty),
+            "score": score,
+            "sample_size": total,
+            "percentile": sketch.percentile_rank(score) if enough else None,
+            "quartiles": (
+                {f"p{int(q * 100)}": sketch.quantile(q) for q in QUARTILES} if enough else None
+            ),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "recorded": self.recorded,
+            "queries": self.queries,
+            "cache_hits": self.cache_hits,
+            "cached_sketches": len(self._cache),
+        }
@@ -0,0 +1,118 @@
+"""
+Keeps the live session set small.
+
+- IN_PROGRESS sessions idle for `SESSION_IDLE_HOURS` are closed. A session
+  with at least one answer is auto-completed with a locally built verdict and
+  folded into analytics like any completed interview; one that was never
+  answered is deleted.
+- COMPLETED sessions older than `SESSION_ARCHIVE_AFTER_DAYS` move to the
+  archive, which keeps only compact fields (see `ArchivedInterview`). Reads
+  fall through to it, so history, export and session lookups are unaffected.
+
+Run it from cron (`python -m app.jobs.session_lifecycle`) or in-process with
+`SESSION_LIFECYCLE_INTERVAL_SECONDS` in single-worker deployments.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.session_service import SessionService, session_service
+
+logger = logging.getLogger(__name__)
+
+
+class SessionLifecycle:
+    def __init__(self, sessions: SessionService):
+        self.sessions = sessions
+        self.totals = {"auto_completed": 0, "expired": 0, "archived": 0, "sweeps": 0}
+        self.last_sweep: Optional[datetime] = None
+
+    async def close_idle(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Auto-complete or delete IN_PROGRESS sessions idle past the cutoff."""
+        cutoff = (now or datetime.utcnow()) - timedelta(hours=settings.SESSION_IDLE_HOURS)
+        counts = {"auto_completed": 0, "expired": 0}
+        while True:
+            batch = await self.sessions.store.idle_sessions(
+                cutoff, settings.SESSION_LIFECYCLE_BATCH_SIZE
+            )
+            for interview in batch:
+                if any(q.answer is not None for q in interview.questions):
+                    # False when the user or another sweep completed it first;
+                    # that session's state and counts belong to the other caller
+                    if not await self.sessions.complete_session(
+                        interview.session_id, self._abandoned_feedback(interview)
+                    ):
+                        continue
+                    # The state blob is only needed while the interview runs
+                    await self.sessions.store.update_state(interview.session_id, None)
+                    counts["auto_completed"] += 1
+                else:
+                    await self.sessions.store.delete(interview.session_id)
+                    counts["expired"] += 1
+            if len(batch) < settings.SESSION_LIFECYCLE_BATCH_SIZE:
+                return counts
+
+    @staticmethod
+    def _abandoned_feedback(interview: Any) -> Dict[str, Any]:
+        scores = [
+            q.answer.ai_score for q in interview.questions
+            if q.answer is not None and q.answer.ai_score is not None
+        ]
+        answered = sum(1 for q in interview.questions if q.answer is not None)
+        profile = (interview.current_state or {}).get("performance_profile", {})
+        return {
+            "overall_score": round(sum(scores) / len(scores), 1) if scores else None,
+            "strengths": profile.get("strong_areas", []),
+            "weaknesses": profile.get("weak_areas", []),
+            "final_verdict": (
+                f"Interview abandoned after {answered} answered question(s); "
+                "closed automatically without a final review."
+            ),
+            "auto_completed": True,
+        }
+
+    async def archive(self, now: Optional[datetime] = None) -> int:
+        """Move completed sessions past the archive age to the archive."""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=settings.SESSION_ARCHIVE_AFTER_DAYS)
+        archived = 0
+        while True:
+            moved = await self.sessions.store.archive_completed(
+                cutoff, settings.SESSION_LIFECYCLE_BATCH_SIZE
+            )
+            archived += moved
+            if moved < settings.SESSION_LIFECYCLE_BATCH_SIZE:
+                return archived
+
+    async def sweep(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        # Close idle sessions first: anything completed now is far from archive age
+        counts = await self.close_idle(now)
+        counts["archived"] = await self.archive(now)
+        for key, value in counts.items():
+            self.totals[key] += value
+        self.totals["sweeps"] += 1
+        self.last_sweep = datetime.utcnow()
+        return counts
+
+    async def run_forever(self, interval: float) -> None:
+        """Sweep every `interval` seconds until cancelled."""
+        while True:
+            try:
+                counts = await self.sweep()
+                if any(counts.values()):
+                    logger.info("Session lifecycle sweep: %s", counts)
+            except Exception:
+                logger.warning("Session lifecycle sweep failed", exc_info=True)
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.totals,
+            "last_sweep": self.last_sweep.isoformat() if self.last_sweep else None,
+        }
+
+
+session_lifecycle = SessionLifecycle(session_service)
+metrics.register("session_lifecycle", session_lifecycle.stats)
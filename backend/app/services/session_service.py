@@ -1,20 +1,32 @@
-import json
-from datetime import datetime
 from typing import Optional, List, Dict, Any
 
-from app.models.interview import Interview, Question, Answer, InterviewStatus
+from app.core import metrics
+from app.core.profiling import hotpath
+from app.models.interview import FinalFeedback
+from app.schemas.interview import InterviewHistoryItem
+from app.services.analytics_service import AnalyticsService
+from app.services.score_index import ScoreIndexService
+from app.services.session_store import SessionStore, get_session_store
 
 
 class SessionService:
     """
-    Manages interview sessions persisted in MongoDB via Beanie.
+    Manages interview sessions on top of a pluggable `SessionStore`
+    (MongoDB via Beanie by default, see `settings.SESSION_BACKEND`).
     All methods are async — call them with `await`.
     """
 
+    def __init__(self, store: Optional[SessionStore] = None):
+        self.store = store or get_session_store()
+        self.analytics = AnalyticsService(self.store)
+        self.scores = ScoreIndexService(self.store)
+
     # ── Create ──────────────────────────────────────────────────────────────
 
-    async def create_session(self, session_id: str, role: str, difficulty: str) -> None:
-        """Create a new interview document in MongoDB."""
+    async def create_session(
+        self, session_id: str, role: str, difficulty: str, user_id: Optional[str] = None
+    ) -> None:
+        """Create a new interview session, optionally owned by a user."""
         initial_state: Dict[str, Any] = {
             "current_stage": "technical_deep_dive",
             "question_count": 0,
@@ -28,20 +40,14 @@ class SessionService:
             "next_focus": "Start the interview",
             "interaction_log": [],
         }
-        interview = Interview(
-            session_id=session_id,
-            role=role,
-            difficulty=difficulty,
-            status=InterviewStatus.IN_PROGRESS,
-            current_state=initial_state,
-        )
-        await interview.insert()
+        await self.store.create(session_id, role, difficulty, initial_state, user_id=user_id)
 
     # ── Read ─────────────────────────────────────────────────────────────────
 
+    @hotpath("session.get_session")
     async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Return a session dict (compatible with the existing endpoint API)."""
-        interview = await Interview.find_one(Interview.session_id == session_id)
+        interview = await self.store.load(session_id)
         if not interview:
             return None
 
@@ -54,94 +60,97 @@ class SessionService:
 
         return {
             "id": interview.session_id,
+            "user_id": interview.user_id,
+            "status": interview.status.value,
             "role": interview.role,
             "difficulty": interview.difficulty,
             "history": history,
             "start_time": interview.start_time.isoformat() if interview.start_time else None,
             "end_time": interview.end_time.isoformat() if interview.end_time else None,
-            "feedback": interview.overall_feedback,
+            "feedback": (
+                interview.overall_feedback.model_dump() if interview.overall_feedback else None
+            ),
             "current_state": interview.current_state or {},
         }
 
     async def get_state(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Return the current dynamic state dict for a session."""
-        interview = await Interview.find_one(Interview.session_id == session_id)
+        interview = await self.store.load(session_id)
         if interview:
             return interview.current_state
         return None
 
-    async def get_all_sessions(self) -> List[Dict[str, Any]]:
+    async def get_all_sessions(self) -> List[InterviewHistoryItem]:
         """Return a summary list of all interviews, newest first."""
-        interviews = await Interview.find_all().sort(-Interview.start_time).to_list()
+        interviews = await self.store.list_sessions()
+        # Datetimes stay as objects; the response serializer formats them.
         return [
-            {
-                "id": i.session_id,
-                "role": i.role,
-                "difficulty": i.difficulty,
-                "start_time": i.start_time.isoformat() if i.start_time else None,
-                "end_time": i.end_time.isoformat() if i.end_time else None,
-                "feedback": i.overall_feedback,
-            }
+            InterviewHistoryItem(
+                id=i.session_id,
+                role=i.role,
+                difficulty=i.difficulty,
+                status=i.status.value,
+                start_time=i.start_time,
+                end_time=i.end_time,
+                overall_score=i.overall_score,
+            )
             for i in interviews
         ]
 
     # ── Update ───────────────────────────────────────────────────────────────
 
     async def update_state(self, session_id: str, new_state: Dict[str, Any]) -> None:
-        """Persist an updated state dict back to MongoDB."""
-        interview = await Interview.find_one(Interview.session_id == session_id)
-        if interview:
-            interview.current_state = new_state
-            await interview.save()
+        """Persist an updated state dict."""
+        await self.store.update_state(session_id, new_state)
 
     async def add_history(self, session_id: str, role: str, content: str) -> None:
         """
-        Add an AI question or a user answer to the interview's embedded list.
+        Add an AI question or a user answer to the interview.
         - role == "ai"   → append a new Question
         - role == "user" → set the Answer on the latest unanswered Question
         """
-        interview = await Interview.find_one(Interview.session_id == session_id)
-        if not interview:
-            return
-
         if role == "ai":
-            new_order = len(interview.questions) + 1
-            interview.questions.append(
-                Question(content=content, order=new_order)
-            )
+            await self.store.append_question(session_id, content)
         elif role == "user":
-            # Find the latest question that has no answer yet
-            for q in reversed(interview.questions):
-                if q.answer is None:
-                    q.answer = Answer(content=content)
-                    break
+            await self.store.append_answer(session_id, content)
 
-        await interview.save()
+    async def update_last_answer_score(
+        self, session_id: str, score: float, needs_rescore: bool = False
+    ) -> None:
+        """
+        Set the AI score on the most recently answered question. `needs_rescore`
+        marks a provisional heuristic score for `app.jobs.rescore_answers`.
+        """
+        await self.store.set_last_answer_score(session_id, score, needs_rescore)
 
-    async def update_last_answer_score(self, session_id: str, score: float) -> None:
-        """Set the AI score on the most recently answered question."""
-        interview = await Interview.find_one(Interview.session_id == session_id)
+    async def complete_session(self, session_id: str, feedback: Dict[str, Any]) -> bool:
+        """
+        Mark the interview as completed, store final feedback and fold the
+        result into the score percentile index and the owner's analytics rollup.
+        Returns False, recording nothing, if the session was already completed
+        (or doesn't exist).
+        """
+        final_feedback = FinalFeedback.model_validate(feedback)
+        interview = await self.store.complete(session_id, final_feedback)
         if not interview:
-            return
-        # Walk in reverse to find the last answered question
-        for q in reversed(interview.questions):
-            if q.answer is not None:
-                q.answer.ai_score = score
-                break
-        await interview.save()
-
-    async def complete_session(self, session_id: str, feedback: str) -> None:
-        """Mark the interview as completed and store final feedback."""
-        interview = await Interview.find_one(Interview.session_id == session_id)
-        if interview:
-            interview.end_time = datetime.utcnow()
-            interview.overall_feedback = feedback
-            interview.status = InterviewStatus.COMPLETED
-            await interview.save()
+            return False
+        await self.scores.record(
+            interview.role, interview.difficulty, final_feedback.model_dump()
+        )
+        if interview.user_id:
+            await self.analytics.record_completion(
+                user_id=interview.user_id,
+                role=interview.role,
+                session_id=session_id,
+                final_feedback=final_feedback.model_dump(),
+                state=interview.current_state,
+                completed_at=interview.end_time,
+            )
+        return True
 
     async def get_average_score(self, session_id: str) -> float:
         """Compute the average AI score across all answered questions."""
-        interview = await Interview.find_one(Interview.session_id == session_id)
+        interview = await self.store.load(session_id)
         if not interview:
             return 0.0
 
@@ -156,3 +165,4 @@ class SessionService:
 
 
 session_service = SessionService()
+metrics.register("score_index", session_service.scores.stats)
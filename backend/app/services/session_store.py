@@ -0,0 +1,816 @@
+"""
+Storage backends for interview sessions.
+
+`SessionService` talks to a `SessionStore` instead of Beanie directly, so the
+same service logic can run against MongoDB (production) or plain process
+memory (tests, benchmarks, single-node demos). Pick one with
+`settings.SESSION_BACKEND` ("mongo" or "memory").
+
+Records returned by `load()` / `list_sessions()` expose the same attributes as
+the `Interview` document (session_id, role, questions, current_state, …) so the
+service can treat both backends uniformly. Completed sessions may have been
+moved to an archive by the lifecycle sweep (app.services.session_lifecycle);
+reads fall through to it, writes only ever touch live sessions.
+"""
+import bisect
+import heapq
+import itertools
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from beanie import UpdateResponse
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.profiling import hotpath
+from app.models.analytics import (
+    UserRoleRollup, ScorePoint, ScoreDistribution, DIFFICULTY_RANK, RECENT_SCORES_LIMIT,
+)
+from app.models.interview import (
+    Interview, Question, Answer, InterviewStatus, FinalFeedback, InterviewSummary,
+    ArchivedInterview,
+)
+from app.models.idempotency import IdempotencyRecord
+from app.models.non_verbal import NonVerbalWindow
+from app.models.question_index import QuestionSignature, SignatureView
+
+
+class SessionStore(ABC):
+    """Interface every session backend implements. All methods are async."""
+
+    # Whether interview routes must wait for MongoDB init before using the store
+    requires_database = True
+
+    @abstractmethod
+    async def create(
+        self, session_id: str, role: str, difficulty: str, state: Dict[str, Any],
+        user_id: Optional[str] = None,
+    ) -> None:
+        """Persist a new IN_PROGRESS session with its initial state."""
+
+    @abstractmethod
+    async def load(self, session_id: str) -> Optional[Any]:
+        """Return the session record (live or archived), or None if it does not exist."""
+
+    @abstractmethod
+    async def append_question(self, session_id: str, content: str) -> None:
+        """Append a new AI question to the session."""
+
+    @abstractmethod
+    async def append_answer(self, session_id: str, content: str) -> None:
+        """Attach a user answer to the latest unanswered question."""
+
+    @abstractmethod
+    async def set_last_answer_score(
+        self, session_id: str, score: float, needs_rescore: bool = False
+    ) -> None:
+        """Set the AI score (and rescore flag) on the most recently answered question."""
+
+    @abstractmethod
+    async def update_state(self, session_id: str, state: Dict[str, Any]) -> None:
+        """Replace the dynamic interview state blob."""
+
+    @abstractmethod
+    async def complete(self, session_id: str, feedback: FinalFeedback) -> Optional[Any]:
+        """
+        Mark an IN_PROGRESS session COMPLETED, store its final feedback and
+        return the record. Returns None when the session doesn't exist or is
+        already completed, so exactly one caller completes each session.
+        """
+
+    @abstractmethod
+    async def list_sessions(self, limit: Optional[int] = None) -> List[InterviewSummary]:
+        """Return lightweight session summaries, newest first."""
+
+    @abstractmethod
+    def iter_sessions(
+        self,
+        user_id: Optional[str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        after: Optional[Tuple[datetime, str]] = None,
+        batch_size: int = 100,
+    ) -> AsyncIterator[Any]:
+        """
+        Stream session records oldest first, ordered by (start_time, session_id).
+        `after` resumes strictly past that key; `batch_size` bounds how many
+        records are fetched from the backend at a time.
+        """
+
+    @abstractmethod
+    async def apply_rollup(
+        self, user_id: str, role: str, point: Optional[ScorePoint],
+        weak_areas: List[str], difficulty: Optional[str],
+    ) -> None:
+        """Fold one completed interview into the (user, role) rollup."""
+
+    @abstractmethod
+    async def load_rollups(self, user_id: str) -> List[Any]:
+        """Return every rollup record for a user."""
+
+    @abstractmethod
+    async def add_score_sample(self, role: str, difficulty: str, bin_index: int) -> None:
+        """Count one overall score in the (role, difficulty) histogram."""
+
+    @abstractmethod
+    async def load_score_bins(self, role: str, difficulty: str) -> Dict[int, int]:
+        """The (role, difficulty) histogram as bin index → count (empty if none)."""
+
+    @abstractmethod
+    async def add_question_signature(self, user_id: str, signature: bytes) -> None:
+        """Remember the MinHash signature of a question asked to a user."""
+
+    @abstractmethod
+    async def load_question_signatures(self, user_id: str) -> List[bytes]:
+        """Return a user's question signatures, oldest first."""
+
+    @abstractmethod
+    async def merge_non_verbal_window(
+        self, session_id: str, question: int, inc: Dict[str, float],
+        low: Dict[str, float], high: Dict[str, float],
+    ) -> Dict[str, Any]:
+        """
+        Atomically fold one batch into an answer's window, creating it if
+        needed: add `inc`, and lower/raise fields to `low`/`high` (dotted
+        paths). Returns the window's fields after the update.
+        """
+
+    @abstractmethod
+    async def load_non_verbal_windows(self, session_id: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """Return a session's (question, window fields) in question order."""
+
+    @abstractmethod
+    async def idle_sessions(self, before: datetime, limit: int) -> List[Any]:
+        """IN_PROGRESS sessions with no activity since `before`, oldest first."""
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> None:
+        """Remove a live session and its non-verbal windows."""
+
+    @abstractmethod
+    async def archive_completed(self, before: datetime, limit: int) -> int:
+        """
+        Move up to `limit` sessions completed before `before` (and with no
+        provisional scores left to re-grade) to the archive. Returns how many moved.
+        """
+
+    @abstractmethod
+    async def claim_idempotency_key(
+        self, key: str, fingerprint: str, locked_until: datetime, expires_at: datetime
+    ) -> Optional[Any]:
+        """
+        Atomically record an in-progress marker for `key`. Returns None if
+        the caller now owns the key, otherwise the live record holding it
+        (expired records and abandoned in-progress markers are taken over).
+        """
+
+    @abstractmethod
+    async def load_idempotency_record(self, key: str) -> Optional[Any]:
+        """Return the unexpired record for `key`, if any."""
+
+    @abstractmethod
+    async def complete_idempotency_key(
+        self, key: str, status_code: int, body: bytes, headers: Dict[str, str]
+    ) -> None:
+        """Store the response of the request that owns `key`."""
+
+    @abstractmethod
+    async def release_idempotency_key(self, key: str) -> None:
+        """Drop an in-progress marker so the request can be retried."""
+
+
+def _window_fields(window: NonVerbalWindow) -> Dict[str, Any]:
+    return {"moments": window.moments, "histogram": window.histogram, "stats": window.stats}
+
+
+def _nested(document: Dict[str, Any], path: str) -> Tuple[Dict[str, Any], str]:
+    """The dict holding a dotted `path` inside `document` (created as needed), and its last key."""
+    *parents, key = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    return document, key
+
+
+async def _merge_sorted(
+    streams: List[AsyncIterator[Any]], key: Callable[[Any], Any]
+) -> AsyncIterator[Any]:
+    """Merge async iterators that are each sorted by `key` into one sorted stream."""
+    heads: List[Tuple[Any, int, Any]] = []
+    for i, stream in enumerate(streams):
+        async for item in stream:
+            heads.append((key(item), i, item))
+            break
+    heapq.heapify(heads)
+    while heads:
+        _, i, item = heads[0]
+        yield item
+        async for following in streams[i]:
+            heapq.heapreplace(heads, (key(following), i, following))
+            break
+        else:
+            heapq.heappop(heads)
+
+
+# ── MongoDB (Beanie) ────────────────────────────────────────────────────────
+
+class MongoSessionStore(SessionStore):
+    """Sessions stored as `Interview` documents in MongoDB."""
+
+    async def create(self, session_id, role, difficulty, state, user_id=None) -> None:
+        interview = Interview(
+            session_id=session_id,
+            user_id=user_id,
+            role=role,
+            difficulty=difficulty,
+            status=InterviewStatus.IN_PROGRESS,
+            current_state=state,
+        )
+        await interview.insert()
+
+    @hotpath("store.load")
+    async def load(self, session_id: str) -> Optional[Any]:
+        return await self._load_live(session_id) or await ArchivedInterview.find_one(
+            ArchivedInterview.session_id == session_id
+        )
+
+    async def _load_live(self, session_id: str) -> Optional[Interview]:
+        return await Interview.find_one(Interview.session_id == session_id)
+
+    async def append_question(self, session_id: str, content: str) -> None:
+        interview = await self._load_live(session_id)
+        if not interview:
+            return
+        interview.questions.append(
+            Question(content=content, order=len(interview.questions) + 1)
+        )
+        interview.last_activity_at = datetime.utcnow()
+        await interview.save()
+
+    async def append_answer(self, session_id: str, content: str) -> None:
+        interview = await self._load_live(session_id)
+        if not interview:
+            return
+        for q in reversed(interview.questions):
+            if q.answer is None:
+                q.answer = Answer(content=content)
+                break
+        interview.last_activity_at = datetime.utcnow()
+        await interview.save()
+
+    async def set_last_answer_score(self, session_id, score, needs_rescore=False) -> None:
+        interview = await self._load_live(session_id)
+        if not interview:
+            return
+        for q in reversed(interview.questions):
+            if q.answer is not None:
+                q.answer.ai_score = score
+                q.answer.needs_rescore = needs_rescore
+                break
+        await interview.save()
+
+    async def update_state(self, session_id: str, state: Optional[Dict[str, Any]]) -> None:
+        # Targeted $set, not a full save, so it can't undo a concurrent rescore
+        await Interview.find_one(Interview.session_id == session_id).update(
+            {"$set": {"current_state": state}}
+        )
+
+    async def complete(self, session_id: str, feedback: FinalFeedback) -> Optional[Interview]:
+        # Conditional on the status, so a second /end, a sweep racing the user
+        # or overlapping sweeps on several workers can't complete it twice
+        return await Interview.find_one(
+            Interview.session_id == session_id,
+            Interview.status == InterviewStatus.IN_PROGRESS,
+        ).update(
+            {"$set": {
+                "end_time": datetime.utcnow(),
+                "overall_feedback": feedback.model_dump(),
+                "status": InterviewStatus.COMPLETED.value,
+            }},
+            response_type=UpdateResponse.NEW_DOCUMENT,
+        )
+
+    async def list_sessions(self, limit: Optional[int] = None) -> List[InterviewSummary]:
+        # Server-side projection: only summary fields and the numeric score
+        # leave MongoDB — no questions, state blob or feedback text.
+        summaries = []
+        for model in (Interview, ArchivedInterview):
+            query = model.find_all(projection_model=InterviewSummary).sort(-model.start_time)
+            if limit is not None:
+                query = query.limit(limit)
+            summaries.append(await query.to_list())
+        newest_first = heapq.merge(*summaries, key=lambda s: s.start_time, reverse=True)
+        return list(itertools.islice(newest_first, limit))
+
+    async def iter_sessions(
+        self, user_id, since=None, until=None, after=None, batch_size=100
+    ) -> AsyncIterator[Interview]:
+        clauses: List[Dict[str, Any]] = [{"user_id": user_id}]
+        if since or until:
+            window: Dict[str, Any] = {}
+            if since:
+                window["$gte"] = since
+            if until:
+                window["$lt"] = until
+            clauses.append({"start_time": window})
+        if after:
+            start_time, session_id = after
+            clauses.append({"$or": [
+                {"start_time": {"$gt": start_time}},
+                {"start_time": start_time, "session_id": {"$gt": session_id}},
+            ]})
+
+        # Beanie iterates the driver cursor lazily, so at most one batch of
+        # documents per collection is held in memory regardless of the result
+        # size. Live and archived sessions are merged in key order.
+        streams = [
+            model.find(
+                {"$and": clauses},
+                sort=[("start_time", 1), ("session_id", 1)],
+                batch_size=batch_size,
+            ).__aiter__()
+            for model in (Interview, ArchivedInterview)
+        ]
+        async for interview in _merge_sorted(streams, key=lambda i: (i.start_time, i.session_id)):
+            yield interview
+
+    async def apply_rollup(self, user_id, role, point, weak_areas, difficulty) -> None:
+        # One atomic upsert — concurrent completions for the same user never
+        # lose increments, and no read is needed before the write.
+        inc: Dict[str, Any] = {"interview_count": 1}
+        set_: Dict[str, Any] = {"updated_at": datetime.utcnow()}
+        update: Dict[str, Any] = {"$inc": inc, "$set": set_}
+        if point is not None:
+            inc["score_sum"] = point.score
+            inc["score_count"] = 1
+            update["$push"] = {
+                "recent_scores": {
+                    "$each": [point.model_dump()],
+                    "$slice": -RECENT_SCORES_LIMIT,
+                }
+            }
+        for area in weak_areas:
+            key = f"weak_area_counts.{area}"
+            inc[key] = inc.get(key, 0) + 1
+        if difficulty:
+            inc[f"difficulty_counts.{difficulty}"] = 1
+            set_["last_difficulty"] = difficulty
+            update["$max"] = {"max_difficulty_rank": DIFFICULTY_RANK.get(difficulty, 0)}
+
+        await UserRoleRollup.find_one(
+            UserRoleRollup.user_id == user_id, UserRoleRollup.role == role
+        ).update(update, upsert=True)
+
+    async def load_rollups(self, user_id: str) -> List[UserRoleRollup]:
+        return await UserRoleRollup.find(UserRoleRollup.user_id == user_id).to_list()
+
+    async def add_score_sample(self, role: str, difficulty: str, bin_index: int) -> None:
+        # Atomic upsert: completions on every worker merge without a read
+        await ScoreDistribution.find_one(
+            ScoreDistribution.role == role, ScoreDistribution.difficulty == difficulty
+        ).update(
+            {
+                "$inc": {f"bins.{bin_index}": 1, "total": 1},
+                "$set": {"updated_at": datetime.utcnow()},
+            },
+            upsert=True,
+        )
+
+    async def load_score_bins(self, role: str, difficulty: str) -> Dict[int, int]:
+        distribution = await ScoreDistribution.find_one(
+            ScoreDistribution.role == role, ScoreDistribution.difficulty == difficulty
+        )
+        if distribution is None:
+            return {}
+        return {int(i): count for i, count in distribution.bins.items()}
+
+    async def add_question_signature(self, user_id: str, signature: bytes) -> None:
+        await QuestionSignature(user_id=user_id, signature=signature).insert()
+
+    async def load_question_signatures(self, user_id: str) -> List[bytes]:
+        rows = await QuestionSignature.find(
+            QuestionSignature.user_id == user_id,
+            projection_model=SignatureView,
+        ).sort(+QuestionSignature.created_at).to_list()
+        return [row.signature for row in rows]
+
+    async def merge_non_verbal_window(self, session_id, question, inc, low, high):
+        update: Dict[str, Any] = {"$set": {"updated_at": datetime.utcnow()}}
+        for operator, fields in (("$inc", inc), ("$min", low), ("$max", high)):
+            if fields:
+                update[operator] = fields
+        query = NonVerbalWindow.find_one(
+            NonVerbalWindow.session_id == session_id, NonVerbalWindow.question == question
+        )
+        try:
+            window = await query.update(
+                update, upsert=True, response_type=UpdateResponse.NEW_DOCUMENT
+            )
+        except DuplicateKeyError:
+            # Two first batches raced to create the window and the other one won
+            window = await query.update(update, response_type=UpdateResponse.NEW_DOCUMENT)
+        return _window_fields(window)
+
+    async def load_non_verbal_windows(self, session_id: str) -> List[Tuple[int, Dict[str, Any]]]:
+        windows = await NonVerbalWindow.find(
+            NonVerbalWindow.session_id == session_id
+        ).sort(+NonVerbalWindow.question).to_list()
+        return [(w.question, _window_fields(w)) for w in windows]
+
+    async def idle_sessions(self, before: datetime, limit: int) -> List[Interview]:
+        # Sessions created before last_activity_at existed fall back to start_time
+        return await Interview.find(
+            {"status": InterviewStatus.IN_PROGRESS.value, "$or": [
+                {"last_activity_at": {"$lt": before}},
+                {"last_activity_at": {"$exists": False}, "start_time": {"$lt": before}},
+            ]},
+            sort=[("last_activity_at", 1)],
+        ).limit(limit).to_list()
+
+    async def delete(self, session_id: str) -> None:
+        await Interview.find(Interview.session_id == session_id).delete()
+        await NonVerbalWindow.find(NonVerbalWindow.session_id == session_id).delete()
+
+    async def archive_completed(self, before: datetime, limit: int) -> int:
+        batch = await Interview.find(
+            {
+                "status": InterviewStatus.COMPLETED.value,
+                "end_time": {"$lt": before},
+                "questions.answer.needs_rescore": {"$ne": True},
+            },
+            sort=[("end_time", 1)],
+        ).limit(limit).to_list()
+        if not batch:
+            return 0
+        ids = [interview.session_id for interview in batch]
+        # Copy first, then delete: a crash in between leaves both copies, and
+        # reads prefer the live one; the next sweep skips what's already archived.
+        done = {
+            a.session_id for a in await ArchivedInterview.find(
+                {"session_id": {"$in": ids}}
+            ).to_list()
+        }
+        fresh = [ArchivedInterview.from_interview(i) for i in batch if i.session_id not in done]
+        if fresh:
+            await ArchivedInterview.insert_many(fresh)
+        await Interview.find({"session_id": {"$in": ids}}).delete()
+        return len(batch)
+
+    async def claim_idempotency_key(self, key, fingerprint, locked_until, expires_at):
+        marker = {
+            "fingerprint": fingerprint, "state": "in_progress", "locked_until": locked_until,
+            "expires_at": expires_at, "status_code": None, "body": None, "headers": {},
+            "created_at": datetime.utcnow(),
+        }
+        try:
+            await IdempotencyRecord(key=key, **marker).insert()
+            return None
+        except DuplicateKeyError:
+            pass
+        # The TTL monitor runs about once a minute, and a worker may have died
+        # mid-request: take over expired records and abandoned claims
+        now = datetime.utcnow()
+        result = await IdempotencyRecord.find_one({"key": key, "$or": [
+            {"expires_at": {"$lt": now}},
+            {"state": "in_progress", "locked_until": {"$lt": now}},
+        ]}).update({"$set": marker})
+        if result is not None and result.modified_count:
+            return None
+        return await self.load_idempotency_record(key)
+
+    async def load_idempotency_record(self, key: str) -> Optional[IdempotencyRecord]:
+        return await IdempotencyRecord.find_one(
+            {"key": key, "expires_at": {"$gte": datetime.utcnow()}}
+        )
+
+    async def complete_idempotency_key(self, key, status_code, body, headers) -> None:
+        await IdempotencyRecord.find_one(IdempotencyRecord.key == key).update({"$set": {
+            "state": "done", "status_code": status_code, "body": body, "headers": headers,
+        }})
+
+    async def release_idempotency_key(self, key: str) -> None:
+        await IdempotencyRecord.find(
+            IdempotencyRecord.key == key, IdempotencyRecord.state == "in_progress"
+        ).delete()
+
+
+# ── In-memory ───────────────────────────────────────────────────────────────
+
+class _AnswerRecord:
+    __slots__ = ("content", "audio_url", "ai_feedback", "ai_score", "needs_rescore", "created_at")
+
+    def __init__(self, content: str):
+        self.content = content
+        self.audio_url: Optional[str] = None
+        self.ai_feedback: Optional[str] = None
+        self.ai_score: Optional[float] = None
+        self.needs_rescore = False
+        self.created_at = datetime.utcnow()
+
+
+class _QuestionRecord:
+    __slots__ = ("content", "order", "created_at", "answer")
+
+    def __init__(self, content: str, order: int):
+        self.content = content
+        self.order = order
+        self.created_at = datetime.utcnow()
+        self.answer: Optional[_AnswerRecord] = None
+
+
+class _SessionRecord:
+    __slots__ = (
+        "session_id", "user_id", "role", "difficulty", "topic", "status",
+        "current_state", "questions", "start_time", "last_activity_at", "end_time",
+        "overall_feedback",
+    )
+
+    def __init__(self, session_id: str, role: str, difficulty: str, state: Dict[str, Any]):
+        self.session_id = session_id
+        self.user_id: Optional[str] = None
+        self.role = role
+        self.difficulty = difficulty
+        self.topic: Optional[str] = "General"
+        self.status = InterviewStatus.IN_PROGRESS
+        self.current_state: Optional[Dict[str, Any]] = state
+        self.questions: List[_QuestionRecord] = []
+        self.start_time = datetime.utcnow()
+        self.last_activity_at = self.start_time
+        self.end_time: Optional[datetime] = None
+        self.overall_feedback: Optional[FinalFeedback] = None
+
+
+class _IdempotencyRecord:
+    __slots__ = (
+        "key", "fingerprint", "state", "locked_until", "expires_at",
+        "status_code", "body", "headers",
+    )
+
+    def __init__(self, key: str, fingerprint: str, locked_until: datetime, expires_at: datetime):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.state = "in_progress"
+        self.locked_until = locked_until
+        self.expires_at = expires_at
+        self.status_code: Optional[int] = None
+        self.body: Optional[bytes] = None
+        self.headers: Dict[str, str] = {}
+
+
+class _RollupRecord:
+    __slots__ = (
+        "user_id", "role", "interview_count", "score_sum", "score_count",
+        "recent_scores", "weak_area_counts", "difficulty_counts",
+        "max_difficulty_rank", "last_difficulty", "updated_at",
+    )
+
+    def __init__(self, user_id: str, role: str):
+        self.user_id = user_id
+        self.role = role
+        self.interview_count = 0
+        self.score_sum = 0.0
+        self.score_count = 0
+        self.recent_scores: List[ScorePoint] = []
+        self.weak_area_counts: Dict[str, int] = {}
+        self.difficulty_counts: Dict[str, int] = {}
+        self.max_difficulty_rank = 0
+        self.last_difficulty: Optional[str] = None
+        self.updated_at = datetime.utcnow()
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions kept in process memory. Nothing survives a restart, and each
+    worker process has its own copy — use for tests and single-node demos.
+
+    History listing and export are served from an index kept sorted by
+    (start_time, session_id), so neither has to sort. Archived sessions keep
+    their place in that index but live in a separate dict without state.
+    """
+
+    requires_database = False
+
+    def __init__(self):
+        self._records: Dict[str, _SessionRecord] = {}
+        self._archived: Dict[str, _SessionRecord] = {}
+        self._by_start: List[Tuple[datetime, str]] = []
+        self._rollups: Dict[tuple, _RollupRecord] = {}
+        self._score_bins: Dict[tuple, Dict[int, int]] = {}
+        self._signatures: Dict[str, List[bytes]] = {}
+        self._non_verbal: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self._idempotency: Dict[str, _IdempotencyRecord] = {}
+
+    async def create(self, session_id, role, difficulty, state, user_id=None) -> None:
+        record = _SessionRecord(session_id, role, difficulty, state)
+        record.user_id = user_id
+        self._records[session_id] = record
+        bisect.insort(self._by_start, (record.start_time, session_id))
+
+    async def load(self, session_id: str) -> Optional[_SessionRecord]:
+        return self._records.get(session_id) or self._archived.get(session_id)
+
+    async def append_question(self, session_id: str, content: str) -> None:
+        record = self._records.get(session_id)
+        if record:
+            record.questions.append(_QuestionRecord(content, len(record.questions) + 1))
+            record.last_activity_at = datetime.utcnow()
+
+    async def append_answer(self, session_id: str, content: str) -> None:
+        record = self._records.get(session_id)
+        if not record:
+            return
+        record.last_activity_at = datetime.utcnow()
+        for q in reversed(record.questions):
+            if q.answer is None:
+                q.answer = _AnswerRecord(content)
+                break
+
+    async def set_last_answer_score(self, session_id, score, needs_rescore=False) -> None:
+        record = self._records.get(session_id)
+        if not record:
+            return
+        for q in reversed(record.questions):
+            if q.answer is not None:
+                q.answer.ai_score = score
+                q.answer.needs_rescore = needs_rescore
+                break
+
+    async def update_state(self, session_id: str, state: Optional[Dict[str, Any]]) -> None:
+        record = self._records.get(session_id)
+        if record:
+            record.current_state = state
+
+    async def complete(self, session_id: str, feedback: FinalFeedback) -> Optional[_SessionRecord]:
+        record = self._records.get(session_id)
+        # Check and update run without an await in between, so it's atomic
+        if record is None or record.status != InterviewStatus.IN_PROGRESS:
+            return None
+        record.end_time = datetime.utcnow()
+        record.overall_feedback = feedback
+        record.status = InterviewStatus.COMPLETED
+        return record
+
+    async def list_sessions(self, limit: Optional[int] = None) -> List[InterviewSummary]:
+        newest_first = (self._get(sid) for _, sid in reversed(self._by_start))
+        return [
+            InterviewSummary(
+                session_id=r.session_id,
+                role=r.role,
+                difficulty=r.difficulty,
+                status=r.status,
+                start_time=r.start_time,
+                end_time=r.end_time,
+                overall_score=r.overall_feedback.overall_score if r.overall_feedback else None,
+            )
+            for r in itertools.islice(newest_first, limit)
+        ]
+
+    async def iter_sessions(
+        self, user_id, since=None, until=None, after=None, batch_size=100
+    ) -> AsyncIterator[_SessionRecord]:
+        i = bisect.bisect_left(self._by_start, (since,)) if since else 0
+        if after:
+            i = max(i, bisect.bisect_right(self._by_start, after))
+        while i < len(self._by_start):
+            key = self._by_start[i]
+            if until and key[0] >= until:
+                break
+            record = self._get(key[1])
+            if record.user_id == user_id:
+                yield record
+            # Re-seek by key: sessions created while the consumer was
+            # suspended shift list positions but never the key order.
+            i = bisect.bisect_right(self._by_start, key)
+
+    async def apply_rollup(self, user_id, role, point, weak_areas, difficulty) -> None:
+        rollup = self._rollups.get((user_id, role))
+        if rollup is None:
+            rollup = self._rollups[(user_id, role)] = _RollupRecord(user_id, role)
+        rollup.interview_count += 1
+        if point is not None:
+            rollup.score_sum += point.score
+            rollup.score_count += 1
+            rollup.recent_scores.append(point)
+            del rollup.recent_scores[:-RECENT_SCORES_LIMIT]
+        for area in weak_areas:
+            rollup.weak_area_counts[area] = rollup.weak_area_counts.get(area, 0) + 1
+        if difficulty:
+            rollup.difficulty_counts[difficulty] = rollup.difficulty_counts.get(difficulty, 0) + 1
+            rollup.last_difficulty = difficulty
+            rollup.max_difficulty_rank = max(
+                rollup.max_difficulty_rank, DIFFICULTY_RANK.get(difficulty, 0)
+            )
+        rollup.updated_at = datetime.utcnow()
+
+    async def load_rollups(self, user_id: str) -> List[_RollupRecord]:
+        return [r for (uid, _), r in self._rollups.items() if uid == user_id]
+
+    async def add_score_sample(self, role: str, difficulty: str, bin_index: int) -> None:
+        bins = self._score_bins.setdefault((role, difficulty), {})
+        bins[bin_index] = bins.get(bin_index, 0) + 1
+
+    async def load_score_bins(self, role: str, difficulty: str) -> Dict[int, int]:
+        return dict(self._score_bins.get((role, difficulty), {}))
+
+    async def add_question_signature(self, user_id: str, signature: bytes) -> None:
+        self._signatures.setdefault(user_id, []).append(signature)
+
+    async def load_question_signatures(self, user_id: str) -> List[bytes]:
+        return list(self._signatures.get(user_id, ()))
+
+    async def merge_non_verbal_window(self, session_id, question, inc, low, high):
+        # No await while updating, so batches merge atomically here too
+        window = self._non_verbal.setdefault(session_id, {}).setdefault(
+            question, {"moments": {}, "histogram": {}}
+        )
+        for path, value in inc.items():
+            parent, key = _nested(window, path)
+            parent[key] = parent.get(key, 0) + value
+        for path, value in low.items():
+            parent, key = _nested(window, path)
+            parent[key] = min(parent.get(key, value), value)
+        for path, value in high.items():
+            parent, key = _nested(window, path)
+            parent[key] = max(parent.get(key, value), value)
+        return window
+
+    async def load_non_verbal_windows(self, session_id: str) -> List[Tuple[int, Dict[str, Any]]]:
+        return sorted(self._non_verbal.get(session_id, {}).items())
+
+    def _get(self, session_id: str) -> _SessionRecord:
+        return self._records.get(session_id) or self._archived[session_id]
+
+    async def idle_sessions(self, before: datetime, limit: int) -> List[_SessionRecord]:
+        idle = [
+            r for r in self._records.values()
+            if r.status == InterviewStatus.IN_PROGRESS and r.last_activity_at < before
+        ]
+        return sorted(idle, key=lambda r: r.last_activity_at)[:limit]
+
+    async def delete(self, session_id: str) -> None:
+        record = self._records.pop(session_id, None)
+        if record:
+            self._by_start.remove((record.start_time, session_id))
+        self._non_verbal.pop(session_id, None)
+
+    async def archive_completed(self, before: datetime, limit: int) -> int:
+        batch = [
+            r for r in self._records.values()
+            if r.status == InterviewStatus.COMPLETED and r.end_time and r.end_time < before
+            and not any(q.answer and q.answer.needs_rescore for q in r.questions)
+        ]
+        for record in sorted(batch, key=lambda r: r.end_time)[:limit]:
+            record.current_state = None
+            self._archived[record.session_id] = self._records.pop(record.session_id)
+        return min(len(batch), limit)
+
+    async def claim_idempotency_key(self, key, fingerprint, locked_until, expires_at):
+        now = datetime.utcnow()
+        # Every record lives for the same TTL, so insertion order is expiry order
+        while self._idempotency:
+            oldest = next(iter(self._idempotency.values()))
+            if oldest.expires_at >= now:
+                break
+            del self._idempotency[oldest.key]
+        record = self._idempotency.get(key)
+        if record and record.expires_at >= now and not (
+            record.state == "in_progress" and record.locked_until < now
+        ):
+            return record
+        self._idempotency.pop(key, None)
+        self._idempotency[key] = _IdempotencyRecord(key, fingerprint, locked_until, expires_at)
+        return None
+
+    async def load_idempotency_record(self, key: str) -> Optional[_IdempotencyRecord]:
+        record = self._idempotency.get(key)
+        return record if record and record.expires_at >= datetime.utcnow() else None
+
+    async def complete_idempotency_key(self, key, status_code, body, headers) -> None:
+        record = self._idempotency.get(key)
+        if record:
+            record.state = "done"
+            record.status_code = status_code
+            record.body = body
+            record.headers = headers
+
+    async def release_idempotency_key(self, key: str) -> None:
+        record = self._idempotency.get(key)
+        if record and record.state == "in_progress":
+            del self._idempotency[key]
+
+
+SESSION_BACKENDS = {
+    "mongo": MongoSessionStore,
+    "memory": MemorySessionStore,
+}
+
+
+def get_session_store(backend: Optional[str] = None) -> SessionStore:
+    """Instantiate the store named by `backend` (defaults to settings.SESSION_BACKEND)."""
+    name = (backend or settings.SESSION_BACKEND).lower()
+    try:
+        return SESSION_BACKENDS[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown SESSION_BACKEND {name!r}; expected one of {sorted(SESSION_BACKENDS)}"
+        )
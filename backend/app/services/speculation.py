@@ -0,0 +1,206 @@
+"""
+Speculative next-question generation during candidate think time.
+
+The question after an answer depends on the evaluator's `next_focus`
+directive, which is almost always "Drill down" (follow up on the same
+question) or "Move on" (a fresh topic). As soon as a question is sent, both
+possible next questions are generated at background priority while the
+candidate is still answering. When the evaluation arrives, the candidate that
+matches the directive is used if difficulty and stage are unchanged. Anything
+else, such as an unrecognised directive, a difficulty change, a failed
+candidate or no speculation at all, falls back to the usual live call.
+
+Speculation only starts while the LLM queue has idle capacity, so it never
+delays a live turn. Candidates are kept in-process, so a turn routed to
+another worker is a miss. Hit rate and the estimated tokens spent on unused
+candidates are reported under the "speculation" metric.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.conversation_memory import estimate_tokens
+from app.services.llm_queue import Priority, llm_queue
+from app.services.llm_service import GENERATION_FAILED, LLMService, llm_service
+
+logger = logging.getLogger(__name__)
+
+DRILL_DOWN = "drill_down"
+MOVE_ON = "move_on"
+
+_DIRECTIVES = {
+    DRILL_DOWN: re.compile(
+        r"\b(drill|deeper|dig|follow[- ]?up|probe|revisit|clarify|same topic|current topic)\b",
+        re.I,
+    ),
+    MOVE_ON: re.compile(
+        r"\b(move|switch|new topic|next topic|different topic|change topic)\b", re.I
+    ),
+}
+
+
+def directive_kind(directive: Optional[str]) -> Optional[str]:
+    """Classify a `next_focus` directive as DRILL_DOWN, MOVE_ON or neither (None)."""
+    if not directive:
+        return None
+    # The evaluation prompt asks for a "Drill down:" / "Move on:" prefix; go by
+    # the earliest cue so "Move on from X instead of drilling" reads as MOVE_ON
+    found = []
+    for kind, pattern in _DIRECTIVES.items():
+        match = pattern.search(directive)
+        if match:
+            found.append((match.start(), kind))
+    return min(found)[1] if found else None
+
+
+def _directive_text(kind: str, question: str) -> str:
+    # The answer is still being given, so the pending question stands in for it
+    if kind == DRILL_DOWN:
+        return f"Drill down: follow up on the question just asked: {question}"
+    return f"Move on: a new topic, different from the question just asked: {question}"
+
+
+class _Speculation:
+    __slots__ = ("order", "difficulty", "stage", "created", "tasks", "prompt_tokens")
+
+    def __init__(self, order: int, difficulty: str, stage: str):
+        self.order = order
+        self.difficulty = difficulty
+        self.stage = stage
+        self.created = time.monotonic()
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.prompt_tokens: Dict[str, int] = {}
+
+
+class SpeculationEngine:
+    def __init__(self, llm: LLMService):
+        self.llm = llm
+        self._pending: "OrderedDict[str, _Speculation]" = OrderedDict()
+        self.counts = {"started": 0, "skipped_busy": 0, "hits": 0}
+        self.misses = {
+            "none": 0, "stale": 0, "directive": 0, "state": 0, "failed": 0, "late": 0,
+        }
+        self.tokens_used = 0
+        self.tokens_wasted = 0
+        self.wait_seconds = 0.0
+
+    def start(
+        self, session_id: str, order: int, role: str, difficulty: str, stage: str,
+        weak_areas: List[str], strong_areas: List[str], conversation: str, question: str,
+    ) -> None:
+        """
+        Begin generating both candidates for the turn after question `order`.
+        Must be called from a running event loop; returns immediately.
+        """
+        self.discard(session_id)
+        if not settings.SPECULATION_ENABLED:
+            return
+        if llm_queue.estimated_wait(Priority.BACKGROUND) > 0:
+            self.counts["skipped_busy"] += 1
+            return
+
+        spec = _Speculation(order, difficulty, stage)
+        for kind in (DRILL_DOWN, MOVE_ON):
+            prompt = self.llm.question_prompt_v2(
+                role, difficulty, stage, weak_areas, strong_areas,
+                _directive_text(kind, question), None, conversation,
+            )
+            spec.prompt_tokens[kind] = estimate_tokens(prompt)
+            spec.tasks[kind] = asyncio.create_task(
+                self.llm.generate_response(prompt, Priority.BACKGROUND)
+            )
+        self._pending[session_id] = spec
+        self.counts["started"] += 1
+        while len(self._pending) > settings.SPECULATION_MAX_SESSIONS:
+            _, oldest = self._pending.popitem(last=False)
+            self._waste(oldest)
+
+    async def take(
+        self, session_id: str, order: int, directive: Optional[str], difficulty: str, stage: str,
+    ) -> Optional[str]:
+        """
+        The speculated question for this turn, or None when the live call
+        must be made. Unused candidates are cancelled either way.
+        """
+        spec = self._pending.pop(session_id, None)
+        if spec is None:
+            self.misses["none"] += 1
+            return None
+        try:
+            kind = directive_kind(directive)
+            expired = time.monotonic() - spec.created > settings.SPECULATION_TTL_SECONDS
+            if spec.order != order or expired:
+                reason = "stale"
+            elif kind is None:
+                reason = "directive"
+            elif (spec.difficulty, spec.stage) != (difficulty, stage):
+                reason = "state"
+            else:
+                task = spec.tasks.pop(kind)
+                started = time.monotonic()
+                question, reason = await self._result(task)
+                self.wait_seconds += time.monotonic() - started
+                if question is not None:
+                    self.counts["hits"] += 1
+                    self.tokens_used += spec.prompt_tokens[kind] + estimate_tokens(question)
+                    return question
+                self.tokens_wasted += spec.prompt_tokens[kind]
+            self.misses[reason] += 1
+            return None
+        finally:
+            self._waste(spec)
+
+    @staticmethod
+    async def _result(task: asyncio.Task):
+        try:
+            text = await asyncio.wait_for(asyncio.shield(task), settings.SPECULATION_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            task.cancel()
+            return None, "late"
+        except Exception:
+            logger.warning("Speculative question generation failed", exc_info=True)
+            return None, "failed"
+        text = (text or "").strip()
+        if not text or text == GENERATION_FAILED:
+            return None, "failed"
+        return text, None
+
+    def discard(self, session_id: str) -> None:
+        """Drop any speculation for a session (e.g. when it ends)."""
+        spec = self._pending.pop(session_id, None)
+        if spec is not None:
+            self._waste(spec)
+
+    def _waste(self, spec: _Speculation) -> None:
+        """Cancel unused candidates and book their estimated token cost."""
+        for kind, task in spec.tasks.items():
+            if not task.done():
+                task.cancel()
+                # The request may already be in flight; count the prompt as spent
+                self.tokens_wasted += spec.prompt_tokens[kind]
+            elif not task.cancelled() and task.exception() is None:
+                output = estimate_tokens(task.result() or "")
+                self.tokens_wasted += spec.prompt_tokens[kind] + output
+        spec.tasks.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.counts["hits"]
+        taken = hits + sum(self.misses.values())
+        return {
+            **self.counts,
+            "misses": dict(self.misses),
+            "hit_rate": round(hits / taken, 3) if taken else None,
+            "avg_hit_wait_ms": round(self.wait_seconds / hits * 1000, 1) if hits else None,
+            "tokens_used": self.tokens_used,
+            "tokens_wasted": self.tokens_wasted,
+            "pending": len(self._pending),
+        }
+
+
+speculation_engine = SpeculationEngine(llm_service)
+metrics.register("speculation", speculation_engine.stats)
@@ -1,44 +1,38 @@
 import logging
-from google import genai
 from app.core.config import settings
+from app.services.gemini_client import gemini_clients
+from app.services.model_router import model_router
 
 logger = logging.getLogger(__name__)
 
-_client = None
-
-def _get_client():
-    global _client
-    if _client is None:
-        _client = genai.Client(api_key=settings.GEMINI_API_KEY)
-    return _client
-
-MODEL = "gemini-2.0-flash"
-
 
 class STTService:
 
-    def transcribe(self, file_path: str) -> str:
+    async def transcribe(self, file_path: str, mime_type: str = "audio/webm") -> str:
         if not hasattr(settings, 'GEMINI_API_KEY') or not settings.GEMINI_API_KEY:
             return "Error: Gemini API Key not configured."
 
         uploaded_file = None
         try:
-            client = _get_client()
+            client = gemini_clients.get()
 
             # Upload audio file to Gemini
-            with open(file_path, "rb") as f:
-                uploaded_file = client.files.upload(
-                    file=f,
-                    config={"mime_type": "audio/webm"},
-                )
+            uploaded_file = await client.aio.files.upload(
+                file=file_path,
+                config={"mime_type": mime_type},
+            )
             logger.info("Uploaded audio file: %s", uploaded_file.name)
 
-            response = client.models.generate_content(
-                model=MODEL,
-                contents=[
-                    "Transcribe the speech in this audio file exactly as spoken. Return only the transcript.",
-                    uploaded_file,
-                ],
+            response = await model_router.run(
+                "transcription",
+                lambda model: client.aio.models.generate_content(
+                    model=model,
+                    contents=[
+                        "Transcribe the speech in this audio file exactly as spoken. "
+                        "Return only the transcript.",
+                        uploaded_file,
+                    ],
+                ),
             )
             return response.text.strip()
 
@@ -48,7 +42,7 @@ class STTService:
         finally:
             if uploaded_file:
                 try:
-                    _get_client().files.delete(name=uploaded_file.name)
+                    await gemini_clients.get().aio.files.delete(name=uploaded_file.name)
                 except Exception as cleanup_err:
                     logger.error("Failed to delete remote file: %s", cleanup_err)
 
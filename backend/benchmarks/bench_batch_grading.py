@@ -0,0 +1,68 @@
+"""
+Batch grading benchmark: N answers graded one `/chat`-style call at a time
+versus `GradingService` (packed prompts, concurrent packs).
+
+Runs in-process against the fake Gemini transport (`GEMINI_FAKE_LATENCY_MS`),
+so the numbers isolate call count and overlap rather than model speed.
+
+    cd backend && python -m benchmarks.bench_batch_grading [--items 100] [--latency-ms 300]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+
+async def _sequential(llm, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        await llm.evaluate_answer_v2(
+            item["role"], item["difficulty"], "technical_deep_dive", 1, [], [],
+            item["question"], item["answer"],
+        )
+    return time.perf_counter() - start
+
+
+async def _batched(service, items, pack_size, concurrency) -> float:
+    start = time.perf_counter()
+    graded = [row async for row in service.grade(items, pack_size=pack_size, concurrency=concurrency)]
+    assert len(graded) == len(items)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="fake Gemini latency")
+    parser.add_argument("--pack-size", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    # Must be set before the app's settings are first imported
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ["GEMINI_FAKE_LATENCY_MS"] = str(args.latency_ms)
+    from app.services.grading_service import GradingService
+    from app.services.llm_service import llm_service
+
+    items = [
+        {"role": "backend developer", "difficulty": "medium",
+         "question": f"Question {i}?", "answer": f"Answer {i}"}
+        for i in range(args.items)
+    ]
+
+    async def run():
+        sequential = await _sequential(llm_service, items)
+        batched = await _batched(GradingService(), items, args.pack_size, args.concurrency)
+        return sequential, batched
+
+    sequential, batched = asyncio.run(run())
+    print(f"{args.items} answers · fake LLM {args.latency_ms:g} ms · "
+          f"pack size {args.pack_size} · concurrency {args.concurrency}\n")
+    print(f"sequential : {sequential:8.2f} s  {args.items / sequential:8.1f} answers/s")
+    print(f"batched    : {batched:8.2f} s  {args.items / batched:8.1f} answers/s  "
+          f"({sequential / batched:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
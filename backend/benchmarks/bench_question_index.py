@@ -0,0 +1,73 @@
+"""
+Question index benchmark: near-duplicate lookup latency for one user with
+thousands of past questions.
+
+Builds a `_UserIndex` from synthetic interview questions, then times
+signature + LSH lookup for repeats (paraphrased) and for new questions.
+
+    cd backend && python -m benchmarks.bench_question_index [--questions 5000] [--lookups 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+TOPICS = (
+    "hash map collisions", "thread pools", "database indexing", "CAP theorem",
+    "cache eviction", "Kubernetes scheduling", "React rendering", "garbage collection",
+    "the Python GIL", "event loops", "TCP congestion control", "HTTP/2 multiplexing",
+    "load balancing", "consistent hashing", "message queues", "idempotent APIs",
+    "rate limiting", "OAuth flows", "SQL joins", "query planning", "sharding",
+    "leader election", "vector clocks", "bloom filters", "B-tree pages", "WAL recovery",
+)
+TEMPLATES = (
+    "How would you use {a} together with {b} in a {c} system?",
+    "Explain the trade-offs between {a} and {b} for a {c} workload.",
+    "What can go wrong with {a} when {b} is under heavy {c} load?",
+    "Walk me through debugging {a} issues caused by {b} in {c}.",
+)
+CONTEXTS = ("read-heavy", "write-heavy", "multi-region", "real-time", "batch", "mobile")
+
+
+def _question(rng: random.Random) -> str:
+    a, b = rng.sample(TOPICS, 2)
+    return rng.choice(TEMPLATES).format(a=a, b=b, c=rng.choice(CONTEXTS))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    from app.services.question_index import _UserIndex, signature
+
+    rng = random.Random(7)
+    past = [_question(rng) for _ in range(args.questions)]
+    index = _UserIndex()
+    start = time.perf_counter()
+    for question in past:
+        index.add(signature(question))
+    build = time.perf_counter() - start
+
+    probes = [("repeat", "Could you " + q[0].lower() + q[1:]) for q in rng.sample(past, args.lookups // 2)]
+    probes += [("new", _question(rng) + " Assume a legacy codebase.") for _ in range(args.lookups // 2)]
+
+    timings = {"repeat": [], "new": []}
+    for kind, question in probes:
+        start = time.perf_counter()
+        index.best_match(signature(question))
+        timings[kind].append((time.perf_counter() - start) * 1e6)
+
+    print(f"{args.questions} past questions indexed in {build:.2f}s\n")
+    for kind, values in timings.items():
+        values.sort()
+        print(f"{kind:<7} lookups: p50 {statistics.median(values):7.1f} µs   "
+              f"p99 {values[int(len(values) * 0.99)]:7.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Micro-benchmark: serialization cost per API response, before vs after.
+
+"before" is FastAPI's classic path — jsonable_encoder() followed by json.dumps()
+(and, for /history, building dicts with isoformat() per row first).
+"after" is the precompiled TypeAdapter path from app.core.serialization.
+
+    cd backend && python -m benchmarks.bench_serialization
+"""
+import json
+import timeit
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+
+from app.schemas.interview import (
+    FeedbackResponse, InterviewHistoryItem, FEEDBACK_RESPONSE, HISTORY_RESPONSE,
+)
+
+HISTORY_ROWS = 200
+
+
+def _feedback() -> FeedbackResponse:
+    return FeedbackResponse(
+        feedback="Interview Completed. Final Verdict: Ready with minor gaps.",
+        is_completed=True,
+        final_feedback_data={
+            "overall_score": 7.4,
+            "strengths": ["System design", "Clear communication", "Testing"],
+            "weaknesses": ["Concurrency primitives", "SQL indexing"],
+            "difficulty_trend": "improved",
+            "improvement_tips": ["Practice lock-free queues"] * 3,
+            "final_verdict": "Solid mid-level candidate. " * 10,
+        },
+    )
+
+
+def _history():
+    now = datetime.utcnow()
+    return [
+        InterviewHistoryItem(
+            id=f"session-{i:04d}",
+            role="backend developer",
+            difficulty="medium",
+            status="COMPLETED",
+            start_time=now - timedelta(days=i),
+            end_time=now - timedelta(days=i, minutes=-25),
+            overall_score=6.5,
+        )
+        for i in range(HISTORY_ROWS)
+    ]
+
+
+def _history_dicts(items):
+    # What get_all_sessions used to build by hand for every row
+    return [
+        {
+            "id": i.id,
+            "role": i.role,
+            "difficulty": i.difficulty,
+            "status": i.status,
+            "start_time": i.start_time.isoformat() if i.start_time else None,
+            "end_time": i.end_time.isoformat() if i.end_time else None,
+            "overall_score": i.overall_score,
+        }
+        for i in items
+    ]
+
+
+def _per_call_us(fn, number: int) -> float:
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main() -> None:
+    feedback = _feedback()
+    history = _history()
+
+    cases = [
+        (
+            "FeedbackResponse (/chat)",
+            lambda: json.dumps(jsonable_encoder(feedback)).encode(),
+            lambda: FEEDBACK_RESPONSE.dump_json(feedback),
+            5000,
+        ),
+        (
+            f"history, {HISTORY_ROWS} rows (/history)",
+            lambda: json.dumps(jsonable_encoder(_history_dicts(history))).encode(),
+            lambda: HISTORY_RESPONSE.dump_json(history),
+            200,
+        ),
+    ]
+
+    print(f"{'response':<32}{'before (µs)':>14}{'after (µs)':>14}{'speed-up':>10}")
+    for name, before, after, number in cases:
+        assert json.loads(before()) == json.loads(after())
+        b = _per_call_us(before, number)
+        a = _per_call_us(after, number)
+        print(f"{name:<32}{b:>14.1f}{a:>14.1f}{b / a:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
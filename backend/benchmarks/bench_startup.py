@@ -0,0 +1,82 @@
+"""
+Startup benchmark: how long `import app.main` takes in a fresh interpreter.
+
+Runs `python -X importtime -c "import app.main"` several times, reports the
+median cumulative import time, the heaviest top-level imports, and whether any
+of the deliberately deferred SDKs were loaded at boot.
+
+    cd backend && python -m benchmarks.bench_startup [--runs 5] [--top 10]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Imported lazily on first use; none of these should appear at boot
+DEFERRED_MODULES = ("google.genai", "pypdf", "passlib")
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    # Settings requires these; values are irrelevant for an import benchmark
+    env.setdefault("SECRET_KEY", "benchmark")
+    env.setdefault("GEMINI_API_KEY", "benchmark")
+    return env
+
+
+def profile_once() -> dict:
+    """Return {module: (self_us, cumulative_us, depth)} for one cold import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, env=_env(), check=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            self_us, cum_us, indent, name = m.groups()
+            modules[name] = (int(self_us), int(cum_us), len(indent) // 2)
+    return modules
+
+
+def loaded_deferred_modules() -> list:
+    code = (
+        "import sys, app.main; "
+        f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=_env(), check=True,
+    ).stdout.strip()
+    return [m for m in out.split(",") if m]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [profile_once() for _ in range(args.runs)]
+    totals = [r["app.main"][1] / 1000 for r in runs]
+    print(f"import app.main: median {statistics.median(totals):.0f} ms "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}, {args.runs} runs)")
+
+    # Heaviest direct dependencies of app.main in the last run
+    last = runs[-1]
+    top_level = [(name, cum) for name, (_, cum, depth) in last.items() if depth == 1]
+    print("\nheaviest imports under app.main:")
+    for name, cum in sorted(top_level, key=lambda x: -x[1])[:args.top]:
+        print(f"  {cum / 1000:8.1f} ms  {name}")
+
+    deferred = loaded_deferred_modules()
+    print("\ndeferred SDKs loaded at boot:", ", ".join(deferred) if deferred else "none")
+    if deferred:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Throughput benchmark: how requests/s scale from one server worker to N.
+
+For each worker count, starts `python -m app.server` on the in-memory session
+store with the fake Gemini transport (`GEMINI_FAKE_LATENCY_MS`), drives
+`POST /api/interview/start` from several load-generator processes for a
+fixed duration, then stops the server with SIGTERM (the graceful drain path).
+Rate limits are lifted and LLM concurrency raised so the server itself is
+what gets measured.
+
+    cd backend && python -m benchmarks.bench_workers [--workers 1,2,4] [--duration 10]
+
+The memory store keeps sessions per worker, which is fine here because every
+request starts a new interview; `--force` skips the self-check that rejects
+that combination for real deployments. Run on a machine with spare cores for
+the load generators, or the numbers measure contention rather than scaling.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+PAYLOAD = {"role": "backend developer", "difficulty": "medium"}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _server_env(latency_ms: float, llm_concurrency: int) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "SESSION_BACKEND": "memory",
+        "GEMINI_FAKE_LATENCY_MS": str(latency_ms),
+        "LLM_MAX_CONCURRENCY": str(llm_concurrency),
+        "RATE_LIMIT_IP_PER_MINUTE": "1000000000",
+        "RATE_LIMIT_IP_BURST": "1000000000",
+    })
+    return env
+
+
+def start_server(workers: int, port: int, env: dict) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--force"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"server with {workers} worker(s) did not become ready")
+
+
+def stop_server(proc: subprocess.Popen) -> float:
+    """SIGTERM the server and return how long the graceful shutdown took."""
+    start = time.perf_counter()
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    return time.perf_counter() - start
+
+
+async def _drive(url: str, clients: int, duration: float):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as http:
+        async def client():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await http.post(url, json=PAYLOAD)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, errors
+
+
+def _load_process(args) -> tuple:
+    return asyncio.run(_drive(*args))
+
+
+def run_load(port: int, clients: int, procs: int, duration: float) -> dict:
+    url = f"http://127.0.0.1:{port}/api/interview/start"
+    per_proc = max(1, clients // procs)
+    with multiprocessing.Pool(procs) as pool:
+        results = pool.map(_load_process, [(url, per_proc, duration)] * procs)
+
+    latencies = sorted(l for lat, _ in results for l in lat)
+    errors = sum(e for _, e in results)
+    return {
+        "rps": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else float("nan"),
+        "errors": errors,
+    }
+
+
+def main() -> None:
+    # Settings requires these; values are irrelevant with the fake transport
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    from app.server import available_cpus
+
+    cpus = available_cpus()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, cpus})),
+                        help="comma-separated worker counts to compare")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--clients", type=int, default=64, help="concurrent connections")
+    parser.add_argument("--load-procs", type=int, default=max(1, cpus // 2),
+                        help="load-generator processes")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="fake Gemini latency")
+    parser.add_argument("--llm-concurrency", type=int, default=256,
+                        help="LLM_MAX_CONCURRENCY per worker")
+    args = parser.parse_args()
+
+    env = _server_env(args.latency_ms, args.llm_concurrency)
+    worker_counts = [int(n) for n in args.workers.split(",")]
+    print(f"{cpus} CPU(s) available · fake LLM {args.latency_ms:g} ms · "
+          f"{args.clients} clients × {args.load_procs} load process(es) · {args.duration:g}s/run\n")
+    print(f"{'workers':>7}  {'req/s':>9}  {'speedup':>7}  {'p50 ms':>8}  {'p95 ms':>8}  "
+          f"{'errors':>6}  {'shutdown s':>10}")
+
+    baseline = None
+    for workers in worker_counts:
+        port = _free_port()
+        proc = start_server(workers, port, env)
+        try:
+            result = run_load(port, args.clients, args.load_procs, args.duration)
+        finally:
+            shutdown = stop_server(proc)
+        baseline = baseline or result["rps"]
+        print(f"{workers:>7}  {result['rps']:>9.1f}  {result['rps'] / baseline:>6.2f}x  "
+              f"{result['p50_ms']:>8.1f}  {result['p95_ms']:>8.1f}  {result['errors']:>6}  "
+              f"{shutdown:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
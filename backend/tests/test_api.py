@@ -1,5 +1,9 @@
 import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.testclient import TestClient
+from app.api import deps
+from app.core.compression import CompressionMiddleware, negotiate_encoding
 from app.main import app
 
 client = TestClient(app)
@@ -13,6 +17,24 @@ class TestHealthEndpoints:
         assert data["status"] == "ok"
         assert data["app"] == "SayLO Backend"
 
+    def test_ready_endpoint(self):
+        # No lifespan under this client, so no components are pending
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+
+    def test_metrics_endpoint_requires_admin(self):
+        assert client.get("/metrics").status_code == 401
+
+    def test_metrics_endpoint(self):
+        app.dependency_overrides[deps.require_admin] = lambda: None
+        try:
+            response = client.get("/metrics")
+        finally:
+            app.dependency_overrides.pop(deps.require_admin)
+        assert response.status_code == 200
+        assert "requests" in response.json()["gemini_client"]
+
     def test_root_endpoint(self):
         response = client.get("/")
         assert response.status_code == 200
@@ -38,6 +60,76 @@ class TestInterviewEndpoints:
         assert response.status_code == 200
         assert isinstance(response.json(), list)
 
+    def test_analytics_requires_auth(self):
+        response = client.get("/api/interview/analytics")
+        assert response.status_code == 401
+
+    def test_export_requires_auth(self):
+        response = client.get("/api/interview/export")
+        assert response.status_code == 401
+
+    def test_grade_batch_requires_auth(self):
+        item = {"role": "qa", "difficulty": "easy", "question": "Q?", "answer": "A"}
+        response = client.post("/api/interview/grade-batch", json={"items": [item]})
+        assert response.status_code == 401
+
+    def test_non_verbal_missing_session(self):
+        response = client.post(
+            "/api/interview/non-verbal?session_id=nonexistent-session-id",
+            json={"eye_contact": [80, 82]},
+        )
+        assert response.status_code == 404
+
+    def test_audio_chat_single_call_persists_transcript(self, monkeypatch):
+        import asyncio
+        from app.services.llm_service import llm_service
+        from app.services.session_service import session_service
+        from app.services.stt_service import stt_service
+
+        async def spoken(**kwargs):
+            assert kwargs["audio"] == b"\x1aE\xdf\xa3 webm" and kwargs["mime_type"] == "audio/webm"
+            return "I would add an index on email.", {
+                "score": 7, "classification": "strong", "next_focus": "Move on: caching",
+                "difficulty_trend": "stable", "end_interview": False,
+            }
+
+        async def no_stt(*args):
+            raise AssertionError("separate transcription call made")
+
+        monkeypatch.setattr(llm_service, "evaluate_spoken_answer_within_budget", spoken)
+        monkeypatch.setattr(stt_service, "transcribe", no_stt)
+        session_id = client.post(
+            "/api/interview/start", json={"role": "backend", "difficulty": "easy"}
+        ).json()["session_id"]
+        response = client.post(
+            "/api/interview/audio-chat",
+            data={"session_id": session_id},
+            files={"audio_file": ("a.webm", b"\x1aE\xdf\xa3 webm", "audio/webm")},
+        )
+        assert response.status_code == 200
+        assert response.json()["feedback"].startswith("Score: 7/10")
+        history = asyncio.run(session_service.get_session(session_id))["history"]
+        assert history[1] == {**history[1], "role": "user", "content": "I would add an index on email."}
+
+    def test_percentile_needs_a_session_or_a_score(self):
+        assert client.get("/api/interview/percentile?role=qa").status_code == 400
+        response = client.get("/api/interview/percentile?session_id=nonexistent-session-id")
+        assert response.status_code == 404
+        response = client.get("/api/interview/percentile?role=qa&difficulty=easy&score=7")
+        assert response.status_code == 200
+        assert response.json()["percentile"] is None
+
+    def test_completed_interview_cannot_be_ended_or_answered_again(self):
+        session_id = client.post(
+            "/api/interview/start", json={"role": "qa", "difficulty": "easy"}
+        ).json()["session_id"]
+        assert client.post("/api/interview/end", json={"session_id": session_id}).status_code == 200
+        assert client.post("/api/interview/end", json={"session_id": session_id}).status_code == 409
+        response = client.post(
+            "/api/interview/chat", json={"session_id": session_id, "answer": "late answer"}
+        )
+        assert response.status_code == 409
+
     def test_chat_missing_session(self):
         response = client.post("/api/interview/chat", json={
             "session_id": "nonexistent-session-id",
@@ -71,3 +163,67 @@ class TestAuthEndpoints:
     def test_login_missing_fields(self):
         response = client.post("/api/auth/login", json={})
         assert response.status_code == 422
+
+
+class TestAdminEndpoints:
+    def test_profiler_requires_a_token(self):
+        assert client.get("/api/admin/profiler").status_code == 401
+        assert client.post("/api/admin/profiler/start", json={}).status_code == 401
+
+    def test_require_admin_checks_the_allow_list(self, monkeypatch):
+        import asyncio
+        from fastapi import HTTPException
+        from app.api.deps import require_admin
+        from app.core.config import settings
+
+        class _User:
+            email = "Ops@Example.com"
+
+        monkeypatch.setattr(settings, "ADMIN_EMAILS", [])
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(require_admin(_User()))
+        assert e.value.status_code == 403
+        monkeypatch.setattr(settings, "ADMIN_EMAILS", ["ops@example.com"])
+        assert asyncio.run(require_admin(_User())).email == "Ops@Example.com"
+
+
+class TestCompression:
+    def setup_method(self):
+        mini = FastAPI()
+        mini.add_middleware(CompressionMiddleware, minimum_size=100)
+
+        @mini.get("/big")
+        def big():
+            return PlainTextResponse("x" * 5000)
+
+        @mini.get("/small")
+        def small():
+            return PlainTextResponse("tiny")
+
+        self.client = TestClient(mini)
+
+    def test_large_body_gzipped(self):
+        response = self.client.get("/big", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) < 5000
+        assert response.text == "x" * 5000
+
+    def test_small_body_untouched(self):
+        response = self.client.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.text == "tiny"
+
+    def test_negotiation(self):
+        assert negotiate_encoding("identity") is None
+        assert negotiate_encoding("gzip;q=0, deflate") is None
+        assert negotiate_encoding("gzip, deflate") == "gzip"
+
+
+class TestHistorySerialization:
+    def test_history_items_have_iso_datetimes(self):
+        client.post("/api/interview/start", json={"role": "qa", "difficulty": "easy"})
+        response = client.get("/api/interview/history")
+        assert response.status_code == 200
+        item = response.json()[0]
+        assert set(item) >= {"id", "role", "status", "start_time", "overall_score"}
+        assert "T" in item["start_time"]
@@ -1,23 +1,1462 @@
+import asyncio
+import json
+
+import logging
+import struct
+import time
+
+import httpx
 import pytest
+from app import server
+from app.core.profiling import Profiler, ProfilerBusy, ProfilerError
+from app.core.rate_limit import RateLimiter
+from app.core.readiness import Readiness, ComponentNotReady
+from app.models.interview import FinalFeedback
+from app.services.session_lifecycle import SessionLifecycle
 from app.services.session_service import SessionService
+from app.services.analytics_service import normalize_area
+from app.services.conversation_memory import ConversationMemory, estimate_tokens, truncate_to_tokens
+from app.services.audio_preprocess import AudioFormatError, decode, is_uncompressed, trim_silence
+from app.services.export_service import ExportService, InvalidCursorError
+from app.services.gemini_client import GeminiClientManager
+from app.services.grading_service import GradingService
+from app.services.heuristic_evaluator import HeuristicEvaluator
+from app.services.idempotency import (
+    IdempotencyInProgress, IdempotencyKeyReused, IdempotencyService, fingerprint,
+)
+from app.services.llm_queue import LLMWorkQueue, LLMOverloaded, Priority
+from app.services.llm_service import LLMService
+from app.services.model_router import ModelRouter
+from app.services.non_verbal import (
+    CHANNELS, NonVerbalFormatError, NonVerbalService, WindowStats, decode_frames, frame_from_metrics,
+)
+from app.services.question_index import QuestionIndexService, ALTERNATE_QUESTIONS, signature
+from app.services.score_index import ScoreSketch, score_bin
+from app.services.session_store import MemorySessionStore, get_session_store
+from app.services.speculation import DRILL_DOWN, MOVE_ON, SpeculationEngine, directive_kind
 
 
 class TestSessionService:
     def setup_method(self):
-        self.service = SessionService()
+        self.service = SessionService(store=MemorySessionStore())
 
     def test_get_nonexistent_session(self):
-        result = self.service.get_session("nonexistent-id-12345")
+        result = asyncio.run(self.service.get_session("nonexistent-id-12345"))
         assert result is None
 
     def test_get_state_nonexistent_session(self):
-        result = self.service.get_state("nonexistent-id-12345")
+        result = asyncio.run(self.service.get_state("nonexistent-id-12345"))
         assert result is None
 
     def test_get_average_score_no_data(self):
-        result = self.service.get_average_score("nonexistent-id-12345")
+        result = asyncio.run(self.service.get_average_score("nonexistent-id-12345"))
         assert result == 0.0
 
     def test_get_all_sessions(self):
-        result = self.service.get_all_sessions()
+        result = asyncio.run(self.service.get_all_sessions())
         assert isinstance(result, list)
+
+    def test_history_roundtrip(self):
+        async def run():
+            await self.service.create_session("s1", "backend developer", "medium")
+            await self.service.add_history("s1", "ai", "What is a mutex?")
+            await self.service.add_history("s1", "user", "A lock.")
+            await self.service.update_last_answer_score("s1", 7.0)
+            await self.service.add_history("s1", "ai", "And a semaphore?")
+            return await self.service.get_session("s1"), await self.service.get_average_score("s1")
+
+        session, avg = asyncio.run(run())
+        assert [h["role"] for h in session["history"]] == ["ai", "user", "ai"]
+        assert session["current_state"]["dynamic_difficulty"] == "medium"
+        assert avg == 7.0
+
+    def test_complete_and_list_newest_first(self):
+        async def run():
+            for sid in ("a", "b", "c"):
+                await self.service.create_session(sid, "qa", "easy")
+            await self.service.complete_session("b", {"overall_score": 8})
+            return await self.service.get_all_sessions()
+
+        sessions = asyncio.run(run())
+        assert [s.id for s in sessions] == ["c", "b", "a"]
+        assert sessions[1].overall_score == 8.0
+        assert sessions[1].status == "COMPLETED"
+        assert sessions[1].end_time is not None
+        assert sessions[0].overall_score is None
+
+    def test_feedback_stored_as_structured_model(self):
+        async def run():
+            await self.service.create_session("s1", "qa", "easy")
+            await self.service.complete_session(
+                "s1", {"overall_score": "7.5", "strengths": "Testing", "extra": 1}
+            )
+            return await self.service.get_session("s1")
+
+        feedback = asyncio.run(run())["feedback"]
+        assert feedback["overall_score"] == 7.5
+        assert feedback["strengths"] == ["Testing"]
+        assert feedback["extra"] == 1
+
+
+class TestAnalyticsRollups:
+    def setup_method(self):
+        self.service = SessionService(store=MemorySessionStore())
+
+    def _complete(self, sid, role, score, weaknesses, difficulty, user_id="u1"):
+        async def run():
+            await self.service.create_session(sid, role, "medium", user_id=user_id)
+            state = await self.service.get_state(sid)
+            state["dynamic_difficulty"] = difficulty
+            await self.service.update_state(sid, state)
+            await self.service.complete_session(
+                sid, {"overall_score": score, "weaknesses": weaknesses}
+            )
+        asyncio.run(run())
+
+    def test_rollup_accumulates_per_role(self):
+        self._complete("s1", "backend", 6, ["Caching", "SQL joins"], "medium")
+        self._complete("s2", "backend", 8, ["caching "], "hard")
+        self._complete("s3", "frontend", 4, ["CSS"], "easy")
+        self._complete("s4", "backend", 10, [], "hard", user_id="other")
+
+        data = asyncio.run(self.service.analytics.get_user_analytics("u1"))
+        assert data["total_interviews"] == 3
+        assert data["average_score"] == 6.0
+        backend = next(r for r in data["roles"] if r["role"] == "backend")
+        assert backend["interview_count"] == 2
+        assert backend["average_score"] == 7.0
+        assert [p["score"] for p in backend["score_trend"]] == [6.0, 8.0]
+        assert backend["top_weak_areas"][0] == {"area": "caching", "count": 2}
+        assert backend["max_difficulty"] == "hard"
+
+    def test_completing_twice_records_once(self):
+        self._complete("s1", "backend", 6, ["Caching"], "medium")
+
+        async def again():
+            return await self.service.complete_session("s1", {"overall_score": 9})
+
+        assert asyncio.run(again()) is False
+        data = asyncio.run(self.service.analytics.get_user_analytics("u1"))
+        assert data["total_interviews"] == 1
+        assert [p["score"] for p in data["roles"][0]["score_trend"]] == [6.0]
+        percentile = asyncio.run(self.service.scores.percentile("backend", "medium", 6))
+        assert percentile["sample_size"] == 1
+        session = asyncio.run(self.service.get_session("s1"))
+        assert session["feedback"]["overall_score"] == 6
+
+    def test_anonymous_sessions_are_not_rolled_up(self):
+        self._complete("s1", "backend", 6, ["Caching"], "medium", user_id=None)
+        data = asyncio.run(self.service.analytics.get_user_analytics("u1"))
+        assert data["total_interviews"] == 0
+        assert data["average_score"] is None
+
+    def test_backfill_merges_live_and_archived_interviews(self, monkeypatch):
+        from datetime import datetime
+        from app.jobs import backfill_rollups as job
+
+        def group(count, scores, difficulties, weaknesses):
+            points = [
+                {"session_id": sid, "score": score, "completed_at": datetime(2026, 1, day)}
+                for sid, score, day in scores
+            ]
+            return {
+                "_id": {"user_id": "u1", "role": "backend"},
+                "interview_count": count,
+                "score_sum": sum(p["score"] for p in points),
+                "score_count": len(points),
+                "recent_scores": points,
+                "difficulties": difficulties,
+                "max_difficulty_rank": max(job.DIFFICULTY_RANK[d] for d in difficulties),
+                "last_difficulty": difficulties[-1],
+                "last_completed_at": points[-1]["completed_at"],
+                "weaknesses": weaknesses,
+            }
+
+        archived = group(2, [("old1", 4.0, 1), ("old2", 6.0, 2)], ["easy", "hard"], [["Caching"], []])
+        live = group(1, [("new", 8.0, 9)], ["medium"], [["caching"]])
+
+        def aggregate(*groups):
+            async def rows(*args, **kwargs):
+                for g in groups:
+                    yield g
+            return rows
+
+        monkeypatch.setattr(job.Interview, "aggregate", aggregate(live))
+        monkeypatch.setattr(job.ArchivedInterview, "aggregate", aggregate(archived))
+        groups = asyncio.run(job.rollup_groups())
+        rollup = job._fold_group(groups[("u1", "backend")])
+        assert rollup["interview_count"] == 3 and rollup["score_sum"] == 18.0
+        assert [p["session_id"] for p in rollup["recent_scores"]] == ["old1", "old2", "new"]
+        assert rollup["weak_area_counts"] == {"caching": 2}
+        assert rollup["max_difficulty_rank"] == job.DIFFICULTY_RANK["hard"]
+        assert rollup["last_difficulty"] == "medium"
+        # Archived interviews have no state; their saved difficulty stands in for it
+        assert "$final_difficulty" in str(job.ROLLUP_PIPELINE)
+
+    def test_normalize_area_strips_mongo_unsafe_chars(self):
+        assert normalize_area("  Node.js  $Streams ") == "nodejs streams"
+
+
+class TestScoreIndex:
+    def test_sketch_ranks_and_quantiles(self):
+        sketch = ScoreSketch()
+        for score in (2.0, 4.0, 5.0, 5.0, 6.5, 7.25, 8.0, 9.0, 9.5, 10.0):
+            sketch.add(score)
+        assert sketch.total == 10 and score_bin(7.25) == 72 and score_bin(11) == 100
+        assert sketch.percentile_rank(5.0) == 30.0       # 2 below, 2 tied
+        assert sketch.percentile_rank(1.0) == 0.0
+        assert sketch.percentile_rank(10.0) == 95.0
+        assert (sketch.quantile(0.25), sketch.quantile(0.5), sketch.quantile(1.0)) == (5.0, 6.5, 10.0)
+
+        halves = ScoreSketch.from_bins({20: 1, 50: 2}).merge(ScoreSketch.from_bins({50: 1, 999: 4}))
+        assert halves.total == 4 and halves.percentile_rank(5.0) == 62.5
+        assert ScoreSketch().percentile_rank(5.0) is None
+
+    def test_completions_feed_percentiles(self, monkeypatch):
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "SCORE_PERCENTILE_MIN_SAMPLES", 3)
+        service = SessionService(store=MemorySessionStore())
+
+        async def run():
+            for i, score in enumerate((4, 6, 8, 9)):
+                role = "Backend Engineer " if i % 2 else "backend engineer"
+                await service.create_session(f"s{i}", role, "Medium")
+                await service.complete_session(f"s{i}", {"overall_score": score})
+            await service.create_session("gone", "backend engineer", "medium")
+            await service.complete_session("gone", {"overall_score": 1, "auto_completed": True})
+            await service.create_session("hard", "backend engineer", "hard")
+            await service.complete_session("hard", {"overall_score": 2})
+            # A cached sketch also sees this worker's later completions
+            before = await service.scores.percentile("backend engineer", "medium", 7)
+            await service.create_session("late", "backend engineer", "medium")
+            await service.complete_session("late", {"overall_score": 10})
+            after = await service.scores.percentile("BACKEND ENGINEER", "medium", 7)
+            sparse = await service.scores.percentile("backend engineer", "hard", 2)
+            return before, after, sparse
+
+        before, after, sparse = asyncio.run(run())
+        assert before["sample_size"] == 4 and before["percentile"] == 50.0
+        assert before["quartiles"] == {"p25": 4.0, "p50": 6.0, "p75": 8.0}
+        assert after["sample_size"] == 5 and after["percentile"] == 40.0
+        assert sparse["sample_size"] == 1 and sparse["percentile"] is None
+        assert service.scores.stats()["cache_hits"] == 1
+
+
+class TestExportService:
+    def setup_method(self):
+        self.service = SessionService(store=MemorySessionStore())
+        self.export = ExportService(self.service.store)
+
+    def _collect(self, **kwargs):
+        async def run():
+            return [json.loads(line) async for line in self.export.stream_ndjson("u1", **kwargs)]
+        return asyncio.run(run())
+
+    def _seed(self):
+        async def run():
+            for i in range(5):
+                owner = "u1" if i != 2 else "u2"
+                await self.service.create_session(f"s{i}", "qa", "easy", user_id=owner)
+                await self.service.add_history(f"s{i}", "ai", f"Question {i}?")
+                await self.service.add_history(f"s{i}", "user", f"Answer {i}")
+            await self.service.complete_session("s0", {"overall_score": 7})
+        asyncio.run(run())
+
+    def test_streams_only_owned_interviews_oldest_first(self):
+        self._seed()
+        rows = self._collect(batch_size=2)
+        assert [r["session_id"] for r in rows] == ["s0", "s1", "s3", "s4"]
+        assert rows[0]["questions"][0]["answer"] == "Answer 0"
+        assert rows[0]["feedback"]["overall_score"] == 7.0
+        assert rows[1]["feedback"] is None
+
+    def test_resume_from_cursor(self):
+        self._seed()
+        first = self._collect()
+        resumed = self._collect(cursor=first[1]["cursor"])
+        assert [r["session_id"] for r in resumed] == ["s3", "s4"]
+
+    def test_invalid_cursor_rejected_before_streaming(self):
+        with pytest.raises(InvalidCursorError):
+            self.export.stream_ndjson("u1", cursor="not-a-cursor")
+
+
+class TestFinalFeedbackMigration:
+    def test_legacy_json_string_decoded(self):
+        raw = '{"overall_score": 6, "weaknesses": ["SQL"], "final_verdict": "Close."}'
+        feedback = FinalFeedback.model_validate(FinalFeedback.from_legacy(raw))
+        assert feedback.overall_score == 6.0
+        assert feedback.weaknesses == ["SQL"]
+
+    def test_legacy_plain_text_kept_as_verdict(self):
+        feedback = FinalFeedback.model_validate(FinalFeedback.from_legacy("Great job"))
+        assert feedback.final_verdict == "Great job"
+        assert feedback.overall_score is None
+
+
+class TestSessionStoreFactory:
+    def test_memory_backend(self):
+        assert isinstance(get_session_store("memory"), MemorySessionStore)
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            get_session_store("redis")
+
+
+class TestReadiness:
+    def test_pending_component_times_out_then_becomes_ready(self):
+        async def run():
+            readiness = Readiness()
+            gate = asyncio.Event()
+
+            async def slow_init():
+                await gate.wait()
+
+            readiness.start("database", slow_init())
+            with pytest.raises(ComponentNotReady):
+                await readiness.wait("database", timeout=0.01)
+            assert readiness.status() == {"database": "starting"}
+            assert not readiness.is_ready()
+
+            gate.set()
+            await readiness.wait("database", timeout=1)
+            assert readiness.is_ready()
+
+        asyncio.run(run())
+
+    def test_failed_component_reported(self):
+        async def run():
+            readiness = Readiness()
+
+            async def broken():
+                raise RuntimeError("boom")
+
+            readiness.start("gemini", broken())
+            with pytest.raises(ComponentNotReady):
+                await readiness.wait("gemini", timeout=1)
+            return readiness.status()
+
+        assert asyncio.run(run()) == {"gemini": "failed"}
+
+
+class TestGeminiClientManager:
+    def test_warm_up_retries_then_gives_up_without_failing(self, monkeypatch):
+        heads = []
+
+        async def flaky_send(self, request):
+            heads.append(request.method)
+            if len(heads) < 2:
+                raise httpx.ConnectError("connection reset", request=request)
+            return httpx.Response(200, request=request)
+
+        async def failing_send(self, request):
+            raise httpx.ConnectError("connection refused", request=request)
+
+        async def run():
+            manager = GeminiClientManager(api_key="test-key")
+            monkeypatch.setattr(httpx.AsyncHTTPTransport, "handle_async_request", flaky_send)
+            await manager.warm_up(attempts=3, delay=0)
+            assert manager.warmed_at is not None and heads == ["HEAD", "HEAD"]
+            await manager.aclose()
+
+            manager = GeminiClientManager(api_key="test-key")
+            monkeypatch.setattr(httpx.AsyncHTTPTransport, "handle_async_request", failing_send)
+            readiness = Readiness()
+            readiness.start("gemini", manager.warm_up(attempts=2, delay=0))
+            await readiness.wait("gemini", timeout=5)
+            assert manager.warmed_at is None
+            await manager.aclose()
+            return readiness.status()
+
+        assert asyncio.run(run()) == {"gemini": "ready"}
+
+    def test_shared_client_uses_pooled_transport(self, monkeypatch):
+        async def fake_send(self, request):
+            body = {"candidates": [{"content": {"role": "model", "parts": [{"text": "Q?"}]}}]}
+            return httpx.Response(200, json=body, request=request)
+
+        monkeypatch.setattr(httpx.AsyncHTTPTransport, "handle_async_request", fake_send)
+        manager = GeminiClientManager(api_key="test-key", max_connections=4)
+        monkeypatch.setattr("app.services.llm_service.gemini_clients", manager)
+
+        async def run():
+            text = await LLMService().generate_response("Ask a question")
+            stats = manager.stats()
+            await manager.aclose()
+            return text, stats
+
+        text, stats = asyncio.run(run())
+        assert text == "Q?"
+        assert stats["requests"] == 1
+        assert stats["errors"] == 0
+        assert stats["in_flight"] == 0
+        assert stats["pool_limits"]["max_connections"] == 4
+
+
+class TestAdmissionControl:
+    def test_token_bucket_burst_then_refill(self):
+        limiter = RateLimiter(rate_per_minute=60, burst=2)
+        assert limiter.hit("u1", now=0.0) == 0.0
+        assert limiter.hit("u1", now=0.0) == 0.0
+        assert limiter.hit("u1", now=0.0) == pytest.approx(1.0)
+        assert limiter.hit("u2", now=0.0) == 0.0  # Buckets are per key
+        assert limiter.hit("u1", now=1.0) == 0.0
+
+    def test_batch_grading_is_charged_per_item(self, monkeypatch):
+        from fastapi import HTTPException
+        from app.api import deps
+        monkeypatch.setattr(deps, "batch_rate_limiter", RateLimiter(rate_per_minute=1, burst=10))
+        deps.charge_batch_items("u1", 8)
+        with pytest.raises(HTTPException) as e:
+            deps.charge_batch_items("u1", 8)
+        assert e.value.status_code == 429 and "Retry-After" in e.value.headers
+        deps.charge_batch_items("u2", 10)
+
+    def test_interactive_calls_jump_ahead_of_background(self):
+        async def run():
+            queue = LLMWorkQueue(max_concurrency=1, sla_seconds=60)
+            order = []
+            gate = asyncio.Event()
+
+            async def call(name, priority, wait_for=None):
+                async with queue.slot(priority):
+                    order.append(name)
+                    if wait_for:
+                        await wait_for.wait()
+
+            first = asyncio.create_task(call("first", Priority.INTERACTIVE, gate))
+            await asyncio.sleep(0)
+            background = asyncio.create_task(call("feedback", Priority.BACKGROUND))
+            await asyncio.sleep(0)
+            interactive = asyncio.create_task(call("turn", Priority.INTERACTIVE))
+            await asyncio.sleep(0)
+            gate.set()
+            await asyncio.gather(first, background, interactive)
+            return order, queue.stats()
+
+        order, stats = asyncio.run(run())
+        assert order == ["first", "turn", "feedback"]
+        assert stats["active"] == 0 and stats["waiting"] == 0
+
+    def test_admission_sheds_when_wait_exceeds_sla(self):
+        async def run():
+            queue = LLMWorkQueue(max_concurrency=1, sla_seconds=1, initial_call_seconds=5)
+            gate = asyncio.Event()
+
+            async def hold():
+                async with queue.slot():
+                    await gate.wait()
+
+            queue.admit()  # Idle queue admits
+            task = asyncio.create_task(hold())
+            await asyncio.sleep(0)
+            with pytest.raises(LLMOverloaded) as exc:
+                queue.admit()
+            gate.set()
+            await task
+            return exc.value.retry_after
+
+        assert asyncio.run(run()) == 5
+
+
+class TestServerEntryPoint:
+    def test_workers_default_to_available_cpus(self):
+        config = server.build_config("127.0.0.1", 8000)
+        assert config["workers"] == server.available_cpus()
+        assert config["loop"] in ("uvloop", "asyncio")
+        assert config["http"] in ("httptools", "h11")
+        assert config["proxy_headers"] is True
+        assert config["forwarded_allow_ips"] == server.settings.FORWARDED_ALLOW_IPS
+        assert config["access_log"] is True
+
+    def test_access_log_follows_settings(self, monkeypatch):
+        monkeypatch.setattr(server.settings, "SERVER_ACCESS_LOG", False)
+        assert server.build_config("127.0.0.1", 8000)["access_log"] is False
+
+    def test_self_check_warns_that_rate_limits_multiply_with_workers(self):
+        def rate_warnings(workers):
+            findings = server.self_check(server.build_config("127.0.0.1", 8000, workers=workers))
+            return [msg for level, msg in findings if level == logging.WARNING and "Rate-limit" in msg]
+
+        assert rate_warnings(1) == []
+        assert "4×" in rate_warnings(4)[0]
+
+    def test_self_check_rejects_memory_store_with_several_workers(self, monkeypatch):
+        monkeypatch.setattr(server.settings, "SESSION_BACKEND", "memory")
+        findings = server.self_check(server.build_config("127.0.0.1", 8000, workers=2))
+        assert any(level == logging.ERROR and "SESSION_BACKEND" in msg for level, msg in findings)
+
+        findings = server.self_check(server.build_config("127.0.0.1", 8000, workers=1))
+        assert not any(level == logging.ERROR for level, _ in findings)
+
+    def test_fake_gemini_transport_serves_canned_replies(self, monkeypatch):
+        monkeypatch.setattr("app.services.gemini_client.settings.GEMINI_FAKE_LATENCY_MS", 1)
+        manager = GeminiClientManager(api_key="test-key")
+        monkeypatch.setattr("app.services.llm_service.gemini_clients", manager)
+
+        async def run():
+            service = LLMService()
+            question = await service.generate_question("qa", "easy", "General", [])
+            evaluation = await service.evaluate_answer_v2(
+                "qa", "easy", "intro", 1, [], [], question, "An answer"
+            )
+            await manager.aclose()
+            return question, evaluation
+
+        question, evaluation = asyncio.run(run())
+        assert question.endswith("?")
+        assert evaluation["score"] == 7
+        assert manager.stats()["requests"] == 2
+
+
+class TestModelRouter:
+    ROUTE = ["fast-model", "backup-model"]
+
+    def _router(self, monkeypatch):
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "MODEL_ROUTES", {"question": self.ROUTE})
+        monkeypatch.setattr(settings, "MODEL_FALLBACK_P95_SECONDS", {"question": 2.0})
+        monkeypatch.setattr(settings, "MODEL_FALLBACK_ERROR_RATE", 0.25)
+        monkeypatch.setattr(settings, "MODEL_HEALTH_MIN_SAMPLES", 10)
+        monkeypatch.setattr(settings, "MODEL_HEALTH_WINDOW_SECONDS", 300.0)
+        monkeypatch.setattr(settings, "MODEL_PRICES_PER_MTOK", {"fast-model": [0.1, 0.4]})
+        return ModelRouter()
+
+    def test_slow_or_failing_primary_falls_back_until_samples_age_out(self, monkeypatch):
+        router = self._router(monkeypatch)
+        assert router.choose("question") == "fast-model"
+        for _ in range(9):
+            router.record("question", "fast-model", 5.0)
+        assert router.choose("question") == "fast-model"  # Not enough evidence yet
+        router.record("question", "fast-model", 5.0)
+        assert router.choose("question") == "backup-model"
+        assert router.fallbacks["question"] == 1
+
+        # Old samples leave the window and the primary gets traffic again
+        import time
+        later = time.monotonic() + 301
+        monkeypatch.setattr("app.services.model_router.time.monotonic", lambda: later)
+        assert router.choose("question") == "fast-model"
+
+        router = self._router(monkeypatch)
+        for i in range(20):
+            router.record("question", "fast-model", 0.5, ok=i % 2 == 0)
+        assert router.health("question", "fast-model")["error_rate"] == 0.5
+        assert router.choose("question") == "backup-model"
+        # Both degraded: the one failing least wins
+        for _ in range(20):
+            router.record("question", "backup-model", 0.5, ok=False)
+        assert router.choose("question") == "fast-model"
+
+    def test_run_times_calls_and_accounts_cost(self, monkeypatch):
+        from types import SimpleNamespace
+        router = self._router(monkeypatch)
+        usage = SimpleNamespace(
+            prompt_token_count=1_000_000, candidates_token_count=400_000, thoughts_token_count=100_000
+        )
+
+        async def ok(model):
+            return SimpleNamespace(text=model, usage_metadata=usage)
+
+        async def boom(model):
+            raise RuntimeError("503")
+
+        async def run():
+            assert (await router.run("question", ok)).text == "fast-model"
+            with pytest.raises(RuntimeError):
+                await router.run("question", boom)
+
+        asyncio.run(run())
+        stats = router.stats()
+        fast = stats["models"]["fast-model"]
+        assert fast["calls"] == 2 and fast["errors"] == 1
+        assert fast["input_tokens"] == 1_000_000 and fast["output_tokens"] == 500_000
+        assert fast["cost_usd"] == 0.3
+        assert stats["tasks"]["question"]["health"]["fast-model"]["samples"] == 2
+        with pytest.raises(KeyError):
+            router.choose("feedback")
+
+    def test_self_check_flags_unrouted_tasks(self, monkeypatch):
+        monkeypatch.setattr(server.settings, "MODEL_ROUTES", {"question": ["m"]})
+        findings = server.self_check(server.build_config("127.0.0.1", 8000, workers=1))
+        assert any(level == logging.ERROR and "feedback" in msg for level, msg in findings)
+
+
+class _StubGrader:
+    """LLMService stand-in that records calls; packed replies skip `skip`, single calls fail `fail`."""
+
+    def __init__(self, skip=(), fail=()):
+        self.skip = set(skip)
+        self.fail = set(fail)
+        self.packed_calls = []
+        self.single_calls = []
+
+    async def evaluate_answers_packed(self, items, priority):
+        self.packed_calls.append(len(items))
+        return [None if it["question"] in self.skip else {"score": 8} for it in items]
+
+    async def try_evaluate_answer(self, *args, priority):
+        self.single_calls.append(args[6])
+        return None if args[6] in self.fail else {"score": 4}
+
+
+class TestGradingService:
+    def _items(self, n):
+        return [
+            {"id": f"q{i}", "role": "qa", "difficulty": "easy",
+             "question": f"Q{i}?", "answer": f"A{i}"}
+            for i in range(n)
+        ]
+
+    def _grade(self, service, items, **kwargs):
+        async def run():
+            return [row async for row in service.grade(items, **kwargs)]
+        return asyncio.run(run())
+
+    def test_packs_items_and_returns_every_result(self):
+        llm = _StubGrader()
+        rows = self._grade(GradingService(llm), self._items(7), pack_size=3, concurrency=2)
+        assert llm.packed_calls == [3, 3]
+        assert llm.single_calls == ["Q6?"]  # Last pack has one item
+        assert sorted(r["index"] for r in rows) == list(range(7))
+        assert {r["id"]: r["packed"] for r in rows}["q0"] is True
+
+    def test_items_skipped_by_packed_reply_are_graded_alone(self):
+        llm = _StubGrader(skip={"Q1?"})
+        rows = self._grade(GradingService(llm), self._items(3), pack_size=3)
+        by_index = {r["index"]: r for r in rows}
+        assert llm.single_calls == ["Q1?"]
+        assert by_index[1]["score"] == 4 and by_index[1]["packed"] is False
+        assert by_index[0]["score"] == 8
+
+    def test_ungradable_items_are_flagged_not_scored(self):
+        llm = _StubGrader(skip={"Q1?"}, fail={"Q1?"})
+        rows = self._grade(GradingService(llm), self._items(3), pack_size=3)
+        by_index = {r["index"]: r for r in rows}
+        assert by_index[1] == {
+            "index": 1, "id": "q1", "packed": False, "graded": False,
+            "error": "Could not grade this answer",
+        }
+        assert by_index[0]["graded"] is True and by_index[0]["score"] == 8
+
+    def test_large_answers_split_packs(self):
+        items = self._items(3)
+        items[1]["answer"] = "x" * 20_000
+        assert GradingService(_StubGrader()).pack(items, pack_size=5) == [[0], [1], [2]]
+
+
+class TestQuestionIndex:
+    def setup_method(self):
+        self.store = MemorySessionStore()
+        self.index = QuestionIndexService(self.store, threshold=0.5)
+
+    def _fresh(self, replies, user_id="u1", session_id="s1", index=None):
+        replies = iter(replies)
+        calls = []
+
+        async def generate(rejected):
+            calls.append(list(rejected))
+            return next(replies)
+
+        question = asyncio.run(
+            (index or self.index).fresh_question(user_id, session_id, generate, retries=1)
+        )
+        return question, calls
+
+    def test_failed_generation_is_never_recorded_or_served(self):
+        from app.services.llm_service import GENERATION_FAILED
+        question, calls = self._fresh([GENERATION_FAILED, ""])
+        assert question in ALTERNATE_QUESTIONS
+        assert calls == [[], []] and self.index.failed == 2
+        # Only the served alternate went into the user's index
+        assert len(asyncio.run(self.store.load_question_signatures("u1"))) == 1
+        assert asyncio.run(self.index.similarity("u1", "s1", GENERATION_FAILED)) < 0.5
+
+    def test_paraphrase_is_near_duplicate(self):
+        a = signature("Can you explain how a hash map handles collisions?")
+        b = signature("Explain how hash maps handle collisions.")
+        c = signature("How would you design a rate limiter?")
+        assert (a == b).mean() >= 0.5
+        assert (a == c).mean() < 0.2
+
+    def test_near_duplicate_is_regenerated(self):
+        self._fresh(["How does a hash map handle collisions?"])
+        question, calls = self._fresh([
+            "Explain how hash maps handle collisions.",
+            "How would you design a rate limiter?",
+        ], session_id="s2")
+        assert question == "How would you design a rate limiter?"
+        assert calls == [[], ["Explain how hash maps handle collisions."]]
+        assert self.index.stats()["regenerated"] == 1
+
+    def test_falls_back_to_alternate_pool(self):
+        self._fresh(["What is a deadlock?"])
+        question, _ = self._fresh(["What is a deadlock?", "What's a deadlock?"], session_id="s2")
+        assert question in ALTERNATE_QUESTIONS
+        assert self.index.stats()["served_from_pool"] == 1
+
+    def test_signatures_persist_across_workers(self):
+        self._fresh(["How does TCP congestion control work?"])
+        other_worker = QuestionIndexService(self.store, threshold=0.5)
+        question, calls = self._fresh(
+            ["Explain TCP congestion control.", "What is a B-tree index?"],
+            session_id="s2", index=other_worker,
+        )
+        assert question == "What is a B-tree index?"
+        assert len(calls) == 2
+
+    def test_anonymous_sessions_do_not_share_an_index(self):
+        self._fresh(["What is a deadlock?"], user_id=None, session_id="a")
+        question, calls = self._fresh(["What is a deadlock?"], user_id=None, session_id="b")
+        assert question == "What is a deadlock?" and len(calls) == 1
+
+
+class TestHeuristicFallback:
+    QUESTION = "How does a hash map handle collisions, and what is the lookup complexity?"
+    STRONG = (
+        "A hash map handles collisions with separate chaining or open addressing. "
+        "First, with chaining each bucket keeps a list of entries. Second, open addressing "
+        "probes for the next free slot, for example with linear probing. Lookup is O(1) on "
+        "average because the load factor is bounded by resizing, however the worst case is O(n)."
+    )
+
+    def test_scores_rank_answer_quality(self):
+        strong, short, empty = HeuristicEvaluator().evaluate_many([
+            (self.QUESTION, self.STRONG, "medium"),
+            (self.QUESTION, "Each bucket has a list, lookup is constant.", "medium"),
+            (self.QUESTION, "I don't know.", "medium"),
+        ])
+        assert strong["score"] > short["score"] > empty["score"]
+        assert empty["score"] <= 2.0
+        assert strong["classification"] == "strong"
+        assert all(r["needs_rescore"] and r["difficulty_trend"] == "stable"
+                   for r in (strong, short, empty))
+
+    def _within_budget(self, monkeypatch, fake_evaluate, budget):
+        service = LLMService()
+        monkeypatch.setattr(service, "try_evaluate_answer", fake_evaluate)
+        evaluation = asyncio.run(service.evaluate_answer_within_budget(
+            "qa", "medium", "technical_deep_dive", 1, [], [], self.QUESTION, self.STRONG,
+            budget=budget,
+        ))
+        return service, evaluation
+
+    def test_slow_llm_falls_back_to_heuristic(self, monkeypatch):
+        async def slow(*args):
+            await asyncio.sleep(1)
+            return {"score": 9}
+
+        service, evaluation = self._within_budget(monkeypatch, slow, budget=0.01)
+        assert evaluation["source"] == "heuristic"
+        assert evaluation["fallback_reason"] == "timeout"
+        assert service.evaluation_counts["heuristic_timeout"] == 1
+
+    def test_failed_llm_falls_back_and_fast_llm_is_used(self, monkeypatch):
+        async def failed(*args):
+            return None
+
+        _, evaluation = self._within_budget(monkeypatch, failed, budget=1)
+        assert evaluation["fallback_reason"] == "error"
+
+        async def fast(*args):
+            return {"score": 9}
+
+        service, evaluation = self._within_budget(monkeypatch, fast, budget=1)
+        assert evaluation == {"score": 9}
+        assert service.evaluation_counts["llm"] == 1
+
+    def test_provisional_score_is_flagged_in_export(self):
+        service = SessionService(store=MemorySessionStore())
+
+        async def run():
+            await service.create_session("s1", "qa", "easy", user_id="u1")
+            await service.add_history("s1", "ai", self.QUESTION)
+            await service.add_history("s1", "user", self.STRONG)
+            await service.update_last_answer_score("s1", 6.5, needs_rescore=True)
+            return [json.loads(line) async for line in ExportService(service.store).stream_ndjson("u1")]
+
+        question = asyncio.run(run())[0]["questions"][0]
+        assert question["score"] == 6.5
+        assert question["score_provisional"] is True
+
+    def test_rescore_recomputes_overall_scores_derived_from_answers(self):
+        from types import SimpleNamespace
+        from app.jobs.rescore_answers import rescored_overall
+
+        def interview(scores, **feedback):
+            return SimpleNamespace(
+                questions=[SimpleNamespace(answer=SimpleNamespace(ai_score=s)) for s in scores],
+                overall_feedback=FinalFeedback(**feedback),
+            )
+
+        assert rescored_overall(interview([8.0, 7.0], overall_score=5.5, score_from_answers=True)) == 7.5
+        assert rescored_overall(interview([8.0, 7.0], overall_score=5.5, auto_completed=True)) == 7.5
+        # Unchanged average, or a score Gemini judged on its own: nothing to rebuild
+        assert rescored_overall(interview([8.0, 7.0], overall_score=7.5, score_from_answers=True)) is None
+        assert rescored_overall(interview([8.0, 7.0], overall_score=5.5)) is None
+
+
+class TestAudioTrimming:
+    RATE = 16000
+
+    def _wav(self, channels=2):
+        import io
+        import wave
+
+        import numpy as np
+        t = np.arange(self.RATE) / self.RATE
+        tone = 0.5 * np.sin(2 * np.pi * 220 * t)
+        silence = np.zeros(3 * self.RATE)
+        mono = np.concatenate([silence, tone, silence, tone, silence])
+        pcm = (mono * 32767).astype("<i2")
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as out:
+            out.setnchannels(channels)
+            out.setsampwidth(2)
+            out.setframerate(self.RATE)
+            out.writeframes(np.repeat(pcm[:, None], channels, axis=1).tobytes())
+        return buffer.getvalue()
+
+    def test_silence_is_trimmed_and_downmixed(self):
+        data = self._wav()
+        assert is_uncompressed(data, "audio/wav")
+        result = trim_silence(data, "audio/wav", max_seconds=60, max_pause=0.6)
+        assert result.original_seconds == pytest.approx(11.0)
+        # Two 1 s tones plus padding; the 3 s gaps shrink to ~max_pause
+        assert 2.0 <= result.output_seconds < 4.5
+        assert result.bytes_saved > len(data) // 2
+        samples, rate = decode(result.wav)
+        assert samples.shape[1] == 1 and rate == self.RATE
+
+    def test_length_cap_and_silent_recording(self):
+        assert trim_silence(self._wav(), max_seconds=1.5, max_pause=0.6).output_seconds == 1.5
+        silent = trim_silence(b"\x00" * 2 * self.RATE, "audio/L16; rate=16000", max_pause=0.6)
+        assert not silent.has_speech
+        assert silent.original_seconds == pytest.approx(1.0)
+
+    def test_compressed_and_broken_uploads(self):
+        assert not is_uncompressed(b"\x1aE\xdf\xa3" + b"\x00" * 8, "audio/webm")
+        with pytest.raises(AudioFormatError):
+            trim_silence(b"RIFF\x00\x00\x00\x00WAVEjunk", "audio/wav")
+        # fmt chunks too short for their fields (plain, and declared longer than the file)
+        for fmt in (b"fmt \x04\x00\x00\x00\x01\x00\x01\x00",
+                    b"fmt \x10\x00\x00\x00\x01\x00",
+                    b"fmt \x28\x00\x00\x00" + struct.pack("<HHIIHH", 0xFFFE, 1, 16000, 32000, 2, 16)):
+            with pytest.raises(AudioFormatError):
+                trim_silence(b"RIFF\x00\x00\x00\x00WAVE" + fmt, "audio/wav")
+
+
+class TestNonVerbalWindows:
+    def _frames(self, n=400, seed=0):
+        import numpy as np
+        rng = np.random.default_rng(seed)
+        frames = np.full((n, len(CHANNELS)), np.nan, dtype=np.float32)
+        frames[:, 0] = rng.normal(70, 10, n)
+        frames[::4, 1] = rng.uniform(0, 100, n)[::4]
+        return frames
+
+    def test_batches_merge_exactly_and_percentiles_are_close(self):
+        import numpy as np
+        frames = self._frames()
+        whole = WindowStats.from_frames(frames)
+        merged = WindowStats.from_frames(frames[:150]).merge(WindowStats.from_frames(frames[150:]))
+        assert np.array_equal(merged.histogram, whole.histogram)
+        assert np.allclose(merged.moments, whole.moments)
+
+        summary = WindowStats.unpack(whole.pack()).summary()
+        assert set(summary) == {"eye_contact", "head_stability"}
+        eye = summary["eye_contact"]
+        assert eye["mean"] == pytest.approx(float(np.mean(frames[:, 0])), abs=0.1)
+        assert eye["std"] == pytest.approx(float(np.std(frames[:, 0])), abs=0.1)
+        assert eye["p50"] == pytest.approx(float(np.median(frames[:, 0])), abs=100 / 25)
+        assert summary["head_stability"]["coverage"] == 0.25
+
+    def test_decode_binary_and_json_columns(self):
+        import numpy as np
+        rows = np.array([[80, 60], [70, np.nan]], dtype="<f4")
+        frames = decode_frames(rows.tobytes(), "application/octet-stream", "head_stability,eye_contact")
+        assert frames.shape == (2, len(CHANNELS))
+        assert frames[0, 0] == 60 and frames[0, 1] == 80 and np.isnan(frames[1, 0])
+
+        frames = decode_frames(b'{"posture": [50, null, 70]}', "application/json")
+        assert frames.shape == (3, len(CHANNELS)) and np.isnan(frames[1, 2])
+
+        with pytest.raises(NonVerbalFormatError):
+            decode_frames(b"\x00" * 6, "application/octet-stream", "eye_contact")
+        with pytest.raises(NonVerbalFormatError):
+            decode_frames(b'{"eye_contact": [1], "posture": [1, 2]}', "application/json")
+
+    def test_windows_are_stored_per_answer_and_described(self):
+        service = NonVerbalService(MemorySessionStore())
+
+        async def run():
+            await service.ingest("s1", 1, self._frames(seed=1))
+            await service.ingest("s1", 2, self._frames(seed=2))
+            await service.ingest("s1", 2, frame_from_metrics({"eye_contact_score": 90}))
+            return await service.summary("s1"), await service.describe("s1")
+
+        summary, text = asyncio.run(run())
+        assert summary["frames"] == 801 and summary["answers"] == 2
+        assert set(summary["channels"]["eye_contact"]["per_answer_mean"]) == {1, 2}
+        assert "eye_contact: mean" in text and "Q2" in text
+        assert asyncio.run(service.describe("missing")) is None
+
+    def test_concurrent_batches_for_one_answer_are_not_lost(self):
+        import numpy as np
+        service = NonVerbalService(MemorySessionStore())
+        frames = self._frames(seed=3)
+        batches = np.array_split(frames, 8)
+
+        async def run():
+            await asyncio.gather(*(service.ingest("s1", 1, batch) for batch in batches))
+            return await service.summary("s1")
+
+        summary = asyncio.run(run())
+        assert summary["frames"] == 400
+        whole = WindowStats.from_frames(frames).summary()
+        assert summary["channels"]["eye_contact"]["mean"] == pytest.approx(whole["eye_contact"]["mean"])
+
+    def test_update_fields_round_trip_and_fold_legacy_stats(self):
+        import numpy as np
+        frames = self._frames(seed=4)
+        old, new = WindowStats.from_frames(frames[:100]), WindowStats.from_frames(frames[100:])
+        inc, low, high = new.update_fields()
+        fields = {"moments": {}, "histogram": {}, "stats": old.pack()}
+        for path, value in {**inc, **low, **high}.items():
+            section, channel, key = path.split(".")
+            fields[section].setdefault(channel, {})[key] = value
+
+        whole = WindowStats.from_frames(frames)
+        restored = WindowStats.from_document(fields)
+        assert np.array_equal(restored.histogram, whole.histogram)
+        assert np.allclose(restored.moments, whole.moments)
+
+
+class TestSessionLifecycle:
+    def _lifecycle(self):
+        service = SessionService(store=MemorySessionStore())
+        return service, SessionLifecycle(service)
+
+    def test_idle_sessions_are_auto_completed_or_expired(self):
+        from datetime import datetime, timedelta
+        service, lifecycle = self._lifecycle()
+
+        async def run():
+            await service.create_session("answered", "qa", "easy", user_id="u1")
+            await service.add_history("answered", "ai", "Q1?")
+            await service.add_history("answered", "user", "A1")
+            await service.update_last_answer_score("answered", 7.0)
+            await service.create_session("unanswered", "qa", "easy")
+            await service.add_history("unanswered", "ai", "Q1?")
+
+            assert await lifecycle.sweep() == {"auto_completed": 0, "expired": 0, "archived": 0}
+            later = datetime.utcnow() + timedelta(days=2)
+            counts = await lifecycle.sweep(now=later)
+            return counts, await service.get_session("answered"), await service.get_session("unanswered")
+
+        counts, answered, unanswered = asyncio.run(run())
+        assert counts == {"auto_completed": 1, "expired": 1, "archived": 0}
+        assert unanswered is None
+        assert answered["feedback"]["auto_completed"] is True
+        assert answered["feedback"]["overall_score"] == 7.0
+        assert answered["current_state"] == {}
+        analytics = asyncio.run(service.analytics.get_user_analytics("u1"))
+        assert analytics["total_interviews"] == 1
+
+    def test_sweep_racing_a_manual_end_leaves_it_alone(self):
+        from datetime import datetime, timedelta
+        service, lifecycle = self._lifecycle()
+        idle_sessions = service.store.idle_sessions
+
+        async def user_ends_first(cutoff, limit):
+            batch = await idle_sessions(cutoff, limit)
+            for interview in batch:  # /end lands after the sweep picked the batch
+                await service.complete_session(interview.session_id, {"overall_score": 9})
+            return batch
+
+        async def run():
+            await service.create_session("s1", "qa", "easy", user_id="u1")
+            await service.add_history("s1", "ai", "Q1?")
+            await service.add_history("s1", "user", "A1")
+            service.store.idle_sessions = user_ends_first
+            counts = await lifecycle.close_idle(now=datetime.utcnow() + timedelta(days=2))
+            return counts, await service.get_session("s1")
+
+        counts, session = asyncio.run(run())
+        assert counts == {"auto_completed": 0, "expired": 0}
+        assert session["feedback"]["overall_score"] == 9 and session["current_state"]
+        analytics = asyncio.run(service.analytics.get_user_analytics("u1"))
+        assert analytics["total_interviews"] == 1
+
+    def test_archived_sessions_are_still_readable(self):
+        from datetime import datetime, timedelta
+        service, lifecycle = self._lifecycle()
+
+        async def run():
+            for sid in ("old", "rescore"):
+                await service.create_session(sid, "qa", "easy", user_id="u1")
+                await service.add_history(sid, "ai", "Q1?")
+                await service.add_history(sid, "user", "A1")
+            await service.update_last_answer_score("rescore", 4.0, needs_rescore=True)
+            await service.complete_session("old", {"overall_score": 8})
+            await service.complete_session("rescore", {"overall_score": 4})
+
+            counts = await lifecycle.sweep(now=datetime.utcnow() + timedelta(days=60))
+            exported = [
+                json.loads(line) async for line in ExportService(service.store).stream_ndjson("u1")
+            ]
+            return counts, await service.get_session("old"), await service.get_all_sessions(), exported
+
+        counts, old, history, exported = asyncio.run(run())
+        # Provisional scores wait for the rescore job before archiving
+        assert counts["archived"] == 1
+        assert "old" in service.store._archived and "rescore" not in service.store._archived
+        assert old["history"] == [{"role": "ai", "content": "Q1?"}, {"role": "user", "content": "A1"}]
+        assert {h.id for h in history} == {"old", "rescore"}
+        assert [row["session_id"] for row in exported] == ["old", "rescore"]
+
+    def test_merge_sorted_interleaves_live_and_archived_streams(self):
+        from app.services.session_store import _merge_sorted
+
+        async def stream(values):
+            for v in values:
+                yield v
+
+        async def run():
+            merged = _merge_sorted([stream([1, 4, 5]), stream([]), stream([2, 3, 6])], key=lambda v: v)
+            return [v async for v in merged]
+
+        assert asyncio.run(run()) == [1, 2, 3, 4, 5, 6]
+
+
+class TestConversationMemory:
+    def _turns(self, memory, state, count, answer_words=300):
+        for order in range(1, count + 1):
+            memory.record_turn(
+                state, order, f"How would you design a rate limiter for service {order}?",
+                "First I would pick a token bucket. " + "It refills steadily. " * (answer_words // 3),
+                {"score": 6 + order % 3, "critical_mistake": "ignored clock skew" if order == 2 else None},
+            )
+
+    def test_estimator_and_truncation(self):
+        assert estimate_tokens("") == 0
+        assert 2 <= estimate_tokens("hello world") <= 4
+        long_text = "word " * 500
+        cut = truncate_to_tokens(long_text, 50)
+        assert estimate_tokens(cut) <= 51 and cut.endswith("…")
+        assert truncate_to_tokens("short answer", 50) == "short answer"
+
+    def test_context_stays_within_budget_as_interview_grows(self, monkeypatch):
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "PROMPT_CONTEXT_TOKENS", 400)
+        monkeypatch.setattr(settings, "CONVERSATION_RECENT_TURNS", 2)
+        memory, state = ConversationMemory(), {}
+
+        sizes = []
+        for order in range(1, 41):
+            self._turns(memory, state, 1)
+            state["memory"]["recent"][-1]["order"] = order
+            sizes.append(estimate_tokens(memory.context(state)))
+        assert max(sizes) <= 400
+        assert len(state["memory"]["recent"]) == 2
+        # Old turns were squeezed out of the digest into the running aggregate
+        assert state["memory"]["earlier"]["count"] > 0
+        assert "earlier question(s), average score" in memory.context(state, budget=10_000)
+
+    def test_recent_turns_verbatim_older_turns_summarised(self):
+        memory, state = ConversationMemory(), {}
+        self._turns(memory, state, 4, answer_words=30)
+        context = memory.context(state)
+        assert context.index("Earlier (summary):") < context.index("Most recent:")
+        assert "- Q2 (design rate limiter service, scored 8): First I would pick a token bucket." in context
+        assert "mistake: ignored clock skew" in context
+        assert "Q4: How would you design a rate limiter for service 4?" in context
+        assert memory.context({}) == "None yet."
+
+
+class TestStructuredOutput:
+    VALID = json.dumps({
+        "score": 8, "classification": "strong", "difficulty_trend": "upgrade",
+        "next_focus": "Drill down on locking",
+    })
+
+    def _service(self, monkeypatch, replies):
+        service = LLMService()
+        prompts = []
+
+        async def fake_call(prompt, schema, priority, media=None):
+            prompts.append(prompt)
+            return replies.pop(0)
+
+        monkeypatch.setattr(service, "_call_structured", fake_call)
+        return service, prompts
+
+    def _evaluate(self, service):
+        return asyncio.run(service.try_evaluate_answer(
+            "qa", "medium", "technical_deep_dive", 1, [], [], "Q?", "A", Priority.INTERACTIVE,
+        ))
+
+    def test_valid_reply_is_typed(self, monkeypatch):
+        service, prompts = self._service(monkeypatch, [self.VALID])
+        evaluation = self._evaluate(service)
+        assert evaluation["score"] == 8.0 and evaluation["stage_change"] is None
+        assert len(prompts) == 1
+        assert service.structured_counts["AnswerEvaluation"]["ok"] == 1
+
+    def test_malformed_reply_gets_one_targeted_repair(self, monkeypatch):
+        bad = json.dumps({"score": 14, "classification": "great", "next_focus": "x"})
+        service, prompts = self._service(monkeypatch, [bad, self.VALID])
+        assert self._evaluate(service)["classification"] == "strong"
+        assert "Errors: score:" in prompts[1] and bad in prompts[1]
+        assert service.structured_counts["AnswerEvaluation"]["repaired"] == 1
+
+        service, prompts = self._service(monkeypatch, ["not json", "{}"])
+        assert self._evaluate(service) is None
+        assert len(prompts) == 2
+        assert service.structured_counts["AnswerEvaluation"]["malformed"] == 1
+
+        service, prompts = self._service(monkeypatch, [None])
+        assert self._evaluate(service) is None
+        assert len(prompts) == 1  # Failed calls are not "repaired"
+        assert service.structured_counts["AnswerEvaluation"]["errors"] == 1
+
+    def test_spoken_answer_is_transcribed_and_evaluated_in_one_call(self, monkeypatch):
+        reply = json.dumps({**json.loads(self.VALID), "transcript": " I'd shard by user id. "})
+        service = LLMService()
+        calls, replies = [], [reply, None]
+
+        async def fake_call(prompt, schema, priority, media=None):
+            calls.append((prompt, schema.__name__, media))
+            return replies.pop(0)
+
+        monkeypatch.setattr(service, "_call_structured", fake_call)
+        transcript, evaluation = asyncio.run(service.evaluate_spoken_answer_within_budget(
+            "qa", "medium", "technical_deep_dive", 1, [], [], "Q?", b"RIFF...", "audio/wav",
+        ))
+        assert transcript == "I'd shard by user id." and evaluation["score"] == 8.0
+        assert "transcript" not in evaluation
+        assert len(calls) == 1 and calls[0][1:] == ("SpokenAnswerEvaluation", (b"RIFF...", "audio/wav"))
+        assert '"transcript"' in calls[0][0] and "(the attached audio recording)" in calls[0][0]
+
+        assert asyncio.run(service.evaluate_spoken_answer_within_budget(
+            "qa", "medium", "technical_deep_dive", 1, [], [], "Q?", b"RIFF...", "audio/wav",
+        )) is None
+        assert service.spoken_counts == {"native": 1, "fallback_timeout": 0, "fallback_error": 1}
+
+    def test_packed_results_map_to_items(self, monkeypatch):
+        entry = json.loads(self.VALID)
+        reply = json.dumps({"results": [{**entry, "item": 2}, {**entry, "item": 9}]})
+        service, _ = self._service(monkeypatch, [reply])
+        items = [{"role": "qa", "difficulty": "easy", "question": "Q?", "answer": "A"}] * 2
+        evaluations = asyncio.run(service.evaluate_answers_packed(items))
+        assert evaluations[0] is None
+        assert evaluations[1]["score"] == 8.0 and "item" not in evaluations[1]
+
+
+class TestIdempotency:
+    def _service(self):
+        service = IdempotencyService(MemorySessionStore())
+        calls = []
+
+        async def handler():
+            from fastapi.responses import Response
+            calls.append(1)
+            return Response(content=b'{"n": %d}' % len(calls), media_type="application/json",
+                            headers={"X-Audio-Bytes-Saved": "10"})
+
+        return service, calls, handler
+
+    def test_retry_replays_stored_response(self):
+        service, calls, handler = self._service()
+
+        async def run():
+            first = await service.run("/chat", "k1", fingerprint(b"a"), handler)
+            retry = await service.run("/chat", "k1", fingerprint(b"a"), handler)
+            other_scope = await service.run("/audio-chat", "k1", fingerprint(b"a"), handler)
+            no_key = await service.run("/chat", None, "", handler)
+            return first, retry, other_scope, no_key, await service.has_response("/chat", "k1")
+
+        first, retry, other_scope, no_key, stored = asyncio.run(run())
+        assert len(calls) == 3
+        assert retry.body == first.body == b'{"n": 1}'
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert retry.headers["x-audio-bytes-saved"] == "10"
+        assert other_scope.body == b'{"n": 2}' and no_key.body == b'{"n": 3}'
+        assert stored
+
+    def test_keys_are_scoped_to_the_caller(self):
+        from types import SimpleNamespace
+        from app.api import deps
+        from app.core.security import create_access_token
+
+        def request(host):
+            return SimpleNamespace(url=SimpleNamespace(path="/api/interview/chat"),
+                                   client=SimpleNamespace(host=host))
+
+        alice, bob = create_access_token("alice"), create_access_token("bob")
+        assert deps.idempotency_scope(request("10.0.0.1"), alice) == "/api/interview/chat:user:alice"
+        # Same key from another account, or another anonymous address: a different record
+        assert deps.idempotency_scope(request("10.0.0.1"), alice) != deps.idempotency_scope(request("10.0.0.1"), bob)
+        assert deps.idempotency_scope(request("10.0.0.2"), None) == "/api/interview/chat:ip:10.0.0.2"
+        assert deps.idempotency_scope(request("10.0.0.2"), "not-a-token").endswith(":ip:10.0.0.2")
+
+    def test_conflicts_and_failures(self):
+        service, calls, handler = self._service()
+
+        async def failing():
+            raise RuntimeError("LLM down")
+
+        async def run():
+            with pytest.raises(IdempotencyKeyReused):
+                await service.run("/chat", "k1", fingerprint(b"a"), handler)
+                await service.run("/chat", "k1", fingerprint(b"b"), handler)
+
+            # A concurrent retry while the original is still running
+            started, release = asyncio.Event(), asyncio.Event()
+
+            async def slow():
+                started.set()
+                await release.wait()
+                return await handler()
+
+            original = asyncio.create_task(service.run("/chat", "k2", "f", slow))
+            await started.wait()
+            with pytest.raises(IdempotencyInProgress):
+                await service.run("/chat", "k2", "f", handler)
+            release.set()
+            await original
+
+            # A failed request releases its key so the retry really runs
+            with pytest.raises(RuntimeError):
+                await service.run("/chat", "k3", "f", failing)
+            return await service.run("/chat", "k3", "f", handler)
+
+        retried = asyncio.run(run())
+        assert "idempotent-replayed" not in retried.headers
+        assert service.counts == {"executed": 3, "replayed": 0, "in_progress": 1, "reused": 1}
+
+    def test_abandoned_claims_and_expired_records_are_taken_over(self):
+        from datetime import datetime, timedelta
+        store = MemorySessionStore()
+        past = datetime.utcnow() - timedelta(seconds=1)
+        future = datetime.utcnow() + timedelta(hours=1)
+
+        async def run():
+            assert await store.claim_idempotency_key("k", "f", past, future) is None
+            # The claim's lock has lapsed (its worker died): next claimant wins
+            assert await store.claim_idempotency_key("k", "f", future, future) is None
+            assert (await store.claim_idempotency_key("k", "f", future, future)).state == "in_progress"
+            await store.complete_idempotency_key("k", 200, b"{}", {})
+            assert (await store.load_idempotency_record("k")).state == "done"
+
+            assert await store.claim_idempotency_key("old", "f", future, past) is None
+            assert await store.load_idempotency_record("old") is None
+            assert await store.claim_idempotency_key("old", "f", future, future) is None
+
+        asyncio.run(run())
+
+
+class TestSpeculation:
+    class _LLM(LLMService):
+        def __init__(self, delay=0.0, fail=False):
+            super().__init__()
+            self.delay, self.fail, self.prompts = delay, fail, []
+
+        async def generate_response(self, prompt, priority=Priority.INTERACTIVE):
+            self.prompts.append((prompt, priority))
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("Gemini down")
+            return " Drill question? " if "Directive: Drill down" in prompt else "New topic question?"
+
+    def _start(self, engine, order=1):
+        engine.start(
+            "s1", order, "Backend Engineer", "medium", "technical_deep_dive",
+            [], [], "None yet.", "How would you design a rate limiter?",
+        )
+
+    def test_directive_classification(self):
+        assert directive_kind("Drill down: probe locking") == DRILL_DOWN
+        assert directive_kind("Move on: databases") == MOVE_ON
+        assert directive_kind("Move on from caching instead of drilling further") == MOVE_ON
+        assert directive_kind("Revisit the core of the previous question") == DRILL_DOWN
+        assert directive_kind("Ask about remote teams") is None
+        assert directive_kind(None) is None
+
+    def test_matching_candidate_is_used_and_the_other_is_wasted(self):
+        llm = self._LLM()
+        engine = SpeculationEngine(llm)
+
+        async def run():
+            self._start(engine)
+            await asyncio.sleep(0.01)
+            return await engine.take(
+                "s1", 1, "Drill down: token bucket refill", "medium", "technical_deep_dive"
+            )
+
+        assert asyncio.run(run()) == "Drill question?"
+        assert {priority for _, priority in llm.prompts} == {Priority.BACKGROUND}
+        assert any("How would you design a rate limiter?" in prompt for prompt, _ in llm.prompts)
+        stats = engine.stats()
+        assert stats["hits"] == 1 and stats["hit_rate"] == 1.0 and stats["pending"] == 0
+        assert stats["tokens_used"] > 0 and stats["tokens_wasted"] > 0
+
+    def test_mismatches_fall_back_to_live_generation(self, monkeypatch):
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "SPECULATION_WAIT_SECONDS", 0.05)
+
+        async def take(engine, order=1, directive="Move on: queues", difficulty="medium"):
+            self._start(engine)
+            await asyncio.sleep(0)
+            return await engine.take("s1", order, directive, difficulty, "technical_deep_dive")
+
+        async def run():
+            engine = SpeculationEngine(self._LLM())
+            results = [
+                await engine.take("s1", 1, "Move on: queues", "medium", "technical_deep_dive"),
+                await take(engine, difficulty="hard"),
+                await take(engine, directive="Ask about teamwork"),
+                await take(engine, order=2),
+            ]
+            failing = SpeculationEngine(self._LLM(fail=True))
+            results.append(await take(failing))
+            slow = SpeculationEngine(self._LLM(delay=1.0))
+            results.append(await take(slow))
+            # Waiting on a candidate that is still generating is fine within the bound
+            waiting = SpeculationEngine(self._LLM(delay=0.01))
+            hit = await take(waiting)
+            return engine, failing, slow, waiting, results, hit
+
+        engine, failing, slow, waiting, results, hit = asyncio.run(run())
+        assert results == [None] * 6 and hit == "New topic question?"
+        assert engine.misses == {
+            "none": 1, "stale": 1, "directive": 1, "state": 1, "failed": 0, "late": 0,
+        }
+        assert failing.misses["failed"] == 1 and slow.misses["late"] == 1
+        assert waiting.stats()["hits"] == 1
+
+    def test_skipped_when_disabled_or_queue_busy(self, monkeypatch):
+        from app.core.config import settings
+        from app.services import speculation
+        llm = self._LLM()
+        engine = SpeculationEngine(llm)
+
+        async def run():
+            monkeypatch.setattr(settings, "SPECULATION_ENABLED", False)
+            self._start(engine)
+            monkeypatch.setattr(settings, "SPECULATION_ENABLED", True)
+            monkeypatch.setattr(speculation.llm_queue, "estimated_wait", lambda priority: 1.5)
+            self._start(engine)
+
+        asyncio.run(run())
+        assert llm.prompts == [] and engine.counts["skipped_busy"] == 1
+
+
+def _busy_loop(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(200))
+
+
+class TestProfiler:
+    def test_window_sampling_collects_folded_stacks(self):
+        profiler = Profiler()
+
+        async def run():
+            profiler.start(seconds=5, interval_ms=1)
+            with pytest.raises(ProfilerBusy):
+                profiler.start(seconds=5)
+            await asyncio.to_thread(_busy_loop, 0.3)
+            return profiler.stop()
+
+        status = asyncio.run(run())
+        assert not status["running"] and status["samples"] > 0
+        lines = profiler.folded().splitlines()
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert any("tests.test_services:_busy_loop" in line for line in lines)
+        top = profiler.top()
+        assert any(f["frame"] == "tests.test_services:_busy_loop" for f in top["inclusive"])
+        profiler.reset()
+        assert profiler.folded() == "" and profiler.samples == 0
+
+    def test_start_validates_arguments(self):
+        profiler = Profiler()
+
+        async def run():
+            for kwargs in ({"seconds": 0}, {"seconds": 1e9}, {"seconds": 1, "interval_ms": 0.1},
+                           {"seconds": 1, "sample_rate": 0}):
+                with pytest.raises(ProfilerError):
+                    profiler.start(**kwargs)
+
+        asyncio.run(run())
+        assert not profiler.running
+
+    def test_route_sampling_only_records_sampled_requests(self):
+        profiler = Profiler()
+
+        async def run():
+            profiler.start(seconds=5, interval_ms=1000, route="/api/interview/chat/")
+            assert profiler.wants("/api/interview/chat") and profiler.wants("/api/interview/chat/x")
+            assert not profiler.wants("/api/interview/chatter")
+            profiler.sample()  # No sampled request on the loop
+            task = asyncio.current_task()
+            profiler.track(task)
+            profiler.sample()
+            profiler.untrack(task)
+            profiler.stop()
+
+        asyncio.run(run())
+        assert profiler.samples == 1 and profiler.requests_sampled == 1
+        assert "tests.test_services:TestProfiler.test_route_sampling" in profiler.folded()
+        assert profiler.route is None
+
+    def test_hotpath_hooks_record_only_when_enabled(self):
+        profiler = Profiler()
+
+        @profiler.hotpath("test.square")
+        def square(x):
+            return x * x
+
+        @profiler.hotpath("test.fetch")
+        async def fetch():
+            await asyncio.sleep(0)
+            return "ok"
+
+        assert square(3) == 9
+        profiler.enable_hooks(["test.square"])
+        assert square(4) == 16
+        with pytest.raises(ProfilerError):
+            profiler.enable_hooks(["test.unknown"])
+        profiler.enable_hooks(["*"])
+        assert asyncio.run(fetch()) == "ok"
+        profiler.disable_hooks(["*"])
+        square(5)
+        stats = profiler.hook_stats()
+        assert stats["test.square"]["calls"] == 1 and "cpu_seconds" in stats["test.square"]
+        assert stats["test.fetch"]["calls"] == 1 and "cpu_seconds" not in stats["test.fetch"]
+        assert not stats["test.square"]["enabled"]
+
+    def test_attach_and_detach_at_runtime(self):
+        from app.services import score_index
+        profiler = Profiler()
+        original = score_index.score_bin
+        method = "app.services.score_index:ScoreSketch.percentile_rank"
+        profiler.attach("app.services.score_index:score_bin")
+        profiler.attach(method)
+        try:
+            sketch = ScoreSketch()
+            sketch.add(7.0)
+            assert sketch.percentile_rank(7.0) == 50.0
+        finally:
+            profiler.detach("app.services.score_index:score_bin")
+            profiler.detach(method)
+        assert score_index.score_bin is original
+        stats = profiler.hook_stats()
+        assert stats["app.services.score_index:score_bin"]["calls"] == 2
+        assert stats[method]["calls"] == 1
+        for target in ("os.path:join", "app.services.score_index:missing",
+                       "app.services.score_index:BINS"):
+            with pytest.raises(ProfilerError):
+                profiler.attach(target)
+        with pytest.raises(ProfilerError):
+            profiler.detach(method)